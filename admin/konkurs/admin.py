@@ -1,6 +1,7 @@
 from django.contrib import admin
+from django.db.models import Count, Q
 from django.utils.html import format_html
-from .models import Award, User, Link, UserSubscription, Statistics
+from .models import Award, Broadcast, CacheVersion, User, Link, UserSubscription, Statistics
 
 
 @admin.register(Award)
@@ -17,29 +18,48 @@ class AwardAdmin(admin.ModelAdmin):
     display_image.short_description = 'Rasm'
 
 
+class ReferralCountFilter(admin.SimpleListFilter):
+    title = 'Referallar soni'
+    parameter_name = 'referrals'
+    RANGES = {
+        '0': (0, 0),
+        '1-9': (1, 9),
+        '10-99': (10, 99),
+        '100+': (100, None),
+    }
+
+    def lookups(self, request, model_admin):
+        return [(key, key) for key in self.RANGES]
+
+    def queryset(self, request, queryset):
+        if self.value() not in self.RANGES:
+            return queryset
+        low, high = self.RANGES[self.value()]
+        queryset = queryset.filter(referral_count__gte=low)
+        if high is not None:
+            queryset = queryset.filter(referral_count__lte=high)
+        return queryset
+
+
 @admin.register(User)
 class UserAdmin(admin.ModelAdmin):
     list_display = ('fullname', 'telegram_id', 'username', 'score',
                     'referral_count', 'is_active', 'created_at')
-    list_filter = ('is_active', 'is_referral_counted', 'created_at')
+    list_filter = ('is_active', 'is_referral_counted', ReferralCountFilter, 'created_at')
     search_fields = ('fullname', 'telegram_id', 'username', 'referral_code')
+    readonly_fields = ('referral_count',)
     fieldsets = (
         ('Asosiy ma\'lumotlar', {
             'fields': ('fullname', 'telegram_id', 'username', 'score')
         }),
         ('Referal tizimi', {
-            'fields': ('referral_code', 'referred_by', 'is_referral_counted')
+            'fields': ('referral_code', 'referred_by', 'is_referral_counted', 'referral_count')
         }),
         ('Qo\'shimcha', {
             'fields': ('is_active',)
         }),
     )
 
-    def referral_count(self, obj):
-        return obj.referrals.count()
-
-    referral_count.short_description = 'Referallar soni'
-
 
 @admin.register(Link)
 class LinkAdmin(admin.ModelAdmin):
@@ -48,6 +68,17 @@ class LinkAdmin(admin.ModelAdmin):
     list_filter = ('is_required', 'is_active', 'created_at')
     search_fields = ('title', 'url')
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(
+            subscriber_total=Count('usersubscription', filter=Q(usersubscription__is_subscribed=True))
+        )
+
+    def subscriber_count(self, obj):
+        return obj.subscriber_total
+
+    subscriber_count.short_description = "Obunachilar"
+    subscriber_count.admin_order_field = 'subscriber_total'
+
 
 @admin.register(UserSubscription)
 class UserSubscriptionAdmin(admin.ModelAdmin):
@@ -55,6 +86,63 @@ class UserSubscriptionAdmin(admin.ModelAdmin):
     list_filter = ('is_subscribed', 'created_at')
     search_fields = ('user__fullname', 'channel__title')
     raw_id_fields = ('user', 'channel')
+    list_select_related = ('user', 'channel')
+
+
+@admin.register(Broadcast)
+class BroadcastAdmin(admin.ModelAdmin):
+    list_display = ('__str__', 'status', 'progress', 'messages_per_second', 'eta',
+                    'blocked_count', 'failed_count', 'created_at')
+    list_filter = ('status', 'created_at')
+    readonly_fields = ('progress', 'sent_count', 'blocked_count', 'failed_count',
+                       'messages_per_second', 'eta', 'started_at', 'finished_at')
+    actions = ('start_broadcast', 'pause_broadcast', 'cancel_broadcast')
+
+    def progress(self, obj):
+        if not obj.total_users:
+            return "-"
+        percent = min(100, obj.processed_count * 100 // obj.total_users)
+        return f"{obj.processed_count} / {obj.total_users} ({percent}%)"
+
+    progress.short_description = 'Jarayon'
+
+    def eta(self, obj):
+        seconds = obj.eta_seconds
+        if seconds is None:
+            return "-"
+        hours, seconds = divmod(seconds, 3600)
+        minutes, seconds = divmod(seconds, 60)
+        return f"{hours}:{minutes:02d}:{seconds:02d}"
+
+    eta.short_description = 'Qolgan vaqt'
+
+    def save_model(self, request, obj, form, change):
+        if change:
+            # Hisoblagichlarni bot yangilab turadi, ularni eski qiymat bilan
+            # ustidan yozmaslik uchun faqat formadagi maydonlar saqlanadi
+            if form.changed_data:
+                obj.save(update_fields=form.changed_data)
+        else:
+            obj.save()
+
+    def _set_status(self, request, queryset, status, allowed):
+        updated = queryset.filter(status__in=allowed).update(status=status)
+        CacheVersion.bump('broadcasts')
+        self.message_user(request, f"{updated} ta xabar yuborish yangilandi")
+
+    @admin.action(description="Yuborishni boshlash / davom ettirish")
+    def start_broadcast(self, request, queryset):
+        self._set_status(request, queryset, Broadcast.STATUS_RUNNING,
+                         (Broadcast.STATUS_DRAFT, Broadcast.STATUS_PAUSED))
+
+    @admin.action(description="To'xtatib turish")
+    def pause_broadcast(self, request, queryset):
+        self._set_status(request, queryset, Broadcast.STATUS_PAUSED, (Broadcast.STATUS_RUNNING,))
+
+    @admin.action(description="Bekor qilish")
+    def cancel_broadcast(self, request, queryset):
+        self._set_status(request, queryset, Broadcast.STATUS_CANCELLED,
+                         (Broadcast.STATUS_DRAFT, Broadcast.STATUS_RUNNING, Broadcast.STATUS_PAUSED))
 
 
 @admin.register(Statistics)
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+REBUILD_SQL = """
+UPDATE konkurs_user
+SET referral_count = (
+    SELECT COUNT(*) FROM konkurs_user AS referred
+    WHERE referred.referred_by_id = konkurs_user.id
+)
+WHERE referral_count IS NOT (
+    SELECT COUNT(*) FROM konkurs_user AS referred
+    WHERE referred.referred_by_id = konkurs_user.id
+)
+"""
+
+
+class Command(BaseCommand):
+    help = "konkurs_user.referral_count ni referred_by bo'yicha qayta hisoblash"
+
+    def handle(self, *args, **options):
+        # Bitta UPDATE: har bir foydalanuvchi uchun referred_by_id indeksidan sanaladi
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(REBUILD_SQL)
+            repaired = cursor.rowcount
+        self.stdout.write(self.style.SUCCESS(f"Tuzatilgan foydalanuvchilar: {repaired}"))
@@ -0,0 +1,33 @@
+# Generated by Django 5.1.15 on 2026-10-18 11:31
+
+from django.db import migrations, models
+
+
+def create_cache_versions(apps, schema_editor):
+    CacheVersion = apps.get_model('konkurs', 'CacheVersion')
+    for key in ('links', 'awards'):
+        CacheVersion.objects.get_or_create(key=key, defaults={'version': 1})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('konkurs', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CacheVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=50, unique=True, verbose_name='Kalit')),
+                ('version', models.PositiveBigIntegerField(default=0, verbose_name='Versiya')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Kesh versiyasi',
+                'verbose_name_plural': 'Kesh versiyalari',
+            },
+        ),
+        migrations.RunPython(create_cache_versions, migrations.RunPython.noop),
+    ]
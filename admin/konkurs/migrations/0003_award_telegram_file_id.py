@@ -0,0 +1,18 @@
+# Generated by Django 5.1.15 on 2026-10-18 11:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('konkurs', '0002_cacheversion'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='award',
+            name='telegram_file_id',
+            field=models.CharField(blank=True, editable=False, max_length=255, null=True, verbose_name='Telegram file_id'),
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.1.15 on 2026-10-18 11:45
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def create_cache_version(apps, schema_editor):
+    CacheVersion = apps.get_model('konkurs', 'CacheVersion')
+    CacheVersion.objects.get_or_create(key='broadcasts', defaults={'version': 1})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('konkurs', '0003_award_telegram_file_id'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Broadcast',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('text', models.TextField(verbose_name='Matn')),
+                ('status', models.CharField(choices=[('draft', 'Qoralama'), ('running', 'Yuborilmoqda'), ('paused', "To'xtatilgan"), ('done', 'Tugagan'), ('cancelled', 'Bekor qilingan')], default='draft', max_length=20, verbose_name='Holat')),
+                ('last_user_id', models.BigIntegerField(default=0, editable=False)),
+                ('total_users', models.IntegerField(default=0, editable=False, verbose_name='Qabul qiluvchilar')),
+                ('sent_count', models.IntegerField(default=0, editable=False, verbose_name='Yuborildi')),
+                ('blocked_count', models.IntegerField(default=0, editable=False, verbose_name='Bloklaganlar')),
+                ('failed_count', models.IntegerField(default=0, editable=False, verbose_name='Xatolar')),
+                ('messages_per_second', models.FloatField(default=0, editable=False, verbose_name='Tezlik (xabar/s)')),
+                ('lease_owner', models.CharField(blank=True, editable=False, max_length=100, null=True)),
+                ('lease_expires_at', models.DateTimeField(blank=True, editable=False, null=True)),
+                ('started_at', models.DateTimeField(blank=True, editable=False, null=True, verbose_name='Boshlangan')),
+                ('finished_at', models.DateTimeField(blank=True, editable=False, null=True, verbose_name='Tugagan')),
+                ('updated_at', models.DateTimeField(blank=True, editable=False, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('award', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='konkurs.award', verbose_name='Mukofot rasmi')),
+            ],
+            options={
+                'verbose_name': 'Xabar yuborish',
+                'verbose_name_plural': 'Xabar yuborishlar',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.RunPython(create_cache_version, migrations.RunPython.noop),
+    ]
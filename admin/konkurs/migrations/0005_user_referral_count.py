@@ -0,0 +1,64 @@
+# Generated by Django 5.1.15 on 2026-10-18 11:49
+
+from django.db import migrations, models
+
+BACKFILL_SQL = """
+UPDATE konkurs_user
+SET referral_count = (
+    SELECT COUNT(*) FROM konkurs_user AS referred
+    WHERE referred.referred_by_id = konkurs_user.id
+)
+"""
+
+# referral_count ni bot (xom SQL) va admin panel yozuvlarida bir xil
+# tranzaksiyada yangilab turuvchi triggerlar
+CREATE_TRIGGERS_SQL = [
+    """
+    CREATE TRIGGER konkurs_user_referral_insert
+    AFTER INSERT ON konkurs_user
+    WHEN NEW.referred_by_id IS NOT NULL
+    BEGIN
+        UPDATE konkurs_user SET referral_count = referral_count + 1 WHERE id = NEW.referred_by_id;
+    END
+    """,
+    """
+    CREATE TRIGGER konkurs_user_referral_update
+    AFTER UPDATE OF referred_by_id ON konkurs_user
+    WHEN OLD.referred_by_id IS NOT NEW.referred_by_id
+    BEGIN
+        UPDATE konkurs_user SET referral_count = referral_count - 1 WHERE id = OLD.referred_by_id;
+        UPDATE konkurs_user SET referral_count = referral_count + 1 WHERE id = NEW.referred_by_id;
+    END
+    """,
+    """
+    CREATE TRIGGER konkurs_user_referral_delete
+    AFTER DELETE ON konkurs_user
+    WHEN OLD.referred_by_id IS NOT NULL
+    BEGIN
+        UPDATE konkurs_user SET referral_count = referral_count - 1 WHERE id = OLD.referred_by_id;
+    END
+    """,
+]
+
+DROP_TRIGGERS_SQL = [
+    "DROP TRIGGER IF EXISTS konkurs_user_referral_insert",
+    "DROP TRIGGER IF EXISTS konkurs_user_referral_update",
+    "DROP TRIGGER IF EXISTS konkurs_user_referral_delete",
+]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('konkurs', '0004_broadcast'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='referral_count',
+            field=models.PositiveIntegerField(db_default=0, db_index=True, default=0, editable=False, verbose_name='Referallar soni'),
+        ),
+        migrations.RunSQL(BACKFILL_SQL, migrations.RunSQL.noop),
+        migrations.RunSQL(CREATE_TRIGGERS_SQL, DROP_TRIGGERS_SQL),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.1.15 on 2026-10-18 11:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('konkurs', '0005_user_referral_count'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='award',
+            index=models.Index(fields=['is_active', '-created_at'], name='konkurs_award_active_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='broadcast',
+            index=models.Index(fields=['status'], name='konkurs_broadcast_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='link',
+            index=models.Index(fields=['url'], name='konkurs_link_url_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='link',
+            index=models.Index(fields=['is_active', 'title', 'url'], name='konkurs_link_active_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='statistics',
+            index=models.Index(fields=['date'], name='konkurs_statistics_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['is_active', '-score', 'id'], name='konkurs_user_active_score_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='usersubscription',
+            index=models.Index(fields=['user', 'is_subscribed', 'channel'], name='konkurs_sub_user_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='usersubscription',
+            index=models.Index(fields=['is_subscribed', 'channel'], name='konkurs_sub_subscribed_idx'),
+        ),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 5.1.15 on 2026-10-18 13:40
+
+from django.db import migrations
+
+CREATE_VERSION_SQL = """
+INSERT OR IGNORE INTO konkurs_cacheversion (key, version, updated_at)
+VALUES ('scores', 1, datetime('now'))
+"""
+
+BUMP_SQL = "UPDATE konkurs_cacheversion SET version = version + 1 WHERE key = 'scores';"
+
+# Reyting va o'rinlarga ta'sir qiladigan har qanday o'zgarish (boshqa bot
+# jarayoni, admin panel yoki xom SQL) 'scores' versiyasini oshiradi: bot
+# xotiradagi reyting nusxasini shu versiya bo'yicha yangilaydi
+CREATE_TRIGGERS_SQL = [
+    f"""
+    CREATE TRIGGER konkurs_user_scores_insert
+    AFTER INSERT ON konkurs_user
+    BEGIN
+        {BUMP_SQL}
+    END
+    """,
+    f"""
+    CREATE TRIGGER konkurs_user_scores_update
+    AFTER UPDATE OF score, is_active, fullname ON konkurs_user
+    WHEN OLD.score IS NOT NEW.score
+        OR OLD.is_active IS NOT NEW.is_active
+        OR OLD.fullname IS NOT NEW.fullname
+    BEGIN
+        {BUMP_SQL}
+    END
+    """,
+    f"""
+    CREATE TRIGGER konkurs_user_scores_delete
+    AFTER DELETE ON konkurs_user
+    BEGIN
+        {BUMP_SQL}
+    END
+    """,
+]
+
+DROP_TRIGGERS_SQL = [
+    "DROP TRIGGER IF EXISTS konkurs_user_scores_insert",
+    "DROP TRIGGER IF EXISTS konkurs_user_scores_update",
+    "DROP TRIGGER IF EXISTS konkurs_user_scores_delete",
+]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('konkurs', '0006_query_indexes'),
+    ]
+
+    operations = [
+        migrations.RunSQL(CREATE_VERSION_SQL, "DELETE FROM konkurs_cacheversion WHERE key = 'scores'"),
+        migrations.RunSQL(CREATE_TRIGGERS_SQL, DROP_TRIGGERS_SQL),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.1.15 on 2026-10-18 14:02
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('konkurs', '0007_scores_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='usersubscription',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+    ]
@@ -1,5 +1,6 @@
 from django.db import models
 from django.core.validators import MinValueValidator
+from django.utils import timezone
 
 class Award(models.Model):
     """Mukofotlar uchun model"""
@@ -9,6 +10,13 @@ class Award(models.Model):
         upload_to='awards/images/',
         verbose_name="Rasm"
     )
+    telegram_file_id = models.CharField(
+        max_length=255,
+        blank=True,
+        null=True,
+        editable=False,
+        verbose_name="Telegram file_id"
+    )
     created_at = models.DateTimeField(auto_now_add=True)
     is_active = models.BooleanField(default=True, verbose_name="Faol")
 
@@ -16,10 +24,22 @@ class Award(models.Model):
         verbose_name = "Mukofot"
         verbose_name_plural = "Mukofotlar"
         ordering = ['-created_at']
+        indexes = [
+            # Eng so'nggi faol mukofot
+            models.Index(fields=['is_active', '-created_at'], name='konkurs_award_active_idx'),
+        ]
 
     def __str__(self):
         return self.title
 
+    def save(self, *args, **kwargs):
+        # Rasm almashtirilsa, bot eski rasmning file_id sini ishlatmasligi kerak
+        if self.pk:
+            old_image = Award.objects.filter(pk=self.pk).values_list('image', flat=True).first()
+            if old_image != self.image.name:
+                self.telegram_file_id = None
+        super().save(*args, **kwargs)
+
 class User(models.Model):
     """Foydalanuvchilar uchun model"""
     fullname = models.CharField(max_length=255, verbose_name="To'liq ism")
@@ -59,15 +79,40 @@ class User(models.Model):
     )
     is_active = models.BooleanField(default=True, verbose_name="Faol")
     created_at = models.DateTimeField(auto_now_add=True)
+    # referred_by o'zgarganda bazadagi triggerlar yangilaydi
+    # (0005_user_referral_count migratsiyasi). konkurs_user jadvalini qayta
+    # yaratadigan migratsiyalar triggerlarni ham qayta yaratishi kerak;
+    # qiymatni tekshirish/tuzatish: manage.py rebuild_referral_counts
+    referral_count = models.PositiveIntegerField(
+        default=0,
+        db_default=0,
+        editable=False,
+        db_index=True,
+        verbose_name="Referallar soni"
+    )
 
     class Meta:
         verbose_name = "Foydalanuvchi"
         verbose_name_plural = "Foydalanuvchilar"
         ordering = ['-created_at']
+        indexes = [
+            # Reyting: WHERE is_active = 1 ORDER BY score DESC, id va
+            # GROUP BY score (o'rinlar indeksi) saralashsiz o'qiladi
+            models.Index(fields=['is_active', '-score', 'id'], name='konkurs_user_active_score_idx'),
+        ]
 
     def __str__(self):
         return f"{self.fullname} ({self.score} ball)"
 
+    def save(self, *args, **kwargs):
+        # Eski referral_count qiymati bilan trigger natijasini ustidan yozmaslik uchun
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name != 'referral_count'
+            ]
+        super().save(*args, **kwargs)
+
 class Link(models.Model):
     """Kanallar va linklar uchun model"""
     title = models.CharField(max_length=255, verbose_name="Nomi")
@@ -89,6 +134,11 @@ class Link(models.Model):
         verbose_name = "Kanal"
         verbose_name_plural = "Kanallar"
         ordering = ['title']
+        indexes = [
+            models.Index(fields=['url'], name='konkurs_link_url_idx'),
+            # Faol kanallar ro'yxati jadvalga murojaatsiz o'qiladi
+            models.Index(fields=['is_active', 'title', 'url'], name='konkurs_link_active_idx'),
+        ]
 
     def __str__(self):
         return self.title
@@ -114,15 +164,112 @@ class UserSubscription(models.Model):
         verbose_name="Obuna holati"
     )
     created_at = models.DateTimeField(auto_now_add=True)
+    # Holat oxirgi marta yozilgan yoki tasdiqlangan vaqt
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         verbose_name = "Obuna"
         verbose_name_plural = "Obunalar"
         unique_together = ['user', 'channel']
+        indexes = [
+            # Foydalanuvchi obunalari (user_id bo'yicha join) uchun qoplovchi indeks
+            models.Index(fields=['user', 'is_subscribed', 'channel'], name='konkurs_sub_user_idx'),
+            # Obunachilar soni: jami va kanal bo'yicha
+            models.Index(fields=['is_subscribed', 'channel'], name='konkurs_sub_subscribed_idx'),
+        ]
 
     def __str__(self):
         return f"{self.user.fullname} - {self.channel.title}"
 
+class CacheVersion(models.Model):
+    """Bot keshidagi ma'lumotlar versiyasi"""
+    key = models.CharField(max_length=50, unique=True, verbose_name="Kalit")
+    version = models.PositiveBigIntegerField(default=0, verbose_name="Versiya")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Kesh versiyasi"
+        verbose_name_plural = "Kesh versiyalari"
+
+    def __str__(self):
+        return f"{self.key}: {self.version}"
+
+    @classmethod
+    def bump(cls, key):
+        """Versiyani oshirish: bot shu kalitdagi keshini qayta yuklaydi"""
+        updated = cls.objects.filter(key=key).update(
+            version=models.F('version') + 1,
+            updated_at=timezone.now()
+        )
+        if not updated:
+            cls.objects.get_or_create(key=key, defaults={'version': 1})
+
+class Broadcast(models.Model):
+    """Barcha faol foydalanuvchilarga yuboriladigan xabar"""
+    STATUS_DRAFT = 'draft'
+    STATUS_RUNNING = 'running'
+    STATUS_PAUSED = 'paused'
+    STATUS_DONE = 'done'
+    STATUS_CANCELLED = 'cancelled'
+    STATUS_CHOICES = (
+        (STATUS_DRAFT, "Qoralama"),
+        (STATUS_RUNNING, "Yuborilmoqda"),
+        (STATUS_PAUSED, "To'xtatilgan"),
+        (STATUS_DONE, "Tugagan"),
+        (STATUS_CANCELLED, "Bekor qilingan"),
+    )
+
+    text = models.TextField(verbose_name="Matn")
+    award = models.ForeignKey(
+        Award,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        verbose_name="Mukofot rasmi"
+    )
+    status = models.CharField(
+        max_length=20,
+        choices=STATUS_CHOICES,
+        default=STATUS_DRAFT,
+        verbose_name="Holat"
+    )
+    # Keyset pagination: shu id gacha bo'lgan foydalanuvchilarga yuborilgan
+    last_user_id = models.BigIntegerField(default=0, editable=False)
+    total_users = models.IntegerField(default=0, editable=False, verbose_name="Qabul qiluvchilar")
+    sent_count = models.IntegerField(default=0, editable=False, verbose_name="Yuborildi")
+    blocked_count = models.IntegerField(default=0, editable=False, verbose_name="Bloklaganlar")
+    failed_count = models.IntegerField(default=0, editable=False, verbose_name="Xatolar")
+    messages_per_second = models.FloatField(default=0, editable=False, verbose_name="Tezlik (xabar/s)")
+    lease_owner = models.CharField(max_length=100, blank=True, null=True, editable=False)
+    lease_expires_at = models.DateTimeField(null=True, blank=True, editable=False)
+    started_at = models.DateTimeField(null=True, blank=True, editable=False, verbose_name="Boshlangan")
+    finished_at = models.DateTimeField(null=True, blank=True, editable=False, verbose_name="Tugagan")
+    updated_at = models.DateTimeField(null=True, blank=True, editable=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = "Xabar yuborish"
+        verbose_name_plural = "Xabar yuborishlar"
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status'], name='konkurs_broadcast_status_idx'),
+        ]
+
+    def __str__(self):
+        return self.text[:50]
+
+    @property
+    def processed_count(self):
+        return self.sent_count + self.blocked_count + self.failed_count
+
+    @property
+    def eta_seconds(self):
+        """Tugashigacha taxminiy vaqt (soniya)"""
+        if self.status != self.STATUS_RUNNING or not self.messages_per_second:
+            return None
+        remaining = max(self.total_users - self.processed_count, 0)
+        return int(remaining / self.messages_per_second)
+
 class Statistics(models.Model):
     """Statistika uchun model"""
     date = models.DateField(
@@ -154,22 +301,26 @@ class Statistics(models.Model):
         verbose_name = "Statistika"
         verbose_name_plural = "Statistikalar"
         ordering = ['-date']
+        indexes = [
+            models.Index(fields=['date'], name='konkurs_statistics_date_idx'),
+        ]
 
     def __str__(self):
         return f"Statistika: {self.date}"
 
     def update_statistics(self):
         """Statistikani yangilash"""
-        self.total_users = User.objects.count()
-        self.active_users = User.objects.filter(is_active=True).count()
+        totals = User.objects.aggregate(
+            total_users=models.Count('id'),
+            active_users=models.Count('id', filter=models.Q(is_active=True)),
+            total_score=models.Sum('score'),
+            referral_counts=models.Count('id', filter=models.Q(is_referral_counted=True)),
+        )
+        self.total_users = totals['total_users']
+        self.active_users = totals['active_users']
         self.total_subscriptions = UserSubscription.objects.filter(
             is_subscribed=True
         ).count()
-        self.total_score = User.objects.aggregate(
-            total=models.Sum('score')
-        )['total'] or 0
-        self.referral_counts = User.objects.filter(
-            is_referral_counted=True
-        ).count()
+        self.total_score = totals['total_score'] or 0
+        self.referral_counts = totals['referral_counts']
         self.save()
-
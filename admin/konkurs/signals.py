@@ -0,0 +1,19 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Award, Broadcast, CacheVersion, Link
+
+
+@receiver([post_save, post_delete], sender=Link)
+def links_changed(sender, **kwargs):
+    CacheVersion.bump('links')
+
+
+@receiver([post_save, post_delete], sender=Award)
+def awards_changed(sender, **kwargs):
+    CacheVersion.bump('awards')
+
+
+@receiver([post_save, post_delete], sender=Broadcast)
+def broadcasts_changed(sender, **kwargs):
+    CacheVersion.bump('broadcasts')
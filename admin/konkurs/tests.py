@@ -1,3 +1,1417 @@
-from django.test import TestCase
+import ast
+import asyncio
+import json
+import os
+import random
+import re
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import SimpleTestCase, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .models import Link, User, UserSubscription
+
+# Bot modullari (data/) repozitoriy ildizida
+sys.path.append(str(settings.BASE_DIR.parent))
+
+
+class AdminChangelistQueriesTest(TestCase):
+    """Admin ro'yxat sahifalaridagi so'rovlar soni qatorlar soniga bog'liq emas"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = get_user_model().objects.create_superuser('admin', 'admin@example.com', 'password')
+        cls.links = [
+            Link.objects.create(title=f"Kanal {i}", url=f"https://t.me/channel{i}")
+            for i in range(3)
+        ]
+        cls.next_telegram_id = 1
+        cls.add_users(5)
+
+    @classmethod
+    def add_users(cls, count):
+        for _ in range(count):
+            telegram_id = cls.next_telegram_id
+            cls.next_telegram_id += 1
+            referrer = User.objects.order_by('id').first()
+            user = User.objects.create(
+                fullname=f"User {telegram_id}",
+                telegram_id=telegram_id,
+                referral_code=str(telegram_id),
+                referred_by=referrer,
+            )
+            for link in cls.links:
+                UserSubscription.objects.create(user=user, channel=link, is_subscribed=telegram_id % 2 == 0)
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(context.captured_queries)
+
+    def assertConstantQueries(self, url_name, extra_links=0):
+        url = reverse(url_name)
+        before = self.count_queries(url)
+        self.add_users(20)
+        for i in range(extra_links):
+            Link.objects.create(title=f"Yangi kanal {i}", url=f"https://t.me/new{i}")
+        self.assertEqual(self.count_queries(url), before)
+
+    def test_user_changelist(self):
+        self.assertConstantQueries('admin:konkurs_user_changelist')
+
+    def test_user_changelist_referral_filter(self):
+        response = self.client.get(reverse('admin:konkurs_user_changelist'), {'referrals': '1-9'})
+        referrer = User.objects.order_by('id').first()
+        self.assertEqual([user.pk for user in response.context['cl'].result_list], [referrer.pk])
+
+    def test_link_changelist(self):
+        self.assertConstantQueries('admin:konkurs_link_changelist', extra_links=5)
+
+    def test_link_changelist_subscriber_count(self):
+        response = self.client.get(reverse('admin:konkurs_link_changelist'))
+        for link in response.context['cl'].result_list:
+            self.assertEqual(link.subscriber_total, link.subscriber_count)
+
+    def test_usersubscription_changelist(self):
+        self.assertConstantQueries('admin:konkurs_usersubscription_changelist')
+
+
+class ReferralCountTest(TestCase):
+    """konkurs_user.referral_count ni bazadagi triggerlar yuritadi"""
+
+    def setUp(self):
+        self.referrer = User.objects.create(fullname="Referrer", telegram_id=1)
+        self.other = User.objects.create(fullname="Other", telegram_id=2)
+
+    def create_referred(self, telegram_id, referrer):
+        return User.objects.create(fullname=f"User {telegram_id}", telegram_id=telegram_id, referred_by=referrer)
+
+    def assertReferralCounts(self):
+        for user in User.objects.all():
+            self.assertEqual(user.referral_count, user.referrals.count(), user)
+
+    def test_insert_update_delete(self):
+        first = self.create_referred(10, self.referrer)
+        second = self.create_referred(11, self.referrer)
+        self.assertReferralCounts()
+
+        second.referred_by = self.other
+        second.save()
+        self.assertReferralCounts()
+
+        User.objects.filter(pk=first.pk).update(referred_by=None)
+        self.assertReferralCounts()
+
+        second.delete()
+        self.assertReferralCounts()
+
+    def test_raw_sql_update(self):
+        # Bot referral aloqani xom SQL bilan yozadi
+        self.create_referred(10, None)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                """
+                UPDATE konkurs_user
+                SET referred_by_id = (SELECT id FROM konkurs_user WHERE telegram_id = %s)
+                WHERE telegram_id = %s
+                """,
+                [1, 10]
+            )
+        self.assertReferralCounts()
+
+    def test_admin_save_keeps_count(self):
+        stale = User.objects.get(pk=self.referrer.pk)
+        self.create_referred(10, self.referrer)
+        stale.fullname = "Renamed"
+        stale.save()
+        self.assertEqual(User.objects.get(pk=self.referrer.pk).referral_count, 1)
+
+    def test_rebuild_command(self):
+        self.create_referred(10, self.referrer)
+        User.objects.filter(pk=self.referrer.pk).update(referral_count=5)
+        User.objects.filter(pk=self.other.pk).update(referral_count=3)
+        out = StringIO()
+        call_command('rebuild_referral_counts', stdout=out)
+        self.assertIn('2', out.getvalue())
+        self.assertReferralCounts()
+
+
+class QueryPlanTest(TestCase):
+    """Bot so'rovlari (data/commands.py) indekslardan foydalanadi"""
+
+    # Jadvalni to'liq o'qishi kutilgan so'rovlar
+    ALLOWED_SCANS = (
+        'COALESCE(SUM(is_active = 1), 0)',  # statistikani qayta hisoblash
+        'FROM konkurs_cacheversion',  # bir necha qatorli jadval
+    )
+
+    @staticmethod
+    def bot_queries():
+        path = settings.BASE_DIR.parent / 'data' / 'commands.py'
+        tree = ast.parse(path.read_text(encoding='utf-8'))
+        f_string_parts = set()
+        candidates = []
+        for node in ast.walk(tree):
+            if isinstance(node, ast.JoinedStr):
+                f_string_parts.update(id(value) for value in node.values)
+                candidates.append(''.join(
+                    value.value if isinstance(value, ast.Constant) else '?'
+                    for value in node.values
+                ))
+            elif isinstance(node, ast.Constant) and isinstance(node.value, str) and id(node) not in f_string_parts:
+                candidates.append(node.value)
+        return [
+            sql for sql in candidates
+            if sql.split(None, 1)[:1] and sql.split(None, 1)[0].upper() in ('SELECT', 'INSERT', 'UPDATE', 'DELETE', 'WITH')
+        ]
+
+    def test_bot_queries_use_indexes(self):
+        queries = self.bot_queries()
+        self.assertGreater(len(queries), 20)
+        connection.ensure_connection()
+        raw = connection.connection
+        for sql in queries:
+            with self.subTest(sql=' '.join(sql.split())):
+                plan = [row[3] for row in raw.execute(f"EXPLAIN QUERY PLAN {sql}", [None] * sql.count('?'))]
+                self.assertFalse([step for step in plan if 'USE TEMP B-TREE' in step], plan)
+                if not any(allowed in sql for allowed in self.ALLOWED_SCANS):
+                    self.assertFalse([step for step in plan if step.startswith('SCAN')], plan)
+
+
+class BotDataBaseTestCase(TestCase):
+    """
+    Botning DataBase klassi bilan testlar
+
+    Bot alohida ulanishlar bilan ishlaydi, shuning uchun test bazasining
+    sxemasi vaqtinchalik faylga ko'chiriladi.
+    """
+
+    # Bir xil bazaga ulangan bot jarayonlari va ularning har biridagi oqimlar
+    PROCESSES = 2
+    THREADS = 6
+
+    def setUp(self):
+        from data.commands import DataBase
+
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'db.sqlite3')
+        connection.ensure_connection()
+        target = sqlite3.connect(self.path)
+        with target:
+            connection.connection.backup(target)
+            target.executemany(
+                """
+                INSERT INTO konkurs_user (
+                    id, fullname, telegram_id, score, referral_code,
+                    is_referral_counted, is_active, created_at, referred_by_id
+                )
+                VALUES (?, ?, ?, 0, ?, 0, 1, datetime('now'), ?)
+                """,
+                [(pk, f"User {pk}", telegram_id, str(telegram_id), referred_by)
+                 for pk, telegram_id, referred_by in self.initial_users()]
+            )
+        # Oqimlar ishga tushishidan oldin WAL ga bir marta o'tkaziladi
+        target.execute("PRAGMA journal_mode = WAL")
+        target.close()
+
+        self.databases = [DataBase(self.path, timeout=60) for _ in range(self.PROCESSES)]
+        for database in self.databases:
+            self.addCleanup(database.close)
+
+    def initial_users(self):
+        """(id, telegram_id, referred_by_id) ro'yxati"""
+        return []
+
+    def fetchone(self, sql, parameters=()):
+        raw = sqlite3.connect(self.path)
+        try:
+            return raw.execute(sql, parameters).fetchone()
+        finally:
+            raw.close()
+
+    def run_concurrently(self, target):
+        """``target(database, seed)`` ni barcha "jarayonlar" va oqimlarda bir vaqtda ishga tushirish"""
+        barrier = threading.Barrier(self.PROCESSES * self.THREADS)
+        errors = []
+
+        def run(database, seed):
+            barrier.wait()
+            try:
+                target(database, seed)
+            except Exception as err:
+                errors.append(err)
+
+        threads = [
+            threading.Thread(target=run, args=(database, index * self.THREADS + i))
+            for index, database in enumerate(self.databases)
+            for i in range(self.THREADS)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+
+
+class ReferralCreditTest(BotDataBaseTestCase):
+    """Botning credit_referral i bir vaqtdagi chaqiruvlarda ham har bir taklifga bir marta ball beradi"""
+
+    REFERRED = 25
+
+    def setUp(self):
+        from data.commands import REFERRAL_BONUS
+
+        self.bonus = REFERRAL_BONUS
+        super().setUp()
+
+    def initial_users(self):
+        # 1 - taklif qilgan, oxirgisi - taklifsiz kelgan foydalanuvchi
+        return [(1, 1, None)] + [
+            (pk, 100 + pk, 1 if pk <= self.REFERRED + 1 else None)
+            for pk in range(2, self.REFERRED + 3)
+        ]
+
+    def referred_ids(self):
+        return [100 + pk for pk in range(2, self.REFERRED + 2)]
+
+    def test_concurrent_callbacks_credit_once(self):
+        referred = self.referred_ids()
+        credited = []
+
+        def tap(database, seed):
+            # Har bir oqim barcha takliflarni o'z tartibida "bosadi"
+            order = list(referred)
+            random.Random(seed).shuffle(order)
+            for telegram_id in order:
+                referrer = database.credit_referral(telegram_id)
+                if referrer is not None:
+                    credited.append((telegram_id, referrer))
+
+        self.run_concurrently(tap)
+        self.assertEqual(sorted(credited), [(telegram_id, 1) for telegram_id in referred])
+        self.assertEqual(self.fetchone("SELECT score FROM konkurs_user WHERE telegram_id = 1"),
+                         (self.bonus * self.REFERRED,))
+        self.assertEqual(self.fetchone("SELECT COUNT(*) FROM konkurs_user WHERE is_referral_counted = 1"),
+                         (self.REFERRED,))
+
+    def test_without_referrer(self):
+        database = self.databases[0]
+        without_referrer = 100 + self.REFERRED + 2
+        self.assertIsNone(database.credit_referral(without_referrer))
+        self.assertIsNone(database.credit_referral(404))
+        self.assertEqual(
+            self.fetchone("SELECT is_referral_counted FROM konkurs_user WHERE telegram_id = ?", (without_referrer,)),
+            (0,)
+        )
+        self.assertEqual(self.fetchone("SELECT score FROM konkurs_user WHERE telegram_id = 1"), (0,))
+
+    def test_repeated_call(self):
+        database = self.databases[0]
+        telegram_id = self.referred_ids()[0]
+        self.assertEqual(database.credit_referral(telegram_id), 1)
+        self.assertIsNone(database.credit_referral(telegram_id))
+        self.assertEqual(self.fetchone("SELECT score FROM konkurs_user WHERE telegram_id = 1"), (self.bonus,))
+
+
+class RegistrationTest(BotDataBaseTestCase):
+    """/start dagi ro'yxatdan o'tish bitta upsert: takroriy va bir vaqtdagi /start lar xatosiz"""
+
+    def initial_users(self):
+        return [(1, 1, None)]
+
+    def register(self, database, telegram_id, referrer_id=None):
+        return database.add_user(f"User {telegram_id}", telegram_id, referral_code=str(telegram_id),
+                                 referrer_id=referrer_id)
+
+    def test_new_user_with_referrer(self):
+        row = self.register(self.databases[0], 10, referrer_id=1)
+        self.assertEqual(row[1:], (10, "User 10", 0, 1, 1))
+        self.assertEqual(self.fetchone("SELECT referral_count FROM konkurs_user WHERE telegram_id = 1"), (1,))
+
+    def test_existing_user_unchanged(self):
+        row = self.register(self.databases[0], 10)
+        self.assertEqual(self.register(self.databases[0], 10, referrer_id=1), row)
+        self.assertEqual(self.register(self.databases[1], 10), row)
+        self.assertEqual(self.fetchone("SELECT referred_by_id FROM konkurs_user WHERE telegram_id = 10"), (None,))
+
+    def test_unknown_referrer(self):
+        row = self.register(self.databases[0], 10, referrer_id=404)
+        self.assertIsNone(row[5])
+
+    def test_reactivate_blocked_user(self):
+        database = self.databases[0]
+        self.register(database, 10, referrer_id=1)
+        database.update_user_score(10, 5)
+        database.load_leaderboard()
+        self.assertEqual(database.deactivate_users([10]), 1)
+        self.assertEqual(database.get_score_and_rank(10), (5, None))
+
+        row = self.register(database, 10)
+        self.assertEqual(row[1:], (10, "User 10", 5, 1, 1))
+        self.assertEqual(database.get_score_and_rank(10), (5, 1))
+        self.assertEqual(database.get_top_users_by_score(1), [("User 10", 5, 10)])
+        self.assertTrue(database.score_index.loaded)
+        database.update_statistics()
+        self.assertEqual(database.get_daily_statistics()[:2], (2, 2))
+        self.assertEqual(database.reconcile_statistics(), {})
+
+    def test_concurrent_start(self):
+        telegram_ids = list(range(10, 30))
+        rows = set()
+
+        def start(database, seed):
+            order = list(telegram_ids)
+            random.Random(seed).shuffle(order)
+            for telegram_id in order:
+                rows.add(self.register(database, telegram_id, referrer_id=1))
+
+        self.run_concurrently(start)
+        # Har bir /start bitta va o'sha qatorni qaytaradi
+        self.assertEqual(sorted(row[1] for row in rows), telegram_ids)
+        self.assertEqual(self.fetchone("SELECT COUNT(*), COUNT(referred_by_id) FROM konkurs_user"),
+                         (len(telegram_ids) + 1, len(telegram_ids)))
+        self.assertEqual(self.fetchone("SELECT referral_count FROM konkurs_user WHERE telegram_id = 1"),
+                         (len(telegram_ids),))
+
+
+class SubscriptionStatusTest(BotDataBaseTestCase):
+    """chat_member updatelaridan kelgan obuna statuslari konkurs_usersubscription ga yoziladi"""
+
+    URL = 'https://t.me/channel'
+
+    def initial_users(self):
+        return [(1, 1, None)]
+
+    def setUp(self):
+        super().setUp()
+        raw = sqlite3.connect(self.path)
+        with raw:
+            raw.execute(
+                """
+                INSERT INTO konkurs_link (title, url, is_required, is_active, created_at)
+                VALUES ('Kanal', ?, 1, 1, datetime('now'))
+                """,
+                (self.URL,)
+            )
+        raw.close()
+        self.database = self.databases[0]
+
+    def assertSubscriptions(self, expected, total):
+        self.assertEqual([row[:3] for row in self.database.get_user_subscriptions(1)], expected)
+        statistics = self.database.get_daily_statistics()
+        self.assertEqual(statistics[2] if statistics else 0, total)
+
+    def test_join_leave(self):
+        self.assertIsNotNone(self.database.update_subscription_status(1, self.URL, True))
+        self.assertSubscriptions([('Kanal', self.URL, 1)], 1)
+
+        # Takroriy update holatni o'zgartirmaydi
+        self.assertIsNone(self.database.update_subscription_status(1, self.URL, True))
+        self.assertSubscriptions([('Kanal', self.URL, 1)], 1)
+
+        self.assertIsNotNone(self.database.update_subscription_status(1, self.URL, False))
+        self.assertSubscriptions([('Kanal', self.URL, 0)], 0)
+
+        self.assertIsNotNone(self.database.update_subscription_status(1, self.URL, True))
+        self.assertSubscriptions([('Kanal', self.URL, 1)], 1)
+
+    def test_confirm_keeps_status(self):
+        self.assertIsNone(self.database.confirm_subscription(1, self.URL))
+        self.database.update_subscription_status(1, self.URL, True)
+        raw = sqlite3.connect(self.path)
+        with raw:
+            raw.execute("UPDATE konkurs_usersubscription SET updated_at = '2000-01-01 00:00:00'")
+        raw.close()
+
+        self.assertIsNotNone(self.database.confirm_subscription(1, self.URL))
+        (_, _, is_subscribed, updated_at), = self.database.get_user_subscriptions(1)
+        self.assertEqual(is_subscribed, 1)
+        self.assertGreater(updated_at, '2000-01-01 00:00:00')
+        self.assertSubscriptions([('Kanal', self.URL, 1)], 1)
+
+        self.database.update_subscription_status(1, self.URL, False)
+        self.assertIsNone(self.database.confirm_subscription(1, self.URL))
+        self.assertSubscriptions([('Kanal', self.URL, 0)], 0)
+
+    def test_unknown_user_or_channel(self):
+        self.assertIsNone(self.database.update_subscription_status(1, self.URL, False))
+        self.assertIsNone(self.database.update_subscription_status(404, self.URL, True))
+        self.assertIsNone(self.database.update_subscription_status(1, 'https://t.me/other', True))
+        self.assertSubscriptions([], 0)
+
+
+class StatisticsTest(BotDataBaseTestCase):
+    """Bir nechta bot jarayoni bugungi konkurs_statistics qatorini bir-birining ustiga yozmaydi"""
+
+    def initial_users(self):
+        return [(1, 1, None)]
+
+    def assertStatistics(self, database):
+        with database.transaction() as cursor:
+            actual = database._count_statistics(cursor)
+        self.assertEqual(database.get_daily_statistics(), tuple(actual.values()))
+        self.assertEqual(database.reconcile_statistics(), {})
+
+    def test_two_processes(self):
+        first, second = self.databases
+        first.reconcile_statistics()
+
+        first.add_user("User 10", 10, referrer_id=1)
+        first.add_user("User 11", 11, referrer_id=1)
+        first.credit_referral(10)
+        first.update_statistics()
+        self.assertEqual(first.get_daily_statistics(), (3, 3, 0, 10, 1))
+
+        second.add_user("User 12", 12)
+        second.deactivate_users([11])
+        second.update_statistics()
+        self.assertEqual(second.get_daily_statistics(), (4, 3, 0, 10, 1))
+        self.assertStatistics(first)
+
+    def test_concurrent_writes(self):
+        def register(database, seed):
+            for i in range(20):
+                telegram_id = 1000 + seed * 100 + i
+                database.add_user(f"User {telegram_id}", telegram_id, referrer_id=1)
+                database.credit_referral(telegram_id)
+
+        self.run_concurrently(register)
+        self.assertStatistics(self.databases[1])
+        self.assertEqual(self.databases[0].get_daily_statistics()[:2], (241, 241))
+
+    def test_reconcile_fixes_drift(self):
+        database = self.databases[0]
+        database.update_statistics()
+        # Admin panelda ball o'zgartirildi
+        raw = sqlite3.connect(self.path)
+        with raw:
+            raw.execute("UPDATE konkurs_user SET score = 7 WHERE telegram_id = 1")
+        raw.close()
+        self.assertEqual(database.reconcile_statistics(), {'total_score': (0, 7)})
+        self.assertEqual(database.get_daily_statistics(), (1, 1, 0, 7, 0))
+
+
+class SQLiteVersionTest(SimpleTestCase):
+    """Bot RETURNING ni qo'llamaydigan SQLite bilan ishga tushmaydi"""
+
+    def test_old_sqlite_rejected(self):
+        from data.commands import DataBase
+
+        with mock.patch('sqlite3.sqlite_version_info', (3, 31, 1)):
+            with self.assertRaisesRegex(RuntimeError, r'SQLite 3\.35\.0 or newer'):
+                DataBase(':memory:')
+
+
+class LeaderboardVersionTest(BotDataBaseTestCase):
+    """Xotiradagi reyting boshqa jarayon va admin panel o'zgarishlarini ko'radi"""
+
+    def initial_users(self):
+        return [(pk, pk, None) for pk in range(1, 6)]
+
+    def assertRanks(self, database):
+        for telegram_id in range(1, 6):
+            score, = self.fetchone("SELECT score FROM konkurs_user WHERE telegram_id = ?", (telegram_id,))
+            higher, = self.fetchone("SELECT COUNT(*) FROM konkurs_user WHERE is_active = 1 AND score > ?", (score,))
+            self.assertEqual(database.get_score_and_rank(telegram_id), (score, higher + 1))
+
+    def test_other_process_writes(self):
+        first, second = self.databases
+        first.load_leaderboard()
+        second.update_user_score(3, 50)
+        second.add_user("User 10", 10, referrer_id=4)
+        second.credit_referral(10)
+
+        first.check_versions()
+        self.assertEqual(first.get_top_users_by_score(2), [("User 3", 50, 3), ("User 4", 10, 4)])
+        self.assertRanks(first)
+
+    def test_admin_edit(self):
+        database = self.databases[0]
+        database.load_leaderboard()
+        raw = sqlite3.connect(self.path)
+        with raw:
+            raw.execute("UPDATE konkurs_user SET score = -5 WHERE telegram_id = 1")
+            raw.execute("UPDATE konkurs_user SET score = -2 WHERE telegram_id = 2")
+            raw.execute("UPDATE konkurs_user SET fullname = 'Renamed' WHERE telegram_id = 5")
+        raw.close()
+
+        database.check_versions()
+        self.assertEqual(database.get_top_users_by_score(3),
+                         [("User 3", 0, 3), ("User 4", 0, 4), ("Renamed", 0, 5)])
+        self.assertRanks(database)
+
+    def test_own_writes_keep_index(self):
+        database = self.databases[0]
+        database.load_leaderboard()
+        database.update_user_score(2, 5)
+        database.update_user_score(1, 4)
+        database.check_versions()
+        self.assertTrue(database.score_index.loaded)
+        self.assertTrue(database.leaderboard.loaded)
+        self.assertRanks(database)
+
+
+class SQLiteStorageTest(SimpleTestCase):
+    """Bot jarayonlari uchun umumiy FSM saqlovchi"""
+
+    def setUp(self):
+        # data.config bot sozlamalarini talab qiladi
+        os.environ.setdefault('BOT_TOKEN', '123456:test-token')
+        os.environ.setdefault('ADMINS', '1')
+        from utils.fsm_storage import SQLiteStorage
+
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'fsm.sqlite3')
+        self.storage_class = SQLiteStorage
+
+    def create_storage(self, **kwargs):
+        storage = self.storage_class(self.path, **kwargs)
+
+        async def close():
+            await storage.close()
+            await storage.wait_closed()
+
+        self.addCleanup(lambda: asyncio.run(close()))
+        return storage
+
+    def expire_all(self):
+        raw = sqlite3.connect(self.path)
+        with raw:
+            raw.execute("UPDATE aiogram_fsm SET expires_at = 0")
+        raw.close()
+
+    def fetch_count(self):
+        raw = sqlite3.connect(self.path)
+        try:
+            return raw.execute("SELECT COUNT(*) FROM aiogram_fsm").fetchone()[0]
+        finally:
+            raw.close()
+
+    def test_shared_between_processes(self):
+        first, second = self.create_storage(), self.create_storage()
+
+        async def scenario():
+            await first.set_state(chat=1, user=1, state='form:name')
+            await first.update_data(chat=1, user=1, name='Ali')
+            await second.update_data(chat=1, user=1, age=20)
+            self.assertEqual(await second.get_state(chat=1, user=1), 'form:name')
+            self.assertEqual(await first.get_data(chat=1, user=1), {'name': 'Ali', 'age': 20})
+
+            await second.reset_state(chat=1, user=1)
+            self.assertIsNone(await first.get_state(chat=1, user=1))
+            self.assertEqual(await first.get_data(chat=1, user=1), {})
+
+        asyncio.run(scenario())
+        self.assertEqual(self.fetch_count(), 0)
+
+    def test_expired_row_not_revived(self):
+        # Davriy tozalash ishlamaydi: eskirgan qator jadvalda qoladi
+        storage = self.create_storage(ttl=3600, purge_interval=3600)
+
+        async def write():
+            await storage.set_state(chat=1, user=1, state='form:name')
+            await storage.set_data(chat=1, user=1, data={'name': 'Ali'})
+            await storage.set_bucket(chat=1, user=1, bucket={'count': 3})
+
+        async def after_expiry():
+            await storage.set_state(chat=1, user=1, state='form:age')
+            self.assertEqual(await storage.get_data(chat=1, user=1), {})
+            self.assertEqual(await storage.get_bucket(chat=1, user=1), {})
+
+            await storage.update_bucket(chat=1, user=1, count=1)
+            self.assertEqual(await storage.get_bucket(chat=1, user=1), {'count': 1})
+
+        asyncio.run(write())
+        self.expire_all()
+        asyncio.run(after_expiry())
+
+    def test_update_after_expiry(self):
+        storage = self.create_storage(ttl=3600, purge_interval=3600)
+
+        asyncio.run(storage.set_data(chat=1, user=1, data={'name': 'Ali', 'age': 20}))
+        self.expire_all()
+        asyncio.run(storage.update_data(chat=1, user=1, age=21))
+        self.assertEqual(asyncio.run(storage.get_data(chat=1, user=1)), {'age': 21})
+
+    def test_shared_token_bucket(self):
+        first, second = self.create_storage(), self.create_storage()
+
+        async def scenario():
+            # 10 soniyada bitta token, ketma-ket 2 ta so'rov
+            self.assertEqual(await first.consume_token('antiflood_start', 1, 10, burst=2), (0, 0.0))
+            self.assertEqual(await second.consume_token('antiflood_start', 1, 10, burst=2), (0, 0.0))
+            exceeded, retry_after = await first.consume_token('antiflood_start', 1, 10, burst=2)
+            self.assertEqual(exceeded, 1)
+            self.assertTrue(0 < retry_after <= 10)
+            self.assertEqual((await second.consume_token('antiflood_start', 1, 10, burst=2))[0], 2)
+
+            self.assertEqual(await second.consume_token('antiflood_start', 2, 10, burst=2), (0, 0.0))
+            self.assertEqual(await second.consume_token('antiflood_help', 1, 10, burst=2), (0, 0.0))
+
+        asyncio.run(scenario())
+
+        # Bucket to'lgandan keyin yozuv ham, rad etishlar soni ham qolmaydi
+        raw = sqlite3.connect(self.path)
+        with raw:
+            raw.execute("UPDATE aiogram_throttle SET full_at = 0")
+        raw.close()
+        storage = self.create_storage()
+        self.assertEqual(asyncio.run(storage.consume_token('antiflood_start', 1, 10, burst=2)), (0, 0.0))
+        self.assertEqual(asyncio.run(storage.consume_token('antiflood_start', 1, 10, burst=2)), (0, 0.0))
+        self.assertEqual(asyncio.run(storage.consume_token('antiflood_start', 1, 10, burst=2))[0], 1)
+
+
+class MembershipCacheTest(SimpleTestCase):
+    """Obuna natijalari keshi va tugma orqali qayta tekshirish"""
+
+    def setUp(self):
+        os.environ.setdefault('BOT_TOKEN', '123456:test-token')
+        os.environ.setdefault('ADMINS', '1')
+        from utils.misc import subscription
+
+        self.subscription = subscription
+        self.now = 1000.0
+        patcher = mock.patch.object(subscription.time, 'monotonic', lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def create_cache(self, max_size=10):
+        return self.subscription.MembershipCache(positive_ttl=60, negative_ttl=3, max_size=max_size)
+
+    def test_positive_and_negative_ttl(self):
+        cache = self.create_cache()
+        cache.set('@kanal', 1, True)
+        cache.set('@kanal', 2, False)
+        self.now += 2
+        self.assertIs(cache.get('@kanal', 1), True)
+        self.assertIs(cache.get('@kanal', 2), False)
+        self.now += 2
+        self.assertIs(cache.get('@kanal', 1), True)
+        self.assertIsNone(cache.get('@kanal', 2))
+        self.now += 60
+        self.assertIsNone(cache.get('@kanal', 1))
+        self.assertEqual(cache.stats()['size'], 0)
+
+    def test_positive_only(self):
+        cache = self.create_cache()
+        cache.set('@kanal', 1, True)
+        cache.set('@kanal', 2, False)
+        self.assertIs(cache.get('@kanal', 1, positive_only=True), True)
+        self.assertIsNone(cache.get('@kanal', 2, positive_only=True))
+        # Salbiy yozuv /start uchun qoladi
+        self.assertIs(cache.get('@kanal', 2), False)
+
+    def test_lru_eviction(self):
+        cache = self.create_cache(max_size=2)
+        cache.set('@kanal', 1, True)
+        cache.set('@kanal', 2, True)
+        cache.get('@kanal', 1)
+        cache.set('@kanal', 3, True)
+        self.assertIs(cache.get('@kanal', 1), True)
+        self.assertIsNone(cache.get('@kanal', 2))
+        self.assertIs(cache.get('@kanal', 3), True)
+        self.assertEqual(cache.stats()['evictions'], 1)
+
+    def test_invalidate(self):
+        cache = self.create_cache()
+        cache.set('@kanal', 1, True)
+        cache.invalidate('@kanal', 1)
+        cache.invalidate('@kanal', 2)
+        self.assertIsNone(cache.get('@kanal', 1))
+
+    def test_stats(self):
+        cache = self.create_cache()
+        self.assertEqual(cache.stats()['hit_ratio'], 0.0)
+        cache.set('@kanal', 1, True)
+        cache.get('@kanal', 1)
+        cache.get('@kanal', 1)
+        cache.get('@kanal', 2)
+        cache.set('@kanal', 2, False)
+        cache.get('@kanal', 2, positive_only=True)
+        self.assertEqual(cache.stats(), {
+            'size': 2, 'hits': 2, 'misses': 2, 'evictions': 0, 'hit_ratio': 0.5,
+        })
+
+    def test_explicit_check_skips_negative_cache(self):
+        subscription = self.subscription
+        cache = self.create_cache()
+        statuses = ['left']
+        bot = mock.Mock()
+
+        async def get_chat_member(chat_id, user_id):
+            return mock.Mock(status=statuses[0])
+
+        bot.get_chat_member = mock.Mock(side_effect=get_chat_member)
+
+        async def check(**kwargs):
+            subscription._semaphore = None
+            return await subscription.is_member(bot, '@kanal', 1, **kwargs)
+
+        with mock.patch.object(subscription, 'membership_cache', cache):
+            self.assertIs(asyncio.run(check()), False)
+            # Foydalanuvchi obuna bo'ldi, /start hali keshdagi natijani ko'radi
+            statuses[0] = 'member'
+            self.assertIs(asyncio.run(check()), False)
+            self.assertEqual(bot.get_chat_member.call_count, 1)
+            # "Obuna bo'ldim" tugmasi API dan qayta so'raydi
+            self.assertIs(asyncio.run(check(use_negative_cache=False)), True)
+            self.assertEqual(bot.get_chat_member.call_count, 2)
+            # Ijobiy natija keshdan olinadi
+            self.assertIs(asyncio.run(check(use_negative_cache=False)), True)
+            self.assertIs(asyncio.run(check()), True)
+            self.assertEqual(bot.get_chat_member.call_count, 2)
+
+
+class SendSchedulerTest(SimpleTestCase):
+    """Chiquvchi xabarlar navbati: umumiy va chat limitlari, RetryAfter"""
+
+    def setUp(self):
+        os.environ.setdefault('BOT_TOKEN', '123456:test-token')
+        os.environ.setdefault('ADMINS', '1')
+        from utils.send_scheduler import SendScheduler
+
+        self.scheduler_class = SendScheduler
+
+    def run_sends(self, scheduler, chat_ids, errors=None):
+        """Har bir chatga bittadan xabar; qaytadi: [(chat_id, yuborilgan vaqt)]"""
+        errors = dict(errors or {})
+        sent = []
+
+        def make_call(chat_id):
+            async def call():
+                error = errors.pop(chat_id, None)
+                if error is not None:
+                    raise error
+                sent.append((chat_id, time.monotonic()))
+                return chat_id
+            return call
+
+        async def main():
+            results = await asyncio.gather(*(
+                scheduler.submit(chat_id, make_call(chat_id)) for chat_id in chat_ids
+            ), return_exceptions=True)
+            await scheduler.close()
+            return results
+
+        started = time.monotonic()
+        results = asyncio.run(main())
+        return results, [(chat_id, at - started) for chat_id, at in sent]
+
+    def test_global_burst(self):
+        scheduler = self.scheduler_class(global_rate=20, global_burst=2)
+        results, sent = self.run_sends(scheduler, range(1, 7))
+        self.assertEqual(results, list(range(1, 7)))
+        times = [at for _, at in sent]
+        # Dastlab faqat global_burst ta xabar birdaniga ketadi
+        self.assertLess(times[1], 0.04)
+        self.assertGreaterEqual(times[2], 0.04)
+        # Keyin 1 / global_rate oralig'ida
+        self.assertGreaterEqual(times[-1], 4 * 0.05 - 0.01)
+
+    def test_per_chat_interval(self):
+        scheduler = self.scheduler_class(global_rate=1000, private_interval=0.2, chat_burst=1)
+        results, sent = self.run_sends(scheduler, [1, 1, 1, 2, 3])
+        self.assertEqual(results, [1, 1, 1, 2, 3])
+        first = [at for chat_id, at in sent if chat_id == 1]
+        self.assertEqual(len(first), 3)
+        self.assertGreaterEqual(first[1] - first[0], 0.19)
+        self.assertGreaterEqual(first[2] - first[1], 0.19)
+        # Limiti to'lgan chat boshqa chatlarni to'smaydi
+        others = [at for chat_id, at in sent if chat_id != 1]
+        self.assertTrue(all(at < 0.1 for at in others))
+
+    def test_group_interval(self):
+        scheduler = self.scheduler_class(global_rate=1000, private_interval=0.01,
+                                         group_interval=0.2, chat_burst=1)
+        _, sent = self.run_sends(scheduler, [-100, -100, '@kanal', '@kanal'])
+        for key in (-100, '@kanal'):
+            times = [at for chat_id, at in sent if chat_id == key]
+            self.assertGreaterEqual(times[1] - times[0], 0.19)
+
+    def test_retry_after_pauses_chat(self):
+        from aiogram.utils.exceptions import RetryAfter
+
+        scheduler = self.scheduler_class(global_rate=1000, private_interval=0.01)
+        results, sent = self.run_sends(scheduler, [1, 2], errors={1: RetryAfter(1)})
+        self.assertEqual(results, [1, 2])
+        times = dict(sent)
+        self.assertLess(times[2], 0.5)
+        self.assertGreaterEqual(times[1], 0.99)
+        stats = scheduler.stats()
+        self.assertEqual((stats['sent'], stats['retried'], stats['failed']), (2, 1, 0))
+
+    def test_retry_after_gives_up(self):
+        from aiogram.utils.exceptions import RetryAfter
+
+        scheduler = self.scheduler_class(global_rate=1000, max_retries=0)
+        results, sent = self.run_sends(scheduler, [1], errors={1: RetryAfter(1)})
+        self.assertIsInstance(results[0], RetryAfter)
+        self.assertEqual(sent, [])
+        self.assertEqual(scheduler.stats()['failed'], 1)
+
+
+class TokenBucketTest(SimpleTestCase):
+    """Xotiradagi token bucketlarning avlodlari"""
+
+    def setUp(self):
+        os.environ.setdefault('BOT_TOKEN', '123456:test-token')
+        os.environ.setdefault('ADMINS', '1')
+        from utils.misc.throttling import TokenBucket
+
+        self.now = 0.0
+        self.bucket_class = TokenBucket
+
+    def create_bucket(self, **kwargs):
+        return self.bucket_class(clock=lambda: self.now, **kwargs)
+
+    def test_idle_rotation(self):
+        bucket = self.create_bucket(rate=1, burst=1, idle_timeout=10)
+        self.assertEqual(bucket.consume(1), 0)
+        self.now = 10
+        bucket.consume(2)
+        self.assertEqual(len(bucket), 2)
+        self.now = 20
+        bucket.consume(2)
+        # 1 ning yozuvi 20 soniya ishlatilmadi
+        self.assertEqual(len(bucket), 1)
+
+    def test_size_rotation_keeps_refilling_buckets(self):
+        bucket = self.create_bucket(rate=10, burst=3, max_users=3, idle_timeout=60)
+        self.assertEqual([bucket.consume(1) for _ in range(4)], [0, 0, 0, 1])
+        bucket.consume(2)
+        bucket.consume(3)
+        # 1 ning bucketi 30 da to'ladi, qolganlari 10 soniyada
+        self.now = 11
+        for key in (4, 5, 6):
+            bucket.consume(key)
+        self.now = 21.5
+        bucket.consume(7)
+        self.assertLessEqual(len(bucket), 6)
+        self.assertEqual([bucket.consume(1) for _ in range(3)], [0, 0, 1])
+        self.assertAlmostEqual(bucket.retry_after(1), 8.5)
+
+    def test_size_rotation_keeps_exceeded(self):
+        bucket = self.create_bucket(rate=10, burst=1, max_users=2, idle_timeout=60)
+        bucket.consume(1)
+        self.assertEqual(bucket.consume(1), 1)
+        bucket.consume(2)
+        bucket.consume(3)
+        self.assertEqual(bucket.consume(1), 2)
+
+    def test_memory_bound_when_all_buckets_refill(self):
+        bucket = self.create_bucket(rate=10, burst=1, max_users=3, idle_timeout=60)
+        for key in range(100):
+            bucket.consume(key)
+            self.assertLessEqual(len(bucket), 6)
+        # Eng oxirgi kalitlar esda qoladi
+        self.assertEqual(bucket.consume(99), 1)
+
+
+class WriteBehindQueueTest(BotDataBaseTestCase):
+    """Yozuvlarni guruhlab commit qiluvchi navbat"""
+
+    ADD_SCORE = "UPDATE konkurs_user SET score = score + ? WHERE telegram_id = ? RETURNING score"
+
+    def initial_users(self):
+        return [(1, 1001, None), (2, 1002, None), (3, 1003, None)]
+
+    def create_queue(self, **kwargs):
+        from data.write_behind import WriteBehindQueue
+
+        queue = WriteBehindQueue(self.databases[0], **kwargs)
+        self.addCleanup(queue.close)
+        return queue
+
+    def scores(self):
+        raw = sqlite3.connect(self.path)
+        try:
+            return dict(raw.execute("SELECT telegram_id, score FROM konkurs_user"))
+        finally:
+            raw.close()
+
+    def submit_concurrently(self, queue, calls):
+        """Har bir ``(sql, parameters, telegram_ids)`` ni alohida oqimda yuborish"""
+        results = [None] * len(calls)
+
+        def run(index):
+            try:
+                results[index] = queue.submit(*calls[index])
+            except Exception as err:
+                results[index] = err
+
+        threads = [threading.Thread(target=run, args=(index,)) for index in range(len(calls))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+
+    def test_unknown_durability(self):
+        with self.assertRaises(ValueError):
+            self.create_queue(durability='sometimes')
+
+    def test_commit_durability(self):
+        queue = self.create_queue()
+        self.assertEqual(queue.submit(self.ADD_SCORE, (5, 1001), (1001,)), (5,))
+        self.assertEqual(self.scores()[1001], 5)
+
+    def test_queued_durability(self):
+        queue = self.create_queue(max_delay=60, durability='queued')
+        self.assertIsNone(queue.submit(self.ADD_SCORE, (5, 1001), (1001,)))
+        self.assertEqual(self.scores()[1001], 0)
+        queue.wait_for(1001)
+        self.assertEqual(self.scores()[1001], 5)
+
+    def test_batching(self):
+        queue = self.create_queue(max_delay=0.5, durability='queued')
+        for telegram_id in (1001, 1002, 1003, 1001):
+            queue.submit(self.ADD_SCORE, (1, telegram_id), (telegram_id,))
+        queue.close()
+        self.assertEqual((queue.batches, queue.committed), (1, 4))
+        self.assertEqual(self.scores(), {1001: 2, 1002: 1, 1003: 1})
+
+    def test_max_batch(self):
+        queue = self.create_queue(max_batch=2, max_delay=60, durability='queued')
+        for telegram_id in (1001, 1002, 1003):
+            queue.submit(self.ADD_SCORE, (1, telegram_id), (telegram_id,))
+        queue.close()
+        self.assertEqual((queue.batches, queue.committed), (2, 3))
+        self.assertEqual(self.scores(), {1001: 1, 1002: 1, 1003: 1})
+
+    def test_commit_batch_is_capped_by_writers(self):
+        queue = self.create_queue(max_batch=200, max_delay=0.5)
+        results = self.submit_concurrently(queue, [
+            (self.ADD_SCORE, (1, telegram_id), (telegram_id,)) for telegram_id in (1001, 1002, 1003)
+        ])
+        self.assertEqual(results, [(1,), (1,), (1,)])
+        # Har bir yozuvchi commitni kutadi: guruhda 3 tadan ortiq yozuv bo'lmaydi
+        self.assertEqual((queue.batches, queue.committed), (1, 3))
+
+    def test_wait_for(self):
+        queue = self.create_queue(max_delay=60, durability='queued')
+        queue.submit(self.ADD_SCORE, (1, 1002), (1002,))
+        started = time.monotonic()
+        # Navbatda yozuvi yo'q foydalanuvchi kutmaydi
+        queue.wait_for(1001)
+        self.assertEqual(self.scores()[1002], 0)
+        queue.wait_for(1001, 1002)
+        self.assertLess(time.monotonic() - started, 10)
+        self.assertEqual(self.scores()[1002], 1)
+
+    def test_close_commits_pending(self):
+        queue = self.create_queue(max_delay=60, durability='queued')
+        queue.submit(self.ADD_SCORE, (3, 1003), (1003,))
+        started = time.monotonic()
+        queue.close()
+        self.assertLess(time.monotonic() - started, 10)
+        self.assertEqual(self.scores()[1003], 3)
+        with self.assertRaises(RuntimeError):
+            queue.submit(self.ADD_SCORE, (1, 1003), (1003,))
+
+    def test_failed_write_keeps_batch(self):
+        def add_then_fail(connection, parameters):
+            connection.execute(self.ADD_SCORE, parameters)
+            raise ValueError("bekor qilinadi")
+
+        queue = self.create_queue(max_delay=0.5)
+        results = self.submit_concurrently(queue, [
+            (self.ADD_SCORE, (1, 1001), (1001,)),
+            # telegram_id takrorlanmas: IntegrityError
+            ("UPDATE konkurs_user SET telegram_id = 1001 WHERE telegram_id = ?", (1002,), (1002,)),
+            (add_then_fail, (10, 1003), (1003,)),
+        ])
+        self.assertEqual(results[0], (1,))
+        self.assertIsInstance(results[1], sqlite3.IntegrityError)
+        self.assertIsInstance(results[2], ValueError)
+        self.assertEqual(queue.batches, 1)
+        # Xato bergan yozuvlarning o'zgarishlari SAVEPOINT bilan bekor qilingan
+        self.assertEqual(self.scores(), {1001: 1, 1002: 0, 1003: 0})
+
+    def test_failed_write_queued(self):
+        queue = self.create_queue(max_delay=0.5, durability='queued')
+        with self.assertLogs(level='ERROR') as logs:
+            queue.submit(self.ADD_SCORE, (1, 1001), (1001,))
+            queue.submit("UPDATE konkurs_user SET telegram_id = 1001 WHERE telegram_id = ?", (1002,), (1002,))
+            queue.submit(self.ADD_SCORE, (1, 1003), (1003,))
+            queue.close()
+        self.assertIn('IntegrityError', logs.output[0])
+        self.assertEqual(self.scores(), {1001: 1, 1002: 0, 1003: 1})
+
+
+class ScoreIndexTest(SimpleTestCase):
+    """Ballar bo'yicha o'rinni hisoblovchi Fenwick daraxti"""
+
+    def setUp(self):
+        os.environ.setdefault('BOT_TOKEN', '123456:test-token')
+        os.environ.setdefault('ADMINS', '1')
+        from data.leaderboard import ScoreIndex
+
+        self.index_class = ScoreIndex
+
+    def assertRanks(self, index, scores, probes):
+        for score in probes:
+            expected = sum(1 for other in scores if other > score) + 1
+            self.assertEqual(index.rank(score), expected, f"score={score}, scores={sorted(scores)}")
+
+    def test_not_loaded(self):
+        index = self.index_class()
+        index.update(None, 5)
+        self.assertIsNone(index.rank(5))
+        index.load([(5, 1)])
+        index.invalidate()
+        self.assertIsNone(index.rank(5))
+
+    def test_ties(self):
+        index = self.index_class()
+        index.load([(10, 3), (7, 2), (0, 4)])
+        self.assertEqual(index.rank(10), 1)
+        self.assertEqual(index.rank(7), 4)
+        self.assertEqual(index.rank(0), 6)
+        self.assertEqual(index.rank(8), 4)
+        self.assertEqual(index.rank(11), 1)
+
+    def test_grow(self):
+        index = self.index_class(capacity=4)
+        index.load([(1, 2), (3, 1)])
+        index.update(None, 100)
+        index.update(3, 1000)
+        self.assertGreater(index.capacity, 1000)
+        self.assertRanks(index, [1, 1, 100, 1000], [0, 1, 2, 3, 50, 100, 999, 1000, 5000])
+
+    def test_negative_scores(self):
+        index = self.index_class(capacity=4)
+        index.load([(-5, 1), (-1, 2), (2, 1)])
+        self.assertRanks(index, [-5, -1, -1, 2], [-6, -5, -2, -1, 0, 2, 3])
+        # Manfiy ballar bilan ham sig'im to'g'ri oshadi
+        index.update(-5, 10)
+        index.update(-1, None)
+        self.assertRanks(index, [10, -1, 2], [-6, -1, 0, 2, 9, 10, 11])
+
+    def test_score_decrease(self):
+        index = self.index_class()
+        index.load([(5, 1), (3, 1)])
+        index.update(5, 1)
+        self.assertRanks(index, [1, 3], [0, 1, 2, 3, 5])
+
+    def test_random_operations(self):
+        rng = random.Random(6)
+        index = self.index_class(capacity=2)
+        users = [rng.randint(-3, 20) for _ in range(50)]
+        index.load([(score, users.count(score)) for score in set(users)])
+        for _ in range(2000):
+            operation = rng.random()
+            if operation < 0.1 or not users:
+                score = rng.randint(-5, 300)
+                users.append(score)
+                index.update(None, score)
+            elif operation < 0.2:
+                index.update(users.pop(rng.randrange(len(users))), None)
+            else:
+                position = rng.randrange(len(users))
+                old_score = users[position]
+                users[position] = max(-5, old_score + rng.randint(-10, 30))
+                index.update(old_score, users[position])
+            self.assertEqual(index.total, len(users))
+            self.assertRanks(index, users, [rng.randint(-6, 400)] + rng.sample(users, min(3, len(users))))
+
+
+class BroadcastResumeTest(BotDataBaseTestCase):
+    """To'xtatilgan xabar yuborish keyingi ishga tushishda davom etadi"""
+
+    BLOCKED = {1004, 1015}
+
+    def initial_users(self):
+        return [(pk, 1000 + pk, None) for pk in range(1, 31)]
+
+    def setUp(self):
+        super().setUp()
+        os.environ.setdefault('BOT_TOKEN', '123456:test-token')
+        os.environ.setdefault('ADMINS', '1')
+        from data import config
+
+        raw = sqlite3.connect(self.path)
+        with raw:
+            raw.execute("UPDATE konkurs_user SET is_active = 0 WHERE telegram_id = 1020")
+            raw.execute(
+                """
+                INSERT INTO konkurs_broadcast (
+                    id, text, status, last_user_id, total_users, sent_count, blocked_count,
+                    failed_count, messages_per_second, created_at
+                )
+                VALUES (1, 'Salom', 'running', 0, 0, 0, 0, 0, 0, datetime('now'))
+                """
+            )
+        raw.close()
+        for name, value in (('BROADCAST_CHUNK_SIZE', 7), ('BROADCAST_WINDOW', 3), ('BROADCAST_SAVE_INTERVAL', 0)):
+            patcher = mock.patch.object(config, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.sent = []
+
+    def create_bot(self, cancel_after=None):
+        from aiogram.utils.exceptions import BotBlocked
+
+        bot = mock.Mock()
+        bot.reached = asyncio.Event()
+
+        async def send_message(chat_id, text):
+            await asyncio.sleep(0.005)
+            if chat_id in self.BLOCKED:
+                raise BotBlocked('Forbidden: bot was blocked by the user')
+            self.sent.append(chat_id)
+            if cancel_after is not None and len(self.sent) >= cancel_after:
+                bot.reached.set()
+
+        bot.send_message = send_message
+        return bot
+
+    def run_broadcast(self, owner, bot, cancel=False):
+        from data.commands import AsyncDataBase
+        from utils.misc.broadcast import run_broadcast
+
+        async def main():
+            db = AsyncDataBase(self.databases[0], read_workers=1, write_workers=1)
+            try:
+                broadcast = await db.get_running_broadcast()
+                task = asyncio.create_task(run_broadcast(db, bot, broadcast, owner))
+                if cancel:
+                    await bot.reached.wait()
+                    task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+            finally:
+                await db.close()
+
+        with self.assertLogs(level='INFO'):
+            asyncio.run(main())
+
+    def broadcast_row(self):
+        return self.fetchone(
+            "SELECT status, last_user_id, total_users, sent_count, blocked_count, failed_count, lease_owner "
+            "FROM konkurs_broadcast WHERE id = 1"
+        )
+
+    def test_cancel_and_resume(self):
+        from data.commands import DataBase
+
+        self.run_broadcast('bot-1', self.create_bot(cancel_after=10), cancel=True)
+        status, last_user_id, total, sent, blocked, failed, lease_owner = self.broadcast_row()
+        self.assertEqual((status, total, lease_owner), ('running', 29, None))
+        self.assertLess(last_user_id, 30)
+        self.assertEqual(sent, len(self.sent))
+        self.assertEqual(sent + blocked, sum(1 for pk in range(1, last_user_id + 1) if pk != 20))
+        interrupted = list(self.sent)
+
+        # Boshqa jarayon davom ettiradi
+        self.databases[0] = DataBase(self.path, timeout=60)
+        self.addCleanup(self.databases[0].close)
+        self.run_broadcast('bot-2', self.create_bot())
+        self.assertEqual(self.broadcast_row(), ('done', 30, 29, 27, 2, 0, None))
+
+        self.assertGreater(len(self.sent), len(interrupted))
+        self.assertEqual(len(self.sent), len(set(self.sent)))
+        expected = {1000 + pk for pk in range(1, 31)} - self.BLOCKED - {1020}
+        self.assertEqual(set(self.sent), expected)
+        self.assertEqual(
+            self.fetchone("SELECT COUNT(*) FROM konkurs_user WHERE is_active = 0 AND telegram_id IN (1004, 1015)"),
+            (2,)
+        )
+
+
+class QueryLogTest(SimpleTestCase):
+    """Sekin SQL so'rovlar jurnali"""
+
+    def setUp(self):
+        from data.query_log import QueryLog
+
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'queries.log')
+        self.log_class = QueryLog
+
+    def create_log(self, sample=None, **kwargs):
+        query_log = self.log_class(self.path, **kwargs)
+        for handler in query_log._logger.handlers:
+            self.addCleanup(handler.close)
+        if sample is not None:
+            query_log._random = sample
+        raw = sqlite3.connect(':memory:', factory=query_log.connection_class)
+        self.addCleanup(raw.close)
+        raw.execute("CREATE TABLE person (id INTEGER PRIMARY KEY, name TEXT)")
+        raw.execute("CREATE INDEX person_name ON person (name)")
+        return query_log, raw
+
+    def entries(self):
+        with open(self.path, encoding='utf-8') as file:
+            return [json.loads(line) for line in file]
+
+    def test_threshold(self):
+        _, raw = self.create_log(threshold=0)
+        raw.execute("INSERT INTO person (name) VALUES (?)", ('Maxfiy Ism',))
+        raw.execute("SELECT id\n    FROM person WHERE name = ?", ('Maxfiy Ism',)).fetchall()
+        entries = self.entries()
+        self.assertEqual(len(entries), 4)
+        self.assertTrue(all(entry['slow'] for entry in entries))
+        select = entries[-1]
+        self.assertEqual(select['sql'], "SELECT id FROM person WHERE name = ?")
+        self.assertEqual(select['parameters'], {'count': 1, 'types': {'str': 1}})
+        self.assertGreaterEqual(select['duration_ms'], 0)
+        # Parametr qiymatlari jurnalga tushmaydi
+        with open(self.path, encoding='utf-8') as file:
+            self.assertNotIn('Maxfiy', file.read())
+
+    def test_fast_queries_not_logged(self):
+        _, raw = self.create_log(threshold=10)
+        raw.execute("SELECT * FROM person").fetchall()
+        self.assertEqual(self.entries(), [])
+
+    def test_sample_rate(self):
+        # Jadval yaratish so'rovlari tanlanmaydi
+        values = iter([0.9, 0.9, 0.1, 0.9, 0.3])
+        _, raw = self.create_log(threshold=10, sample_rate=0.5, sample=lambda: next(values))
+        for person_id in range(3):
+            raw.execute("SELECT * FROM person WHERE id = ?", (person_id,))
+        entries = self.entries()
+        self.assertEqual(len(entries), 2)
+        self.assertFalse(any(entry['slow'] for entry in entries))
+        # Tasodifiy tanlangan tez so'rovlar uchun EXPLAIN qilinmaydi
+        self.assertFalse(any('plan' in entry for entry in entries))
+
+    def test_explain_first_slow_occurrence(self):
+        _, raw = self.create_log(threshold=0)
+        raw.execute("SELECT id FROM person WHERE name = ?", ('a',))
+        raw.execute("SELECT id FROM person  WHERE name = ?", ('b',))
+        raw.execute("SELECT id FROM person WHERE id = ?", (1,))
+        entries = self.entries()
+        # CREATE TABLE va CREATE INDEX EXPLAIN qilinmaydi
+        self.assertNotIn('plan', entries[0])
+        self.assertNotIn('plan', entries[1])
+        self.assertEqual(len(entries[2]['plan']), 1)
+        self.assertIn('person_name', entries[2]['plan'][0])
+        self.assertNotIn('plan', entries[3])
+        self.assertIn('plan', entries[4])
+
+    def test_error(self):
+        _, raw = self.create_log(threshold=0)
+        with self.assertRaises(sqlite3.OperationalError):
+            raw.execute("SELECT missing FROM person")
+        raw.executemany("INSERT INTO person (name) VALUES (?)", [('a',), ('b',)])
+        entries = self.entries()
+        self.assertIn('OperationalError', entries[2]['error'])
+        self.assertEqual(entries[2]['plan'], ["EXPLAIN failed: no such column: missing"])
+        self.assertIsNone(entries[3]['parameters'])
+
+
+class MetricsTest(SimpleTestCase):
+    """``/metrics`` uchun Prometheus text formati"""
+
+    SAMPLE = re.compile(r'^([a-zA-Z_:][a-zA-Z0-9_:]*)(?:\{(.*)\})? (\S+)$')
+    LABEL = re.compile(r'([a-zA-Z_][a-zA-Z0-9_]*)="((?:[^"\\]|\\.)*)"(?:,|$)')
+
+    def setUp(self):
+        os.environ.setdefault('BOT_TOKEN', '123456:test-token')
+        os.environ.setdefault('ADMINS', '1')
+        from utils import metrics
+
+        self.metrics = metrics
+        self.registry = metrics.Registry()
+
+    def parse(self, text):
+        """{metrika nomi: (HELP, TYPE)} va [(nom, {label: qiymat}, son)]"""
+        self.assertTrue(text.endswith('\n'))
+        metadata, samples = {}, []
+        for line in text[:-1].split('\n'):
+            if line.startswith('# HELP '):
+                name, documentation = line[len('# HELP '):].split(' ', 1)
+                metadata[name] = [documentation, None]
+            elif line.startswith('# TYPE '):
+                name, type_ = line[len('# TYPE '):].split(' ')
+                metadata[name][1] = type_
+            else:
+                match = self.SAMPLE.match(line)
+                self.assertIsNotNone(match, line)
+                name, labels, value = match.groups()
+                parsed = {}
+                if labels:
+                    pairs = self.LABEL.findall(labels)
+                    self.assertEqual(''.join(f'{key}="{raw}",' for key, raw in pairs), labels + ',')
+                    unescape = {'\\\\': '\\', '\\n': '\n', '\\"': '"'}
+                    parsed = {key: re.sub(r'\\.', lambda m: unescape[m.group()], raw) for key, raw in pairs}
+                samples.append((name, parsed, float(value)))
+        return {name: tuple(value) for name, value in metadata.items()}, samples
+
+    def test_histogram(self):
+        histogram = self.registry.register(self.metrics.Histogram(
+            'test_seconds', "Test vaqti", ('method',), buckets=(0.5, 0.1, 1)
+        ))
+        for value in (0.05, 0.1, 0.3, 0.5, 2):
+            histogram.observe(value, 'get')
+        histogram.observe(0.7, 'set')
+        metadata, samples = self.parse(self.registry.render())
+        self.assertEqual(metadata, {'test_seconds': ("Test vaqti", 'histogram')})
+
+        buckets = {
+            (labels['method'], labels['le']): value
+            for name, labels, value in samples if name == 'test_seconds_bucket'
+        }
+        # Chegaraga teng qiymat shu bucketga tushadi, qiymatlar kumulyativ
+        self.assertEqual(buckets, {
+            ('get', '0.1'): 2, ('get', '0.5'): 4, ('get', '1'): 4, ('get', '+Inf'): 5,
+            ('set', '0.1'): 0, ('set', '0.5'): 0, ('set', '1'): 1, ('set', '+Inf'): 1,
+        })
+        totals = {(name, labels['method']): value for name, labels, value in samples if 'le' not in labels}
+        self.assertAlmostEqual(totals[('test_seconds_sum', 'get')], 2.95)
+        self.assertEqual(totals[('test_seconds_count', 'get')], 5)
+        self.assertAlmostEqual(totals[('test_seconds_sum', 'set')], 0.7)
+        self.assertEqual(totals[('test_seconds_count', 'set')], 1)
+
+    def test_label_escaping(self):
+        counter = self.registry.register(self.metrics.Counter('test_errors_total', "Xatolar", ('error',)))
+        message = 'qo\'shtirnoq " teskari \\ chiziq\nyangi qator'
+        counter.inc(message)
+        counter.inc(message, amount=2)
+        counter.inc('oddiy')
+        text = self.registry.render()
+        self.assertEqual(len(text.splitlines()), 4)
+        metadata, samples = self.parse(text)
+        self.assertEqual(metadata, {'test_errors_total': ("Xatolar", 'counter')})
+        self.assertEqual(samples, [
+            ('test_errors_total', {'error': message}, 3),
+            ('test_errors_total', {'error': 'oddiy'}, 1),
+        ])
+
+    def test_callback_gauges(self):
+        stats = {'queued': 4, 'sent': 10}
+        self.registry.register(self.metrics.CallbackGauge('test_size', "Hajm", lambda: 7))
+        self.metrics.register_stats(
+            'test_queue', "Navbat", lambda: stats, {'queued': 'queued', 'sent': 'sent'},
+            registry=self.registry,
+        )
+        self.registry.register(self.metrics.CallbackGauge('test_broken', "Xato", lambda: 1 / 0))
+        with self.assertLogs(level='WARNING'):
+            metadata, samples = self.parse(self.registry.render())
+        # Xato bergan o'lchov butunlay tashlab ketiladi
+        self.assertEqual(metadata, {'test_size': ("Hajm", 'gauge'), 'test_queue': ("Navbat", 'gauge')})
+        self.assertEqual(samples, [
+            ('test_size', {}, 7),
+            ('test_queue', {'state': 'queued'}, 4),
+            ('test_queue', {'state': 'sent'}, 10),
+        ])
+        with self.assertRaises(ValueError):
+            self.registry.register(self.metrics.Counter('test_size', "Takror"))
@@ -1,12 +1,44 @@
-from aiogram import executor
+import asyncio
 
-from loader import dp
+from aiogram import executor, types
+
+from data import config
+from loader import bot, dp, db
 import middlewares, filters, handlers,keyboards
+from utils.misc.broadcast import broadcast_worker
+from utils.misc.cache import cache_version_watcher
+from utils.misc.statistics import reconcile_statistics, statistics_worker
+from utils.misc.subscription import tracked_channels_worker
+from utils.metrics import start_metrics_server
 from utils.notify_admins import on_startup_notify
 from utils.set_bot_commands import set_default_commands
+from utils.webhook import start_webhook
+
+# chat_member Telegramning standart ro'yxatida yo'q, u alohida so'ralishi kerak
+ALLOWED_UPDATES = types.AllowedUpdates.all()
 
 
 async def on_startup(dispatcher):
+    # Prometheus o'lchovlari
+    if config.METRICS_PORT:
+        dispatcher['metrics_server'] = await start_metrics_server(config.METRICS_HOST, config.METRICS_PORT)
+
+    # Reytingni xotiraga yuklash
+    await db.load_leaderboard()
+
+    # Bugungi statistikani tekshirish va kunlik qatorni yuritishni boshlash
+    await reconcile_statistics(db)
+    dispatcher['statistics_worker'] = asyncio.create_task(statistics_worker(db))
+
+    # Admin paneldagi o'zgarishlarni kuzatish
+    dispatcher['cache_version_watcher'] = asyncio.create_task(cache_version_watcher(db))
+
+    # Bot admin bo'lgan kanallarda obunalar chat_member updatelari orqali kuzatiladi
+    dispatcher['tracked_channels_worker'] = asyncio.create_task(tracked_channels_worker(db, dispatcher.bot))
+
+    # Admin panelda boshlangan xabar yuborishlar
+    dispatcher['broadcast_worker'] = asyncio.create_task(broadcast_worker(db, dispatcher.bot))
+
     # Birlamchi komandalar (/star va /help)
     await set_default_commands(dispatcher)
 
@@ -14,5 +46,28 @@ async def on_startup(dispatcher):
     await on_startup_notify(dispatcher)
 
 
+async def on_shutdown(dispatcher):
+    # Xabar yuborish progressini saqlab to'xtatish
+    dispatcher['broadcast_worker'].cancel()
+    await asyncio.gather(dispatcher['broadcast_worker'], return_exceptions=True)
+
+    # Navbatdagi xabarlarni yuborib bo'lish
+    await bot.scheduler.close(config.SEND_SHUTDOWN_TIMEOUT)
+
+    dispatcher['cache_version_watcher'].cancel()
+    dispatcher['tracked_channels_worker'].cancel()
+
+    dispatcher['statistics_worker'].cancel()
+
+    # Bazadagi navbatni tugatib, ulanishlarni yopish
+    await db.close()
+
+    if 'metrics_server' in dispatcher:
+        await dispatcher['metrics_server'].cleanup()
+
+
 if __name__ == '__main__':
-    executor.start_polling(dp, on_startup=on_startup)
+    if config.BOT_MODE == 'webhook':
+        start_webhook(dp, on_startup=on_startup, on_shutdown=on_shutdown, allowed_updates=ALLOWED_UPDATES)
+    else:
+        executor.start_polling(dp, on_startup=on_startup, on_shutdown=on_shutdown, allowed_updates=ALLOWED_UPDATES)
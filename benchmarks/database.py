@@ -0,0 +1,286 @@
+"""
+DataBase metodlari benchmarki.
+
+Har bir ``DataBase`` metodi sun'iy konkurs bazasida (``benchmarks.population``)
+ikki xil yuklamada o'lchanadi:
+
+- ``single``: bitta oqim, metod ketma-ket chaqiriladi;
+- ``concurrent``: bot kabi ``AsyncDataBase`` orqali ``--concurrency`` ta
+  bir vaqtdagi chaqiruv.
+
+Har bir metod uchun p50/p95/p99 kechikish (ms) va soniyasiga chaqiruvlar
+JSON ga yoziladi. ``--compare`` oldingi natija bilan solishtiradi.
+
+Ishga tushirish:
+    python -m benchmarks.database --users 1000000 --output before.json
+    python -m benchmarks.database --db /tmp/konkurs_1m.sqlite3 --output after.json --compare before.json
+"""
+import argparse
+import asyncio
+import contextlib
+import datetime
+import json
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, List
+
+from benchmarks.population import link_url, populate, telegram_id
+from benchmarks.schema import ROOT_DIR, create_database
+from data.commands import AsyncDataBase, DataBase
+
+# Benchmark qilinmaydigan (ulanish boshqaruvi) metodlar
+SKIPPED_METHODS = frozenset({'close', 'execute', 'transaction'})
+
+BROADCAST_OWNER = 'benchmark'
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    """Saralangan ro'yxatning ``q`` (0..100) persentili"""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(q / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def summarize(latencies: List[float], elapsed: float) -> dict:
+    latencies.sort()
+    return {
+        'calls': len(latencies),
+        'ops_per_sec': round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        'mean_ms': round(sum(latencies) / len(latencies) * 1000, 4) if latencies else 0.0,
+        'p50_ms': round(percentile(latencies, 50) * 1000, 4),
+        'p95_ms': round(percentile(latencies, 95) * 1000, 4),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 4),
+        'max_ms': round(latencies[-1] * 1000, 4) if latencies else 0.0,
+    }
+
+
+def prepare(path: str) -> dict:
+    """Mukofot va yuborilayotgan xabar qo'shish (mavjud bo'lmasa)"""
+    connection = sqlite3.connect(path)
+    with connection:
+        award = connection.execute("SELECT id, image FROM konkurs_award WHERE is_active = 1").fetchone()
+        if not award:
+            award = connection.execute(
+                """
+                INSERT INTO konkurs_award (title, description, image, created_at, is_active)
+                VALUES ('Bench', 'Bench', 'awards/images/bench.jpg', datetime('now'), 1)
+                RETURNING id, image
+                """
+            ).fetchone()
+        broadcast = connection.execute(
+            """
+            INSERT INTO konkurs_broadcast (
+                text, status, last_user_id, total_users, sent_count, blocked_count,
+                failed_count, messages_per_second, created_at
+            )
+            VALUES ('Bench', 'running', 0, 0, 0, 0, 0, 0, datetime('now'))
+            RETURNING id
+            """
+        ).fetchone()
+        users, = connection.execute("SELECT COUNT(*) FROM konkurs_user").fetchone()
+        links, = connection.execute(
+            "SELECT COUNT(*) FROM konkurs_link WHERE url LIKE 'https://t.me/bench_channel%'"
+        ).fetchone()
+    connection.close()
+    return {'award': award, 'broadcast_id': broadcast[0], 'users': users, 'links': links}
+
+
+def workload(fixture: dict, seed: int) -> Dict[str, Callable[[DataBase], object]]:
+    """Metod nomi -> ``call(db)``: har chaqiruvda tasodifiy foydalanuvchi bilan"""
+    rng = random.Random(seed)
+    users = fixture['users']
+    award_id, image = fixture['award']
+    broadcast_id = fixture['broadcast_id']
+    # Yangi foydalanuvchilar mavjudlaridan keyingi ID lardan oladi
+    next_index = [users + 1 + seed * 10_000_000]
+
+    def user():
+        return telegram_id(rng.randint(1, users))
+
+    def new_user(db):
+        index = next_index[0]
+        next_index[0] += 1
+        db.add_user(f"New {index}", telegram_id(index), referral_code=str(telegram_id(index)), referrer_id=user())
+
+    return {
+        'add_user': new_user,
+        'get_user_by_chat_id': lambda db: db.get_user_by_chat_id(user()),
+        'get_user_by_referral': lambda db: db.get_user_by_referral(str(user())),
+        'load_leaderboard': lambda db: db.load_leaderboard(),
+        'get_top_users_by_score': lambda db: db.get_top_users_by_score(),
+        'get_score_by_id': lambda db: db.get_score_by_id(user()),
+        'get_score_and_rank': lambda db: db.get_score_and_rank(user()),
+        'credit_referral': lambda db: db.credit_referral(user()),
+        'update_user_score': lambda db: db.update_user_score(user(), 1),
+        'check_versions': lambda db: db.check_versions(),
+        'get_latest_award': lambda db: db.get_latest_award(),
+        'set_award_file_id': lambda db: db.set_award_file_id(award_id, image, 'bench-file-id'),
+        'get_all_active_links': lambda db: db.get_all_active_links(),
+        'get_user_subscriptions': lambda db: db.get_user_subscriptions(user()),
+        'update_subscription_status': lambda db: db.update_subscription_status(
+            user(), link_url(rng.randint(1, max(fixture['links'], 1))), rng.random() < 0.9
+        ),
+        'reconcile_statistics': lambda db: db.reconcile_statistics(),
+        'update_statistics': lambda db: db.update_statistics(),
+        'get_daily_statistics': lambda db: db.get_daily_statistics(),
+        'get_award': lambda db: db.get_award(award_id),
+        'deactivate_users': lambda db: db.deactivate_users([user()]),
+        'get_running_broadcast': lambda db: db.get_running_broadcast(),
+        'claim_broadcast': lambda db: db.claim_broadcast(broadcast_id, BROADCAST_OWNER, 60),
+        'get_broadcast_recipients': lambda db: db.get_broadcast_recipients(rng.randint(0, users), 1000),
+        'save_broadcast_progress': lambda db: db.save_broadcast_progress(
+            broadcast_id, BROADCAST_OWNER, rng.randint(0, users), 0, 0, 0, 0.0, 60
+        ),
+        'release_broadcast': lambda db: db.release_broadcast(broadcast_id, BROADCAST_OWNER, False),
+    }
+
+
+def public_methods() -> List[str]:
+    return sorted(
+        name for name in dir(DataBase)
+        if not name.startswith('_') and name not in SKIPPED_METHODS and callable(getattr(DataBase, name))
+    )
+
+
+def run_single(db: DataBase, call, seconds: float, max_calls: int) -> dict:
+    latencies = []
+    started = time.perf_counter()
+    deadline = started + seconds
+    while time.perf_counter() < deadline and len(latencies) < max_calls:
+        before = time.perf_counter()
+        call(db)
+        latencies.append(time.perf_counter() - before)
+    return summarize(latencies, time.perf_counter() - started)
+
+
+async def run_concurrent(adb: AsyncDataBase, name: str, call, concurrency: int,
+                         seconds: float, max_calls: int) -> dict:
+    latencies = []
+    loop = asyncio.get_running_loop()
+    started = time.perf_counter()
+    deadline = started + seconds
+    executor = adb._executor_for(name, {})
+
+    async def client():
+        while time.perf_counter() < deadline and len(latencies) < max_calls:
+            before = time.perf_counter()
+            # AsyncDataBase bilan bir xil: metod o'z oqimlar to'plamida bajariladi
+            await loop.run_in_executor(executor, call, adb.database)
+            latencies.append(time.perf_counter() - before)
+
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    return summarize(latencies, time.perf_counter() - started)
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT_DIR,
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def compare(results: dict, baseline: dict):
+    print(f"\n{'method':<28}{'mode':<12}{'p95 before':>12}{'p95 after':>12}{'change':>9}", file=sys.stderr)
+    for name, modes in results['methods'].items():
+        for mode, row in modes.items():
+            old = baseline.get('methods', {}).get(name, {}).get(mode)
+            if not old or not old['p95_ms']:
+                continue
+            change = row['p95_ms'] / old['p95_ms']
+            print(f"{name:<28}{mode:<12}{old['p95_ms']:>12.3f}{row['p95_ms']:>12.3f}{change:>8.2f}x",
+                  file=sys.stderr)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--users', type=int, default=100_000)
+    parser.add_argument('--db', help="benchmarks.population bilan yaratilgan baza (nusxasi ishlatiladi)")
+    parser.add_argument('--seconds', type=float, default=2.0, help="Har bir metod va rejim uchun")
+    parser.add_argument('--max-calls', type=int, default=20000)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--methods', nargs='*', help="Faqat shu metodlar")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', help="JSON natija fayli (berilmasa stdout)")
+    parser.add_argument('--compare', help="Oldingi JSON natija bilan solishtirish")
+    args = parser.parse_args(argv)
+
+    # Yozuvchi metodlar bazani o'zgartiradi, shuning uchun har safar nusxada ishlaymiz
+    fd, path = tempfile.mkstemp(prefix='konkurs_bench_', suffix='.sqlite3')
+    os.close(fd)
+    if args.db:
+        shutil.copyfile(args.db, path)
+    else:
+        create_database(path)
+        print(f"Populating {args.users} users ...", file=sys.stderr)
+        populate(path, args.users)
+    fixture = prepare(path)
+
+    calls = workload(fixture, args.seed)
+    missing = set(public_methods()) - set(calls)
+    if missing:
+        print(f"Not benchmarked: {', '.join(sorted(missing))}", file=sys.stderr)
+    names = args.methods or list(calls)
+
+    results = {
+        'revision': git_revision(),
+        'timestamp': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'users': fixture['users'],
+        'links': fixture['links'],
+        'seconds': args.seconds,
+        'concurrency': args.concurrency,
+        'methods': {},
+    }
+    db = DataBase(path)
+    adb = AsyncDataBase(db)
+    try:
+        # DataBase ichidagi print lar o'lchovga aralashmasligi uchun
+        with open(os.devnull, 'w') as devnull:
+            for name in names:
+                call = calls[name]
+                print(f"{name} ...", file=sys.stderr)
+                with contextlib.redirect_stdout(devnull):
+                    single = run_single(db, call, args.seconds, args.max_calls)
+                    concurrent = asyncio.run(run_concurrent(
+                        adb, name, call, args.concurrency, args.seconds, args.max_calls
+                    ))
+                results['methods'][name] = {'single': single, 'concurrent': concurrent}
+    finally:
+        asyncio.run(adb.close())
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+
+    print(f"\n{'method':<28}{'mode':<12}{'ops/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}",
+          file=sys.stderr)
+    for name, modes in results['methods'].items():
+        for mode, row in modes.items():
+            print(f"{name:<28}{mode:<12}{row['ops_per_sec']:>10.0f}{row['p50_ms']:>10.3f}"
+                  f"{row['p95_ms']:>10.3f}{row['p99_ms']:>10.3f}", file=sys.stderr)
+
+    if args.compare:
+        with open(args.compare) as file:
+            compare(results, json.load(file))
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w') as file:
+            file.write(output + '\n')
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
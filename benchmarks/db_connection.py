@@ -0,0 +1,197 @@
+"""
+DataBase ulanish qatlami benchmarki.
+
+Eski usul (har bir so'rov uchun yangi ``sqlite3.connect`` va ``print``
+trace callback) bilan doimiy ulanishli ``DataBase`` ni bir xil so'rovlar
+ustida solishtiradi.
+
+Ishga tushirish:
+    python -m benchmarks.db_connection --users 1000000 --seconds 5
+"""
+import argparse
+import contextlib
+import os
+import random
+import sqlite3
+import sys
+import time
+
+from benchmarks.schema import create_database
+from data.commands import DataBase
+
+
+def logger(statement):
+    print(f"""
+--------------------------------------------------------
+Executing:
+{statement}
+--------------------------------------------------------
+""")
+
+
+class LegacyDataBase:
+    """
+    O'zgartirishdan oldingi ``DataBase`` (taqqoslash asosi)
+
+    Metodlar asl koddan ko'chirilgan va ``DataBase`` dan meros olinmaydi,
+    shuning uchun keyingi o'zgarishlar "before" natijalariga ta'sir qilmaydi.
+    """
+
+    def __init__(self, path_to_db='admin/db.sqlite3'):
+        self.path_to_db = path_to_db
+
+    @property
+    def connection(self):
+        return sqlite3.connect(self.path_to_db)
+
+    def execute(self, sql: str, parameters: tuple = None, fetchone=False, fetchall=False, commit=False):
+        if not parameters:
+            parameters = ()
+        connection = self.connection
+        connection.set_trace_callback(logger)
+        cursor = connection.cursor()
+        data = None
+        cursor.execute(sql, parameters)
+
+        if commit:
+            connection.commit()
+        if fetchall:
+            data = cursor.fetchall()
+        if fetchone:
+            data = cursor.fetchone()
+        connection.close()
+        return data
+
+    def close(self):
+        """Har bir so'rov o'z ulanishini yopadi"""
+
+    def add_user(self, fullname: str, user_id: int, username: str = None, referral_code: str = None):
+        sql = """
+        INSERT INTO konkurs_user (
+            fullname, 
+            telegram_id, 
+            username, 
+            score, 
+            referral_code, 
+            is_active,
+            is_referral_counted,
+            created_at
+        ) 
+        VALUES (?, ?, ?, ?, ?, ?, ?, datetime('now'))
+        """
+        parameters = (
+            fullname,
+            user_id,
+            username,
+            0,
+            referral_code,
+            True,
+            False,
+        )
+        self.execute(sql, parameters=parameters, commit=True)
+
+    def get_user_by_chat_id(self, telegram_id: int):
+        sql = "SELECT * FROM konkurs_user WHERE telegram_id = ?"
+        return self.execute(sql, (telegram_id,), fetchone=True)
+
+    def get_top_users_by_score(self, top_n=20):
+        sql = """
+        SELECT fullname, score, telegram_id 
+        FROM konkurs_user
+        WHERE is_active = 1
+        ORDER BY score DESC
+        LIMIT ?
+        """
+        return self.execute(sql, (top_n,), fetchall=True)
+
+    def get_score_by_id(self, telegram_id: int):
+        sql = "SELECT score FROM konkurs_user WHERE telegram_id = ?"
+        result = self.execute(sql, (telegram_id,), fetchone=True)
+        return result[0] if result else None
+
+
+def populate(path: str, users: int, batch: int = 50000):
+    """``konkurs_user`` jadvalini sun'iy foydalanuvchilar bilan to'ldirish"""
+    connection = sqlite3.connect(path)
+    sql = """
+    INSERT INTO konkurs_user (
+        fullname, telegram_id, username, score, referral_code,
+        is_active, is_referral_counted, created_at
+    )
+    VALUES (?, ?, ?, ?, ?, 1, 0, datetime('now'))
+    """
+    rng = random.Random(0)
+    for start in range(0, users, batch):
+        rows = [
+            (f"User {i}", i, f"user{i}", rng.randint(0, 500), str(i))
+            for i in range(start + 1, min(start + batch, users) + 1)
+        ]
+        connection.executemany(sql, rows)
+        connection.commit()
+    connection.close()
+
+
+def measure(db: DataBase, call, seconds: float) -> float:
+    count = 0
+    deadline = time.perf_counter() + seconds
+    started = time.perf_counter()
+    while time.perf_counter() < deadline:
+        call(db)
+        count += 1
+    return count / (time.perf_counter() - started)
+
+
+def workload(users: int):
+    rng = random.Random(1)
+    next_id = [users + 1]
+
+    def add_user(db):
+        user_id = next_id[0]
+        next_id[0] += 1
+        db.add_user(f"New {user_id}", user_id, referral_code=str(user_id))
+
+    return {
+        'get_user_by_chat_id': lambda db: db.get_user_by_chat_id(rng.randint(1, users)),
+        'get_score_by_id': lambda db: db.get_score_by_id(rng.randint(1, users)),
+        'get_top_users_by_score': lambda db: db.get_top_users_by_score(),
+        'add_user': add_user,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--users', type=int, default=1_000_000)
+    parser.add_argument('--seconds', type=float, default=5.0)
+    parser.add_argument('--db', help="Mavjud baza fayli (berilmasa yangisi yaratiladi)")
+    args = parser.parse_args(argv)
+
+    path = args.db
+    if path is None:
+        path = create_database()
+        print(f"Populating {args.users} users into {path} ...", file=sys.stderr)
+        populate(path, args.users)
+
+    calls = workload(args.users)
+    results = {}
+    with open(os.devnull, 'w') as devnull:
+        for label, factory in (('before', LegacyDataBase), ('after', DataBase)):
+            db = factory(path)
+            for name, call in calls.items():
+                # Eski trace callback chiqishini terminalga emas, /dev/null ga yozamiz
+                with contextlib.redirect_stdout(devnull):
+                    qps = measure(db, call, args.seconds)
+                results.setdefault(name, {})[label] = qps
+            db.close()
+
+    print(f"{'method':<26}{'before q/s':>14}{'after q/s':>14}{'speedup':>10}")
+    for name, row in results.items():
+        print(f"{name:<26}{row['before']:>14.0f}{row['after']:>14.0f}{row['after'] / row['before']:>9.1f}x")
+
+    if args.db is None:
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+
+
+if __name__ == '__main__':
+    main()
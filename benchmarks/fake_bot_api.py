@@ -0,0 +1,372 @@
+"""
+Mahalliy soxta Telegram Bot API serveri.
+
+Bot ``BOT_API_SERVER=http://127.0.0.1:<port>`` bilan ishga tushirilsa, barcha
+so'rovlar shu serverga keladi. Server updatelarni ``getUpdates`` orqali yoki
+webhook manziliga POST qilib yetkazadi va bot yuborgan xabarlarni sanaydi.
+
+Kanal a'zoligi (``getChatMember``) skript orqali boshqariladi: test
+foydalanuvchini ``set_member`` bilan kanalga "obuna qiladi" va kerak bo'lsa
+``chat_member_update`` ni yuboradi. Botni kanal admini qilish uchun
+``set_member(chat, BOT_ID, 'administrator')``. Xabar yuborish
+so'rovlarining bir qismiga ataylab 429 (RetryAfter) qaytarish mumkin.
+"""
+import asyncio
+import contextlib
+import itertools
+import json
+import os
+import random
+import signal
+import socket
+import sys
+import time
+import zlib
+from typing import Dict, List, Optional
+
+import aiohttp
+from aiohttp import web
+
+BOT_ID = 100000
+BOT_USERNAME = 'fake_konkurs_bot'
+
+# RetryAfter qaytarilishi mumkin bo'lgan metodlar
+SEND_METHODS = frozenset(('sendmessage', 'sendphoto'))
+
+
+def user_dict(user_id: int) -> dict:
+    return {'id': user_id, 'is_bot': False, 'first_name': f'User {user_id}'}
+
+
+def message_update(update_id: int, user_id: int, text: str) -> dict:
+    """Shaxsiy chatdagi oddiy matnli xabar updatei"""
+    user = user_dict(user_id)
+    return {
+        'update_id': update_id,
+        'message': {
+            'message_id': update_id,
+            'date': int(time.time()),
+            'chat': {'id': user_id, 'type': 'private', 'first_name': user['first_name']},
+            'from': user,
+            'text': text,
+            'entities': [{'type': 'bot_command', 'offset': 0, 'length': len(text.split()[0])}]
+            if text.startswith('/') else [],
+        },
+    }
+
+
+def callback_update(update_id: int, user_id: int, data: str) -> dict:
+    """Inline tugma bosilgani haqidagi update
+
+    ``callback_query.id`` foydalanuvchi ID sidan boshlanadi, shuning uchun
+    ``answerCallbackQuery`` javobini qaysi foydalanuvchiga tegishli ekani
+    aniqlanadi.
+    """
+    user = user_dict(user_id)
+    return {
+        'update_id': update_id,
+        'callback_query': {
+            'id': f'{user_id}:{update_id}',
+            'from': user,
+            'chat_instance': str(user_id),
+            'data': data,
+            'message': {
+                'message_id': update_id,
+                'date': int(time.time()),
+                'chat': {'id': user_id, 'type': 'private', 'first_name': user['first_name']},
+                'from': {'id': BOT_ID, 'is_bot': True, 'first_name': 'Fake', 'username': BOT_USERNAME},
+                'text': '...',
+            },
+        },
+    }
+
+
+def chat_member_update(update_id: int, chat: str, user_id: int, old_status: str, new_status: str) -> dict:
+    """Kanal a'zoligi o'zgargani haqidagi update (bot admin bo'lgan kanallardan keladi)"""
+    user = user_dict(user_id)
+    return {
+        'update_id': update_id,
+        'chat_member': {
+            'chat': {'id': -1000000000000 - zlib.crc32(chat.encode()), 'type': 'channel',
+                     'title': chat, 'username': chat.lstrip('@')},
+            'from': user,
+            'date': int(time.time()),
+            'old_chat_member': {'status': old_status, 'user': user},
+            'new_chat_member': {'status': new_status, 'user': user},
+        },
+    }
+
+
+class FakeBotAPI:
+    """
+    Bot API ning yuklama testlari uchun yetarli qismi
+
+    Args:
+        latency: Har bir javobdan oldingi sun'iy kechikish (soniya)
+        retry_after_rate: sendMessage/sendPhoto so'rovlarining 429 qaytariladigan ulushi
+        retry_after: 429 javobidagi ``retry_after`` (soniya)
+        default_status: ``set_member`` qilinmagan foydalanuvchining kanal statusi
+    """
+
+    def __init__(self, latency: float = 0.0, retry_after_rate: float = 0.0, retry_after: int = 1,
+                 default_status: str = 'left', seed: Optional[int] = None):
+        self.latency = latency
+        self.retry_after_rate = retry_after_rate
+        self.retry_after = retry_after
+        self.default_status = default_status
+        self.calls: Dict[str, int] = {}
+        self.sent_messages = 0
+        self.retry_after_injected = 0
+        self.webhook_failures = 0
+        self.webhook_url: Optional[str] = None
+        self.webhook_secret: Optional[str] = None
+        self.webhook_max_connections = 40
+        self._members: Dict[str, Dict[int, str]] = {}
+        self._outboxes: Dict[int, asyncio.Queue] = {}
+        self._random = random.Random(seed)
+        self._updates: List[dict] = []
+        self._new_updates = asyncio.Event()
+        self._update_ids = itertools.count(1)
+        self._message_ids = itertools.count(1)
+        self._file_ids = itertools.count(1)
+        self._sent_event = asyncio.Event()
+        self._sent_target = 0
+        self._webhook_set = asyncio.Event()
+        self._polling_started = asyncio.Event()
+        self._runner: Optional[web.AppRunner] = None
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._webhook_queue: Optional[asyncio.Queue] = None
+        self._delivery: List[asyncio.Task] = []
+
+    # --- Server -----------------------------------------------------------
+
+    async def start(self, host: str = '127.0.0.1', port: int = 0) -> str:
+        """Serverni ishga tushirib, ``BOT_API_SERVER`` uchun manzilni qaytarish"""
+        app = web.Application()
+        app.router.add_route('*', '/bot{token}/{method}', self._handle)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self._session = aiohttp.ClientSession()
+        return f'http://{host}:{port}'
+
+    async def stop(self):
+        for task in self._delivery:
+            task.cancel()
+        if self._session is not None:
+            await self._session.close()
+        if self._runner is not None:
+            await self._runner.cleanup()
+
+    async def _handle(self, request: web.Request) -> web.Response:
+        method = request.match_info['method'].lower()
+        self.calls[method] = self.calls.get(method, 0) + 1
+        params = dict(await request.post())
+        if not params and request.can_read_body:
+            params = await request.json()
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if method in SEND_METHODS and self.retry_after_rate and self._random.random() < self.retry_after_rate:
+            self.retry_after_injected += 1
+            return web.json_response({
+                'ok': False,
+                'error_code': 429,
+                'description': f'Too Many Requests: retry after {self.retry_after}',
+                'parameters': {'retry_after': self.retry_after},
+            }, status=429)
+        handler = getattr(self, f'_api_{method}', None)
+        result = await handler(params) if handler is not None else True
+        return web.json_response({'ok': True, 'result': result})
+
+    # --- Kanal a'zoligi ---------------------------------------------------
+
+    def set_member(self, chat: str, user_id: int, status: str = 'member'):
+        """Foydalanuvchining ``chat`` (masalan ``@channel``) dagi statusini o'rnatish"""
+        self._members.setdefault(chat, {})[user_id] = status
+
+    def member_status(self, chat: str, user_id: int) -> str:
+        return self._members.get(chat, {}).get(user_id, self.default_status)
+
+    # --- Bot yuborganlarini kuzatish --------------------------------------
+
+    def watch(self, chat_id: int) -> asyncio.Queue:
+        """Bot shu chatga yuborgan (metod, natija) lar navbati"""
+        return self._outboxes.setdefault(chat_id, asyncio.Queue())
+
+    def unwatch(self, chat_id: int):
+        self._outboxes.pop(chat_id, None)
+
+    def _notify(self, chat_id: int, method: str, result):
+        outbox = self._outboxes.get(chat_id)
+        if outbox is not None:
+            outbox.put_nowait((method, result))
+
+    # --- Bot API metodlari ------------------------------------------------
+
+    async def _api_getme(self, params):
+        return {'id': BOT_ID, 'is_bot': True, 'first_name': 'Fake', 'username': BOT_USERNAME}
+
+    async def _api_getwebhookinfo(self, params):
+        return {'url': self.webhook_url or '', 'has_custom_certificate': False, 'pending_update_count': 0}
+
+    async def _api_setwebhook(self, params):
+        self.webhook_url = params['url']
+        self.webhook_secret = params.get('secret_token')
+        self.webhook_max_connections = int(params.get('max_connections') or 40)
+        self._webhook_set.set()
+        return True
+
+    async def _api_deletewebhook(self, params):
+        self.webhook_url = None
+        return True
+
+    async def _api_getupdates(self, params):
+        self._polling_started.set()
+        offset = int(params.get('offset') or 0)
+        limit = int(params.get('limit') or 100)
+        timeout = float(params.get('timeout') or 0)
+        self._updates = [update for update in self._updates if update['update_id'] >= offset]
+        if not self._updates and timeout:
+            self._new_updates.clear()
+            try:
+                await asyncio.wait_for(self._new_updates.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        return self._updates[:limit]
+
+    async def _api_getchatmember(self, params):
+        user_id = int(params['user_id'])
+        return {'status': self.member_status(str(params['chat_id']), user_id), 'user': user_dict(user_id)}
+
+    async def _api_sendmessage(self, params):
+        return self._sent('sendMessage', params, {'text': params.get('text', '')})
+
+    async def _api_sendphoto(self, params):
+        photo = params.get('photo')
+        file_id = photo if isinstance(photo, str) else f'fake-photo-{next(self._file_ids)}'
+        content = {
+            'photo': [{'file_id': file_id, 'file_unique_id': file_id, 'width': 800, 'height': 600}],
+        }
+        if params.get('caption'):
+            content['caption'] = params['caption']
+        return self._sent('sendPhoto', params, content)
+
+    async def _api_answercallbackquery(self, params):
+        user_id = int(str(params['callback_query_id']).split(':', 1)[0])
+        self._notify(user_id, 'answerCallbackQuery', params.get('text'))
+        return True
+
+    def _sent(self, method: str, params, content: dict) -> dict:
+        self.sent_messages += 1
+        if self._sent_target and self.sent_messages >= self._sent_target:
+            self._sent_event.set()
+        chat_id = int(params['chat_id'])
+        result = {
+            'message_id': next(self._message_ids),
+            'date': int(time.time()),
+            'chat': {'id': chat_id, 'type': 'private'},
+            'from': {'id': BOT_ID, 'is_bot': True, 'first_name': 'Fake', 'username': BOT_USERNAME},
+            **content,
+        }
+        self._notify(chat_id, method, result)
+        return result
+
+    # --- Updatelarni yetkazish --------------------------------------------
+
+    async def wait_ready(self, webhook: bool, timeout: float = 30):
+        """Bot getUpdates yoki setWebhook chaqirguncha kutish"""
+        event = self._webhook_set if webhook else self._polling_started
+        await asyncio.wait_for(event.wait(), timeout)
+
+    def push_updates(self, updates: List[dict]):
+        """Updatelarni getUpdates yoki webhook orqali yetkazish uchun navbatga qo'yish"""
+        if self.webhook_url:
+            if self._webhook_queue is None:
+                # Telegram kabi max_connections tagacha parallel ulanish
+                self._webhook_queue = asyncio.Queue()
+                self._delivery = [
+                    asyncio.create_task(self._deliver()) for _ in range(self.webhook_max_connections)
+                ]
+            for update in updates:
+                self._webhook_queue.put_nowait(update)
+        else:
+            self._updates.extend(updates)
+            self._new_updates.set()
+
+    async def _deliver(self):
+        headers = {'Content-Type': 'application/json'}
+        if self.webhook_secret:
+            headers['X-Telegram-Bot-Api-Secret-Token'] = self.webhook_secret
+        while True:
+            update = await self._webhook_queue.get()
+            try:
+                async with self._session.post(self.webhook_url, data=json.dumps(update), headers=headers) as response:
+                    await response.read()
+                    response.raise_for_status()
+            except aiohttp.ClientError as err:
+                # Telegram kabi: yetkazilmagan update keyinroq qayta yuboriladi
+                print(f"Webhook delivery failed: {err!r}", file=sys.stderr)
+                self.webhook_failures += 1
+                await asyncio.sleep(0.1)
+                self._webhook_queue.put_nowait(update)
+
+    def next_update_id(self) -> int:
+        return next(self._update_ids)
+
+    async def wait_sent(self, count: int, timeout: float):
+        """Bot jami ``count`` ta xabar yuborguncha kutish"""
+        self._sent_target = count
+        if self.sent_messages < count:
+            self._sent_event.clear()
+            await asyncio.wait_for(self._sent_event.wait(), timeout)
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+@contextlib.asynccontextmanager
+async def run_bot(api: FakeBotAPI, base_url: str, mode: str, db_path: str, admin_id: int = 1,
+                  timeout: float = 60, **env):
+    """
+    ``app.py`` ni alohida jarayonda soxta API ga ulab ishga tushirish
+
+    Bot updatelarni qabul qilishga tayyor bo'lib, adminga ishga tushganlik
+    haqidagi xabarni yuborgandan keyin boshqaruv qaytariladi. Qo'shimcha
+    ``env`` qiymatlari ``data.config`` sozlamalarini almashtiradi.
+    """
+    from benchmarks.schema import ROOT_DIR
+
+    webapp_port = free_port()
+    environment = dict(
+        os.environ,
+        BOT_TOKEN='123456:fake-token',
+        ADMINS=str(admin_id),
+        BOT_API_SERVER=base_url,
+        BOT_MODE=mode,
+        DB_PATH=db_path,
+        WEBHOOK_HOST=f'http://127.0.0.1:{webapp_port}',
+        WEBAPP_HOST='127.0.0.1',
+        WEBAPP_PORT=str(webapp_port),
+    )
+    environment.update({key: str(value) for key, value in env.items()})
+    # Adminga xabar polling boshlanishidan oldin yuboriladi
+    startup_message = api.sent_messages + 1
+    process = await asyncio.create_subprocess_exec(
+        sys.executable, 'app.py', cwd=ROOT_DIR, env=environment,
+        stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.DEVNULL,
+    )
+    try:
+        await api.wait_ready(webhook=mode == 'webhook', timeout=timeout)
+        await api.wait_sent(startup_message, timeout)
+        yield process
+    finally:
+        process.send_signal(signal.SIGINT)
+        try:
+            await asyncio.wait_for(process.wait(), 30)
+        except asyncio.TimeoutError:
+            process.kill()
@@ -0,0 +1,209 @@
+"""
+Botning to'liq yuklama testi (soxta Bot API bilan).
+
+``app.py`` alohida jarayonda ``benchmarks.fake_bot_api`` ga ulanib ishga
+tushiriladi. Har bir sun'iy foydalanuvchi haqiqiy ishtirokchi kabi harakat
+qiladi:
+
+1. ``/start`` (bir qismi taklif havolasi bilan) - obuna so'raladi;
+2. kanallarga "obuna bo'ladi" va "✅ Obuna bo'ldim" ni bosadi (obuna hali
+   ko'rinmasa qayta bosadi). ``--track-members`` bilan bot kanallarda admin
+   bo'ladi va har bir obuna ``chat_member`` updatei bilan ham yetkaziladi;
+3. "🏆 Reyting" ni ochadi.
+
+Foydalanuvchilar ``--arrival-rate`` tezlikda keladi. Har bir qadam uchun
+update yuborilgandan botning barcha javoblari kelguncha bo'lgan kechikish
+(p50/p95/p99) va umumiy updates/s hisoblanadi.
+
+Ishga tushirish:
+    python -m benchmarks.load_test --users 5000 --arrival-rate 200 --latency 0.02
+    python -m benchmarks.load_test --mode webhook --retry-after-rate 0.01 --output load.json
+    python -m benchmarks.load_test --track-members
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+from typing import Dict, List
+
+from benchmarks.database import git_revision, summarize
+from benchmarks.fake_bot_api import BOT_ID, FakeBotAPI, callback_update, chat_member_update, message_update, run_bot
+from benchmarks.population import populate, telegram_id
+from benchmarks.schema import create_database
+
+STEPS = ('start', 'check', 'rating')
+
+
+class LoadStats:
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = {step: [] for step in STEPS}
+        self.timeouts: Dict[str, int] = {step: 0 for step in STEPS}
+        self.check_retries = 0
+        self.completed = 0
+        self.updates = 0
+
+
+async def step(api: FakeBotAPI, outbox: asyncio.Queue, stats: LoadStats, name: str,
+               update: dict, expect: int, timeout: float) -> list:
+    """Updateni yuborib, botning ``expect`` ta javobini kutish"""
+    started = time.perf_counter()
+    stats.updates += 1
+    api.push_updates([update])
+    events = []
+    try:
+        for _ in range(expect):
+            events.append(await asyncio.wait_for(outbox.get(), timeout))
+    except asyncio.TimeoutError:
+        stats.timeouts[name] += 1
+        raise
+    stats.latencies[name].append(time.perf_counter() - started)
+    return events
+
+
+def is_menu(events: list) -> bool:
+    return any(method == 'sendMessage' and result['text'].startswith('✅') for method, result in events)
+
+
+async def simulate_user(api: FakeBotAPI, stats: LoadStats, user_id: int, referrer: int,
+                        channels: List[str], think: float, max_checks: int, timeout: float,
+                        track_members: bool):
+    outbox = api.watch(user_id)
+    try:
+        text = f'/start {referrer}' if referrer else '/start'
+        await step(api, outbox, stats, 'start', message_update(api.next_update_id(), user_id, text), 1, timeout)
+
+        for channel in channels:
+            api.set_member(channel, user_id)
+            if track_members:
+                stats.updates += 1
+                api.push_updates([chat_member_update(api.next_update_id(), channel, user_id, 'left', 'member')])
+        for attempt in range(max_checks):
+            await asyncio.sleep(think)
+            update = callback_update(api.next_update_id(), user_id, 'check_subscription')
+            # Javob: xabar va answerCallbackQuery
+            if is_menu(await step(api, outbox, stats, 'check', update, 2, timeout)):
+                break
+            stats.check_retries += 1
+        else:
+            return
+
+        await asyncio.sleep(think)
+        await step(api, outbox, stats, 'rating', message_update(api.next_update_id(), user_id, '🏆 Reyting'), 1, timeout)
+        stats.completed += 1
+    except asyncio.TimeoutError:
+        pass
+    finally:
+        api.unwatch(user_id)
+
+
+async def run(args, db_path: str) -> dict:
+    api = FakeBotAPI(latency=args.latency, retry_after_rate=args.retry_after_rate,
+                     retry_after=args.retry_after, seed=args.seed)
+    base_url = await api.start()
+    channels = [f'@bench_channel{i}' for i in range(1, args.links + 1)]
+    rng = random.Random(args.seed)
+    stats = LoadStats()
+    if args.track_members:
+        for channel in channels:
+            api.set_member(channel, BOT_ID, 'administrator')
+    try:
+        async with run_bot(api, base_url, args.mode, db_path, timeout=args.timeout,
+                           SEND_GLOBAL_RATE=args.send_rate):
+            users = []
+            started = time.perf_counter()
+            for i in range(args.users):
+                user_id = telegram_id(args.population + 1 + i)
+                referrer = None
+                if args.population and rng.random() < args.referred:
+                    referrer = telegram_id(rng.randint(1, args.population))
+                users.append(asyncio.create_task(simulate_user(
+                    api, stats, user_id, referrer, channels, args.think, args.max_checks, args.timeout,
+                    args.track_members
+                )))
+                # Foydalanuvchilar bir tekis oqimda keladi
+                delay = started + (i + 1) / args.arrival_rate - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            await asyncio.gather(*users)
+            elapsed = time.perf_counter() - started
+    finally:
+        await api.stop()
+
+    return {
+        'revision': git_revision(),
+        'mode': args.mode,
+        'users': args.users,
+        'population': args.population,
+        'arrival_rate': args.arrival_rate,
+        'latency': args.latency,
+        'retry_after_rate': args.retry_after_rate,
+        'track_members': args.track_members,
+        'elapsed_s': round(elapsed, 2),
+        'updates': stats.updates,
+        'updates_per_sec': round(stats.updates / elapsed, 1),
+        'completed_users': stats.completed,
+        'check_retries': stats.check_retries,
+        'timeouts': stats.timeouts,
+        'retry_after_injected': api.retry_after_injected,
+        'webhook_failures': api.webhook_failures,
+        'api_calls': api.calls,
+        'steps': {name: summarize(latencies, elapsed) for name, latencies in stats.latencies.items()},
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--users', type=int, default=2000, help="Sun'iy foydalanuvchilar soni")
+    parser.add_argument('--arrival-rate', type=float, default=100, help="Soniyasiga yangi foydalanuvchilar")
+    parser.add_argument('--population', type=int, default=10000, help="Bazadagi mavjud foydalanuvchilar")
+    parser.add_argument('--links', type=int, default=3, help="Majburiy kanallar soni")
+    parser.add_argument('--referred', type=float, default=0.5, help="Taklif havolasi bilan kelganlar ulushi")
+    parser.add_argument('--think', type=float, default=1.0, help="Qadamlar orasidagi pauza (soniya)")
+    parser.add_argument('--max-checks', type=int, default=5, help="'Obuna bo'ldim' ni bosishlar chegarasi")
+    parser.add_argument('--mode', default='polling', choices=['polling', 'webhook'])
+    parser.add_argument('--track-members', action='store_true',
+                        help="Bot kanallarda admin: obunalar chat_member updatelari bilan yetkaziladi")
+    parser.add_argument('--latency', type=float, default=0.02, help="Soxta API javob kechikishi (soniya)")
+    parser.add_argument('--retry-after-rate', type=float, default=0.0, help="429 qaytariladigan xabarlar ulushi")
+    parser.add_argument('--retry-after', type=int, default=1)
+    parser.add_argument('--send-rate', type=float, default=1_000_000,
+                        help="Bot SEND_GLOBAL_RATE (Telegram limiti bilan o'lchash uchun 30)")
+    parser.add_argument('--timeout', type=float, default=60, help="Bitta javobni kutish chegarasi")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--db', help="Baza fayli (berilmasa vaqtinchalik baza yaratiladi)")
+    parser.add_argument('--output', help="JSON natija fayli")
+    args = parser.parse_args(argv)
+
+    db_path = args.db or create_database()
+    if not args.db:
+        print(f"Populating {args.population} users ...", file=sys.stderr)
+        populate(db_path, args.population, links=args.links, seed=args.seed)
+    try:
+        results = asyncio.run(run(args, db_path))
+    finally:
+        if not args.db:
+            for suffix in ('', '-wal', '-shm'):
+                if os.path.exists(db_path + suffix):
+                    os.remove(db_path + suffix)
+
+    print(f"{results['updates_per_sec']:.0f} updates/s, {results['completed_users']}/{args.users} users completed, "
+          f"timeouts {results['timeouts']}, RetryAfter injected {results['retry_after_injected']}",
+          file=sys.stderr)
+    print(f"{'step':<10}{'calls':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}", file=sys.stderr)
+    for name, row in results['steps'].items():
+        print(f"{name:<10}{row['calls']:>8}{row['p50_ms']:>10.1f}{row['p95_ms']:>10.1f}{row['p99_ms']:>10.1f}",
+              file=sys.stderr)
+
+    output = json.dumps(results, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            file.write(output + '\n')
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,152 @@
+"""
+Benchmarklar uchun sun'iy konkurs ishtirokchilari.
+
+``konkurs_user``, ``konkurs_link`` va ``konkurs_usersubscription`` jadvallari
+haqiqiy konkursga o'xshash ma'lumotlar bilan to'ldiriladi:
+
+- foydalanuvchilarning ``referred`` qismi kimningdir taklifi bilan kelgan;
+  taklif qiluvchi "boy yanada boyiydi" qoidasi bilan tanlanadi, shuning
+  uchun bir nechta foydalanuvchida minglab referal, ko'pchilikda esa
+  bittasi ham bo'lmaydi;
+- ballar hisoblangan referallar soniga teng (har biri uchun 10 ball);
+- har bir foydalanuvchida har bir kanal uchun obuna qatori bor.
+
+Natija bir xil ``--seed`` bilan har safar bir xil bo'ladi.
+
+Ishga tushirish:
+    python -m benchmarks.population --users 1000000 --db /tmp/konkurs_1m.sqlite3
+"""
+import argparse
+import random
+import sqlite3
+import sys
+import time
+from array import array
+
+from benchmarks.schema import create_database
+
+# Telegram ID lari haqiqiylariga o'xshab katta sonlardan boshlanadi
+TELEGRAM_ID_BASE = 5_000_000_000
+
+REFERRAL_POINTS = 10
+
+
+def telegram_id(index: int) -> int:
+    """``index``-chi (1 dan boshlab) sun'iy foydalanuvchining telegram ID si"""
+    return TELEGRAM_ID_BASE + index
+
+
+def link_url(index: int) -> str:
+    return f"https://t.me/bench_channel{index}"
+
+
+def populate(path: str, users: int, links: int = 5, referred: float = 0.7, counted: float = 0.8,
+             active: float = 0.95, subscribed: float = 0.9, seed: int = 0, batch: int = 50000,
+             progress=None):
+    """
+    Bazani sun'iy ma'lumotlar bilan to'ldirish
+
+    Args:
+        users (int): Foydalanuvchilar soni
+        links (int): Majburiy kanallar soni
+        referred (float): Taklif bilan kelganlar ulushi
+        counted (float): Ulardan referal balli berilganlar ulushi
+        active (float): Faol foydalanuvchilar ulushi
+        subscribed (float): Obuna bo'lgan (user, kanal) juftlari ulushi
+        progress: Har bir paketdan keyin ``progress(qo'shilgan, jami)`` chaqiriladi
+    """
+    rng = random.Random(seed)
+    connection = sqlite3.connect(path)
+    # Yuklash vaqtida jurnal kerak emas: xato bo'lsa baza qaytadan yaratiladi
+    connection.execute("PRAGMA journal_mode = OFF")
+    connection.execute("PRAGMA synchronous = OFF")
+
+    first_user = (connection.execute("SELECT COALESCE(MAX(id), 0) FROM konkurs_user").fetchone()[0]) + 1
+    connection.executemany(
+        """
+        INSERT INTO konkurs_link (title, url, is_required, is_active, created_at)
+        VALUES (?, ?, 1, 1, datetime('now'))
+        """,
+        [(f"Bench kanal {i}", link_url(i)) for i in range(1, links + 1)]
+    )
+    link_ids = [row[0] for row in connection.execute(
+        "SELECT id FROM konkurs_link WHERE url LIKE 'https://t.me/bench_channel%' ORDER BY id"
+    )]
+
+    user_sql = """
+    INSERT INTO konkurs_user (
+        id, fullname, telegram_id, username, score, referral_code,
+        is_referral_counted, is_active, created_at, referred_by_id
+    )
+    VALUES (?, ?, ?, ?, 0, ?, ?, ?, datetime('now'), ?)
+    """
+    subscription_sql = """
+    INSERT INTO konkurs_usersubscription (is_subscribed, created_at, updated_at, channel_id, user_id)
+    VALUES (?, datetime('now'), datetime('now'), ?, ?)
+    """
+    # Har bir foydalanuvchi bu ro'yxatda 1 + referallari soni marta uchraydi:
+    # tasodifiy element taklif qiluvchini referallariga proporsional tanlaydi
+    referrers = array('q')
+    for start in range(0, users, batch):
+        user_rows = []
+        subscription_rows = []
+        for index in range(start + 1, min(start + batch, users) + 1):
+            user_pk = first_user + index - 1
+            referred_by = None
+            is_counted = 0
+            if referrers and rng.random() < referred:
+                referred_by = referrers[rng.randrange(len(referrers))]
+                referrers.append(referred_by)
+                is_counted = int(rng.random() < counted)
+            referrers.append(user_pk)
+            user_rows.append((
+                user_pk, f"User {index}", telegram_id(index), f"user{index}", str(telegram_id(index)),
+                is_counted, int(rng.random() < active), referred_by,
+            ))
+            for link_id in link_ids:
+                subscription_rows.append((int(rng.random() < subscribed), link_id, user_pk))
+        with connection:
+            connection.executemany(user_sql, user_rows)
+            connection.executemany(subscription_sql, subscription_rows)
+        if progress:
+            progress(min(start + batch, users), users)
+
+    with connection:
+        connection.execute(
+            """
+            UPDATE konkurs_user SET score = ? * counted.total
+            FROM (
+                SELECT referred_by_id AS id, COUNT(*) AS total
+                FROM konkurs_user
+                WHERE is_referral_counted = 1 AND referred_by_id IS NOT NULL
+                GROUP BY referred_by_id
+            ) AS counted
+            WHERE konkurs_user.id = counted.id
+            """,
+            (REFERRAL_POINTS,)
+        )
+    connection.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--users', type=int, default=100_000)
+    parser.add_argument('--links', type=int, default=5)
+    parser.add_argument('--referred', type=float, default=0.7)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--db', help="Baza fayli (berilmasa vaqtinchalik fayl yaratiladi)")
+    args = parser.parse_args(argv)
+
+    path = create_database(args.db)
+    started = time.perf_counter()
+
+    def progress(done, total):
+        print(f"\r{done}/{total} users", end='', file=sys.stderr)
+
+    populate(path, args.users, links=args.links, referred=args.referred, seed=args.seed, progress=progress)
+    print(f"\nPopulated {path} in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+    print(path)
+
+
+if __name__ == '__main__':
+    main()
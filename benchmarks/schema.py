@@ -0,0 +1,34 @@
+"""
+Benchmark va yuklama testlari uchun vaqtinchalik baza yaratish.
+
+Sxema ``admin`` Django loyihasining migratsiyalaridan olinadi, shuning uchun
+benchmarklar doim botning haqiqiy jadvallari bilan ishlaydi.
+"""
+import os
+import sys
+import tempfile
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ADMIN_DIR = os.path.join(ROOT_DIR, 'admin')
+
+
+def create_database(path: str = None) -> str:
+    """Bo'sh bazani migratsiyalar bilan yaratish va yo'lini qaytarish"""
+    if path is None:
+        fd, path = tempfile.mkstemp(prefix='konkurs_bench_', suffix='.sqlite3')
+        os.close(fd)
+
+    if ADMIN_DIR not in sys.path:
+        sys.path.insert(0, ADMIN_DIR)
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'admin.settings')
+
+    import django
+    from django.conf import settings
+    from django.core.management import call_command
+    from django.db import connections
+
+    settings.DATABASES['default']['NAME'] = path
+    django.setup()
+    call_command('migrate', verbosity=0)
+    connections.close_all()
+    return path
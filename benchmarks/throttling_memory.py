@@ -0,0 +1,95 @@
+"""
+Throttling holatining xotira sarfi: eski dispatcher.throttle va token bucket.
+
+Har bir foydalanuvchidan bitta so'rov keladi. Eski usulda har bir foydalanuvchi
+uchun storage ga bucket yozuvi qo'shiladi va hech qachon o'chmaydi. Token
+bucket esa bitta son saqlaydi va ``idle_timeout`` dan keyin yozuvni unutadi.
+
+Ishga tushirish:
+    python -m benchmarks.throttling_memory --users 1000000
+"""
+import argparse
+import asyncio
+import gc
+import time
+import tracemalloc
+
+from aiogram import Bot, Dispatcher
+from aiogram.contrib.fsm_storage.memory import MemoryStorage
+
+from utils.misc.throttling import TokenBucket
+
+USER_ID_BASE = 5_000_000_000
+KEY = 'antiflood__bot_start'
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def measure(func):
+    gc.collect()
+    tracemalloc.start()
+    started = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - started
+    gc.collect()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, current, peak, elapsed
+
+
+def dispatcher_throttle(users: int):
+    async def run():
+        dp = Dispatcher(Bot('123456:fake-token'), storage=MemoryStorage())
+        for i in range(users):
+            user_id = USER_ID_BASE + i
+            await dp.throttle(KEY, rate=0.1, user_id=user_id, chat_id=user_id, no_error=True)
+        return dp
+
+    return asyncio.run(run())
+
+
+def token_bucket(users: int, idle_timeout: float):
+    clock = FakeClock()
+    bucket = TokenBucket(0.1, idle_timeout=idle_timeout, clock=clock)
+    # 1M foydalanuvchi bir soat davomida bir tekis keladi
+    step = 3600 / users
+    for i in range(users):
+        clock.now = i * step
+        bucket.consume(USER_ID_BASE + i)
+    return bucket
+
+
+def report(label: str, users: int, current: int, peak: int, elapsed: float, entries: int):
+    print(f"{label:<22}{entries:>10}{current / 2 ** 20:>12.1f}{peak / 2 ** 20:>12.1f}"
+          f"{current / users:>12.1f}{users / elapsed:>12.0f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--users', type=int, default=1_000_000)
+    parser.add_argument('--idle-timeout', type=float, default=60)
+    parser.add_argument('--skip-legacy', action='store_true', help="Eski usulni o'lchamaslik")
+    args = parser.parse_args(argv)
+
+    print(f"{'':<22}{'entries':>10}{'MiB':>12}{'peak MiB':>12}{'B/user':>12}{'req/s':>12}")
+    if not args.skip_legacy:
+        dp, current, peak, elapsed = measure(lambda: dispatcher_throttle(args.users))
+        report('dispatcher.throttle', args.users, current, peak, elapsed, len(dp.storage.data))
+        del dp
+
+    bucket, current, peak, elapsed = measure(lambda: token_bucket(args.users, 10 ** 9))
+    report('token bucket', args.users, current, peak, elapsed, len(bucket))
+    del bucket
+
+    bucket, current, peak, elapsed = measure(lambda: token_bucket(args.users, args.idle_timeout))
+    report(f'token bucket ({args.idle_timeout:g}s)', args.users, current, peak, elapsed, len(bucket))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+"""
+Polling va webhook rejimlarining o'tkazuvchanligini solishtirish.
+
+Har bir rejimda ``app.py`` alohida jarayonda soxta Bot API ga ulanib ishga
+tushiriladi, unga turli foydalanuvchilardan ``/help`` updatelari yuboriladi
+va barcha javoblar kelguncha vaqt o'lchanadi.
+
+Ishga tushirish:
+    python -m benchmarks.webhook_vs_polling --updates 5000 --latency 0.02
+"""
+import argparse
+import asyncio
+import os
+import time
+
+from benchmarks.fake_bot_api import FakeBotAPI, message_update, run_bot
+from benchmarks.schema import create_database
+
+
+async def run_mode(mode: str, db_path: str, updates: int, latency: float, timeout: float) -> float:
+    api = FakeBotAPI(latency=latency)
+    base_url = await api.start()
+    try:
+        # Telegram limitlari emas, rejimning o'zi o'lchanadi
+        async with run_bot(api, base_url, mode, db_path, timeout=timeout, SEND_GLOBAL_RATE=1_000_000):
+            # Ishga tushishdagi admin xabarini hisobga olmaymiz
+            baseline = api.sent_messages
+
+            batch = [
+                message_update(api.next_update_id(), 10_000_000 + i, '/help')
+                for i in range(updates)
+            ]
+            started = time.perf_counter()
+            api.push_updates(batch)
+            await api.wait_sent(baseline + updates, timeout)
+            return updates / (time.perf_counter() - started)
+    finally:
+        await api.stop()
+
+
+async def main_async(args, db_path: str):
+    results = {}
+    for mode in args.modes:
+        results[mode] = await run_mode(mode, db_path, args.updates, args.latency, args.timeout)
+        print(f"{mode:<10}{results[mode]:>12.0f} updates/s")
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--updates', type=int, default=5000)
+    parser.add_argument('--latency', type=float, default=0.02, help="Soxta API javob kechikishi (soniya)")
+    parser.add_argument('--timeout', type=float, default=300)
+    parser.add_argument('--modes', nargs='+', default=['polling', 'webhook'], choices=['polling', 'webhook'])
+    args = parser.parse_args(argv)
+
+    db_path = create_database()
+    try:
+        asyncio.run(main_async(args, db_path))
+    finally:
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(db_path + suffix):
+                os.remove(db_path + suffix)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,52 @@
+import threading
+from typing import Callable, Dict, List
+
+
+class VersionedCache:
+    """
+    Admin paneldan kam o'zgaradigan ma'lumotlar keshi
+
+    Har bir kalit ``konkurs_cacheversion`` jadvalidagi versiyaga bog'langan.
+    Versiya o'zgarganda kalit keshdan o'chiriladi va keyingi so'rovda
+    bazadan qayta yuklanadi.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._versions: Dict[str, int] = {}
+        self._values = {}
+
+    def get_or_load(self, key: str, loader: Callable):
+        with self._lock:
+            if key in self._values:
+                return self._values[key]
+            version = self._versions.get(key)
+
+        value = loader()
+
+        with self._lock:
+            # Yuklash davomida versiya o'zgargan bo'lsa, natija eskirgan
+            # bo'lishi mumkin, shuning uchun uni saqlamaymiz
+            if self._versions.get(key) == version:
+                self._values[key] = value
+        return value
+
+    def apply_versions(self, versions: Dict[str, int]) -> List[str]:
+        """
+        Yangi versiyalarni qo'llash
+
+        Returns:
+            list: Keshdan o'chirilgan kalitlar
+        """
+        changed = []
+        with self._lock:
+            for key, version in versions.items():
+                if self._versions.get(key) != version:
+                    self._versions[key] = version
+                    self._values.pop(key, None)
+                    changed.append(key)
+        return changed
+
+    def invalidate(self, key: str):
+        with self._lock:
+            self._values.pop(key, None)
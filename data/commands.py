@@ -1,43 +1,201 @@
+import asyncio
+import functools
 import sqlite3
-from typing import Optional, List, Tuple
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Callable, Dict, Optional, List, Tuple
+
+from data.cache import VersionedCache
+from data.leaderboard import Leaderboard, ScoreIndex
+from data.query_log import QueryLog
+from data.statistics import FIELDS as STATISTICS_FIELDS
+from data.write_behind import DURABILITY_COMMIT, WriteBehindQueue
+
+# RETURNING va ON CONFLICT ... DO UPDATE uchun kerak bo'lgan eng past SQLite versiyasi
+MIN_SQLITE_VERSION = (3, 35, 0)
+
+# Har bir yangi ulanishda o'rnatiladigan sozlamalar (journal_mode alohida)
+PRAGMAS = (
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA cache_size = -16000",
+    "PRAGMA mmap_size = 134217728",
+)
+
+# WAL ga o'tish boshqa ulanishlar bilan to'qnashsa qayta urinishlar soni
+JOURNAL_MODE_ATTEMPTS = 5
+
+# Millisekundlargacha joriy vaqt (UTC), obuna yozuvlari vaqti uchun
+NOW_SQL = "strftime('%Y-%m-%d %H:%M:%f', 'now')"
+
+# Har bir hisoblangan taklif uchun beriladigan ball
+REFERRAL_BONUS = 10
+
+# Foydalanuvchilar ballari o'zgarganda triggerlar oshiradigan versiya kaliti
+SCORES_VERSION_KEY = 'scores'
 
-def logger(statement):
-    print(f"""
---------------------------------------------------------
-Executing:
-{statement}
---------------------------------------------------------
-""")
 
 class DataBase:
-    def __init__(self, path_to_db='admin/db.sqlite3'):
+    def __init__(self, path_to_db='admin/db.sqlite3', timeout: float = 30,
+                 cached_statements: int = 256, query_log: QueryLog = None,
+                 write_batch_size: int = 200, write_batch_delay: float = 0.0,
+                 write_durability: str = DURABILITY_COMMIT):
+        if sqlite3.sqlite_version_info < MIN_SQLITE_VERSION:
+            raise RuntimeError(
+                f"SQLite {'.'.join(map(str, MIN_SQLITE_VERSION))} or newer is required "
+                f"(RETURNING clause), found {sqlite3.sqlite_version}. "
+                f"Upgrade the system SQLite library or use a Python build linked against a newer one."
+            )
         self.path_to_db = path_to_db
+        self.timeout = timeout
+        self.cached_statements = cached_statements
+        # Sekin so'rovlar jurnali (None - o'chirilgan)
+        self.query_log = query_log
+        self._local = threading.local()
+        self._connections = []
+        self._lock = threading.Lock()
+        self.leaderboard = Leaderboard()
+        self.score_index = ScoreIndex()
+        # Reyting va indeks mos keladigan 'scores' versiyasi
+        self._scores_version = None
+        self.cache = VersionedCache()
+        self._version_lock = threading.Lock()
+        self._version_connection = None
+        self._data_version = None
+        # O'zgarish (commit + xotiradagi nusxalarni yangilash) va nusxalarni
+        # bazadan yuklash bir-biriga aralashib ketmasligi uchun
+        self._state_lock = threading.RLock()
+        # Foydalanuvchi yozuvlari guruhlab commit qilinadi
+        self.writes = WriteBehindQueue(
+            self,
+            max_batch=write_batch_size,
+            max_delay=write_batch_delay,
+            durability=write_durability,
+        )
 
     @property
     def connection(self):
-        return sqlite3.connect(self.path_to_db)
+        """
+        Joriy oqim uchun doimiy ulanish.
+
+        Har bir oqim o'z ulanishini bir marta ochadi va keyin qayta ishlatadi,
+        shuning uchun prepared statement keshi ham saqlanib qoladi.
+        """
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = self._connect()
+            self._local.connection = connection
+            with self._lock:
+                self._connections.append(connection)
+        return connection
+
+    def _connect(self):
+        connection = sqlite3.connect(
+            self.path_to_db,
+            timeout=self.timeout,
+            cached_statements=self.cached_statements,
+            check_same_thread=False,
+            factory=self.query_log.connection_class if self.query_log else sqlite3.Connection,
+        )
+        self._enable_wal(connection)
+        for pragma in PRAGMAS:
+            connection.execute(pragma)
+        return connection
+
+    @staticmethod
+    def _enable_wal(connection):
+        """
+        Bazani WAL rejimiga o'tkazish
+
+        Rejim fayl bilan saqlanadi, shuning uchun faqat birinchi ulanish uni
+        o'zgartiradi. O'tish eksklyuziv qulf talab qiladi va busy_timeout ni
+        kutmasdan "database is locked" berishi mumkin, shuning uchun qayta urinadi.
+        """
+        for attempt in range(JOURNAL_MODE_ATTEMPTS):
+            mode, = connection.execute("PRAGMA journal_mode").fetchone()
+            if mode.lower() == 'wal':
+                return
+            try:
+                connection.execute("PRAGMA journal_mode = WAL")
+                return
+            except sqlite3.OperationalError:
+                if attempt == JOURNAL_MODE_ATTEMPTS - 1:
+                    raise
+                time.sleep(0.05 * (attempt + 1))
+
+    def close(self):
+        """Navbatdagi yozuvlarni commit qilib, barcha ochiq ulanishlarni yopish"""
+        self.writes.close()
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for connection in connections:
+            connection.close()
+        self._local = threading.local()
+        self._version_connection = None
+        self._data_version = None
+
+    @contextmanager
+    def transaction(self, immediate: bool = False):
+        """
+        Bitta tranzaksiya ichida bir nechta so'rov bajarish
+
+        ``immediate=True`` da yozish qulfi birinchi so'rovdan oldin olinadi.
+        """
+        connection = self.connection
+        try:
+            if immediate:
+                connection.execute("BEGIN IMMEDIATE")
+            yield connection.cursor()
+            connection.commit()
+        except Exception:
+            connection.rollback()
+            raise
 
     def execute(self, sql: str, parameters: tuple = None, fetchone=False, fetchall=False, commit=False):
         if not parameters:
             parameters = ()
         connection = self.connection
-        connection.set_trace_callback(logger)
-        cursor = connection.cursor()
-        data = None
-        cursor.execute(sql, parameters)
-
-        if commit:
-            connection.commit()
-        if fetchall:
-            data = cursor.fetchall()
-        if fetchone:
-            data = cursor.fetchone()
-        connection.close()
+        try:
+            cursor = connection.execute(sql, parameters)
+            data = None
+            if fetchall:
+                data = cursor.fetchall()
+            if fetchone:
+                data = cursor.fetchone()
+            if commit:
+                connection.commit()
+        except Exception:
+            if connection.in_transaction:
+                connection.rollback()
+            raise
         return data
 
-    def add_user(self, fullname: str, user_id: int, username: str = None, referral_code: str = None):
-        """Yangi foydalanuvchi qo'shish"""
-        sql = """
+    def add_user(self, fullname: str, user_id: int, username: str = None, referral_code: str = None,
+                 referrer_id: int = None):
+        """
+        Foydalanuvchini ro'yxatdan o'tkazish (write-behind navbati orqali)
+
+        ``INSERT ... ON CONFLICT DO NOTHING`` so'rovi: foydalanuvchi
+        allaqachon bor bo'lsa (masalan, ikkita /start bir vaqtda kelsa) u
+        qayta yozilmaydi. Taklif qilgan ``referrer_id`` bazada bo'lsa
+        ``referred_by_id`` shu so'rovning o'zida yoziladi. Botni bloklab
+        faolsizlangan foydalanuvchi /start bosganda qayta faollashadi.
+
+        Args:
+            fullname (str): To'liq ism
+            user_id (int): Telegram ID
+            username (str): Telegram username
+            referral_code (str): Foydalanuvchining taklif kodi
+            referrer_id (int): Taklif qilgan foydalanuvchi telegram ID si
+
+        Returns:
+            tuple: (id, telegram_id, fullname, score, is_active, referred_by_id) -
+                yangi, qayta faollashgan yoki mavjud (o'zgarmagan) foydalanuvchi;
+                ``queued`` rejimida None
+        """
+        insert_sql = """
         INSERT INTO konkurs_user (
             fullname, 
             telegram_id, 
@@ -46,9 +204,21 @@ class DataBase:
             referral_code, 
             is_active,
             is_referral_counted,
-            created_at
+            created_at,
+            referred_by_id
         ) 
-        VALUES (?, ?, ?, ?, ?, ?, ?, datetime('now'))
+        VALUES (?, ?, ?, ?, ?, ?, ?, datetime('now'), (SELECT id FROM konkurs_user WHERE telegram_id = ?))
+        ON CONFLICT (telegram_id) DO NOTHING
+        RETURNING id, telegram_id, fullname, score, is_active, referred_by_id
+        """
+        reactivate_sql = """
+        UPDATE konkurs_user SET is_active = 1
+        WHERE telegram_id = ? AND is_active = 0
+        RETURNING id, telegram_id, fullname, score, is_active, referred_by_id
+        """
+        existing_sql = """
+        SELECT id, telegram_id, fullname, score, is_active, referred_by_id
+        FROM konkurs_user WHERE telegram_id = ?
         """
         parameters = (
             fullname,
@@ -58,8 +228,35 @@ class DataBase:
             referral_code,
             True,
             False,
+            referrer_id,
         )
-        self.execute(sql, parameters=parameters, commit=True)
+
+        def register(connection, parameters):
+            # (qator, holat): 'created', 'reactivated' yoki 'existing'
+            row = connection.execute(insert_sql, parameters).fetchone()
+            if row:
+                return row, 'created'
+            row = connection.execute(reactivate_sql, (user_id,)).fetchone()
+            if row:
+                return row, 'reactivated'
+            return connection.execute(existing_sql, (user_id,)).fetchone(), 'existing'
+
+        def on_commit(result):
+            row, status = result
+            if status != 'existing':
+                self._score_changed(row[:5], points=None)
+
+        def statistics(result):
+            row, status = result
+            if status == 'created':
+                return {'total_users': 1, 'active_users': 1}
+            if status == 'reactivated':
+                return {'active_users': 1}
+            return {}
+
+        # Navbat tartibli: taklif qilganning hali commit bo'lmagan yozuvi ham subquery ga ko'rinadi
+        result = self.writes.submit(register, parameters, (user_id,), on_commit, statistics)
+        return result[0] if result else None
 
     def get_user_by_chat_id(self, telegram_id: int):
         """
@@ -71,6 +268,7 @@ class DataBase:
         Returns:
             tuple: Foydalanuvchi ma'lumotlari
         """
+        self.writes.wait_for(telegram_id)
         sql = "SELECT * FROM konkurs_user WHERE telegram_id = ?"
         return self.execute(sql, (telegram_id,), fetchone=True)
 
@@ -79,13 +277,101 @@ class DataBase:
         sql = "SELECT * FROM konkurs_user WHERE referral_code = ?"
         return self.execute(sql, (referral_code,), fetchone=True)
 
+    def load_leaderboard(self):
+        """Reyting va o'rinlar indeksini bazadan yuklash"""
+        with self._state_lock:
+            self._load_top()
+            self._load_score_index()
+
+    def _scores_version_in(self, connection) -> Optional[int]:
+        sql = "SELECT version FROM konkurs_cacheversion WHERE key = ?"
+        row = connection.execute(sql, (SCORES_VERSION_KEY,)).fetchone()
+        return row[0] if row else None
+
+    def _sync_scores_version(self, version: Optional[int], own_version: Optional[int] = None):
+        """
+        Ballar boshqa jarayonda yoki admin panelda o'zgargan bo'lsa xotiradagi
+        reyting va indeksni yaroqsiz qilish
+
+        Args:
+            version (int): Bazadagi 'scores' versiyasi (o'z yozuvlaridan oldin)
+            own_version (int): Shu jarayon yozuvlaridan keyingi versiya, bu
+                yozuvlar xotiradagi nusxaga to'g'ridan-to'g'ri qo'llanadi
+        """
+        if version is None:
+            return
+        with self._state_lock:
+            if self._scores_version is not None and version > self._scores_version:
+                self.leaderboard.invalidate()
+                self.score_index.invalidate()
+            latest = version if own_version is None else own_version
+            if self._scores_version is None or latest > self._scores_version:
+                self._scores_version = latest
+
+    def _remember_scores_version(self):
+        # Versiya ma'lumotlardan oldin o'qiladi: oraliqdagi o'zgarish
+        # keyingi tekshiruvda nusxani yana yaroqsiz qiladi
+        if self._scores_version is None:
+            self._scores_version = self._scores_version_in(self.connection)
+
+    def _load_top(self):
+        sql = """
+        SELECT id, telegram_id, fullname, score
+        FROM konkurs_user
+        WHERE is_active = 1
+        ORDER BY score DESC, id
+        LIMIT ?
+        """
+        with self._state_lock:
+            self._remember_scores_version()
+            self.leaderboard.load(lambda size: self.execute(sql, (size,), fetchall=True))
+
+    def _load_score_index(self):
+        sql = """
+        SELECT score, COUNT(*)
+        FROM konkurs_user
+        WHERE is_active = 1
+        GROUP BY score
+        """
+        with self._state_lock:
+            self._remember_scores_version()
+            self.score_index.load(self.execute(sql, fetchall=True))
+
+    def _score_changed(self, row, points: Optional[int]):
+        """
+        Ball o'zgarishini xotiradagi reyting va indeksga qo'llash
+
+        Args:
+            row: (id, telegram_id, fullname, score, is_active) - RETURNING natijasi
+            points (int): Qo'shilgan ball, yangi yoki qayta faollashgan foydalanuvchi uchun None
+        """
+        if not row:
+            return
+        user_pk, telegram_id, fullname, score, is_active = row
+        self.leaderboard.update(user_pk, telegram_id, fullname, score, bool(is_active))
+        if is_active:
+            old_score = score - points if points is not None else None
+            self.score_index.update(old_score, score)
+
     def get_top_users_by_score(self, top_n=20):
-        """Eng ko'p ball to'plagan foydalanuvchilarni olish"""
+        """
+        Eng ko'p ball to'plagan foydalanuvchilarni olish
+
+        Natija xotiradagi reytingdan olinadi, faqat u yaroqsiz bo'lsa
+        yoki ``top_n`` uning hajmidan katta bo'lsa bazaga murojaat qilinadi.
+        """
+        top = self.leaderboard.top(top_n)
+        if top is None and top_n <= self.leaderboard.size:
+            self._load_top()
+            top = self.leaderboard.top(top_n)
+        if top is not None:
+            return top
+
         sql = """
         SELECT fullname, score, telegram_id 
         FROM konkurs_user
         WHERE is_active = 1
-        ORDER BY score DESC
+        ORDER BY score DESC, id
         LIMIT ?
         """
         return self.execute(sql, (top_n,), fetchall=True)
@@ -100,103 +386,91 @@ class DataBase:
         Returns:
             int: Foydalanuvchi bali
         """
+        self.writes.wait_for(telegram_id)
         sql = "SELECT score FROM konkurs_user WHERE telegram_id = ?"
         result = self.execute(sql, (telegram_id,), fetchone=True)
         return result[0] if result else None
 
-    def give_referral_bonus(self, referrer_id: int, referred_id: int) -> bool:
+    def get_score_and_rank(self, telegram_id: int) -> Optional[Tuple[int, Optional[int]]]:
         """
-        Referral bonus berish
+        Foydalanuvchi bali va reytingdagi o'rni
+
+        O'rin jadvalni skanerlamasdan ``score_index`` dan olinadi.
 
         Args:
-            referrer_id (int): Taklif qilgan foydalanuvchi ID si
-            referred_id (int): Taklif qilingan foydalanuvchi ID si
+            telegram_id (int): Foydalanuvchi telegram ID si
 
         Returns:
-            bool: Bonus berildi yoki yo'qligi
+            tuple: (ball, o'rin), faol bo'lmagan foydalanuvchi uchun o'rin None
         """
-        try:
-            # Referral statusni tekshirish
-            referred_user = self.get_user_by_chat_id(referred_id)
-            if not referred_user:
-                print(f"Referred user not found: {referred_id}")
-                return False
-
-            # is_referral_counted indeksi 6-o'rinda
-            if referred_user[6]:  # Agar oldin hisoblangan bo'lsa
-                print(f"Referral already counted for user {referred_id}")
-                return False
-
-            # Ball berish va status o'zgartirish
-            connection = self.connection
-            try:
-                cursor = connection.cursor()
-
-                # Ball qo'shish
-                cursor.execute(
-                    "UPDATE konkurs_user SET score = score + 10 WHERE telegram_id = ?",
-                    (referrer_id,)
-                )
-
-                # Hisoblanganini belgilash
-                cursor.execute(
-                    "UPDATE konkurs_user SET is_referral_counted = 1 WHERE telegram_id = ?",
-                    (referred_id,)
-                )
-
-                connection.commit()
-                print(f"Referral bonus given: referrer={referrer_id}, referred={referred_id}")
-                return True
-
-            except Exception as e:
-                print(f"Error in transaction: {e}")
-                connection.rollback()
-                return False
-            finally:
-                connection.close()
-
-        except Exception as e:
-            print(f"Error in give_referral_bonus: {e}")
-            return False
-
-    def check_and_create_referral(self, referrer_id: int, referred_id: int) -> bool:
+        self.writes.wait_for(telegram_id)
+        sql = "SELECT score, is_active FROM konkurs_user WHERE telegram_id = ?"
+        result = self.execute(sql, (telegram_id,), fetchone=True)
+        if not result:
+            return None
+        score, is_active = result
+        if not is_active:
+            return score, None
+        if not self.score_index.loaded:
+            self._load_score_index()
+        return score, self.score_index.rank(score)
+
+    def credit_referral(self, telegram_id: int, points: int = REFERRAL_BONUS) -> Optional[int]:
         """
-        Referral aloqani yaratish
+        Taklif qilingan foydalanuvchi uchun taklif qilganga ball berish
+
+        Taklif qilgan ``referred_by_id`` dan olinadi. Hisoblanganlik belgisi
+        faqat hali hisoblanmagan bo'lsa o'zgaradi va ball shu tranzaksiyada
+        qo'shiladi, shuning uchun bir vaqtda kelgan chaqiruvlardan (boshqa
+        jarayonlardan ham) faqat bittasi ball beradi.
 
         Args:
-            referrer_id (int): Taklif qilgan foydalanuvchi ID si
-            referred_id (int): Taklif qilingan foydalanuvchi ID si
+            telegram_id (int): Taklif qilingan foydalanuvchi telegram ID si
+            points (int): Qo'shiladigan ballar
 
         Returns:
-            bool: Muvaffaqiyatli yaratilgan yoki yo'qligi
+            int: Ball olgan foydalanuvchi telegram ID si, ball berilmagan bo'lsa None
         """
-        try:
-            # Avval referrer mavjudligini tekshiramiz
-            referrer = self.get_user_by_chat_id(referrer_id)
-            if not referrer:
-                print(f"Referrer not found: {referrer_id}")
-                return False
-
-            # O'ziga o'zi referral bo'lishni oldini olish
-            if referrer_id == referred_id:
-                print("Self referral attempted")
-                return False
-
-            # Referred foydalanuvchini yangilaymiz
-            sql = """
-            UPDATE konkurs_user 
-            SET 
-                referred_by_id = (SELECT id FROM konkurs_user WHERE telegram_id = ?),
-                is_referral_counted = 0
-            WHERE telegram_id = ?
-            """
-            self.execute(sql, (referrer_id, referred_id), commit=True)
-            print(f"Referral created: {referrer_id} -> {referred_id}")
-            return True
+        # Navbatdagi ro'yxatdan o'tish va referral yozuvlari commit bo'lishini kutish
+        self.writes.wait_for(telegram_id)
+        connection = self.connection
+        with self._state_lock:
+            try:
+                # Yozish qulfi darhol olinadi: ikkinchi chaqiruv birinchisi
+                # commit bo'lgandan keyin belgini allaqachon 1 holida ko'radi
+                connection.execute("BEGIN IMMEDIATE")
+                version = self._scores_version_in(connection)
+                counted = connection.execute(
+                    """
+                    UPDATE konkurs_user SET is_referral_counted = 1
+                    WHERE telegram_id = ? AND is_referral_counted = 0 AND referred_by_id IS NOT NULL
+                    RETURNING referred_by_id
+                    """,
+                    (telegram_id,)
+                ).fetchone()
+                referrer = None
+                if counted:
+                    referrer = connection.execute(
+                        """
+                        UPDATE konkurs_user SET score = score + ? WHERE id = ?
+                        RETURNING id, telegram_id, fullname, score, is_active
+                        """,
+                        (points, counted[0])
+                    ).fetchone()
+                if referrer:
+                    self._add_statistics(connection, {'total_score': points, 'referral_counts': 1})
+                own_version = self._scores_version_in(connection)
+                connection.commit()
+            except Exception:
+                if connection.in_transaction:
+                    connection.rollback()
+                raise
 
-        except Exception as e:
-            print(f"Error in check_and_create_referral: {e}")
-            return False
+            self._sync_scores_version(version, own_version)
+            if not referrer:
+                return None
+            self._score_changed(referrer, points=points)
+        return referrer[1]
 
     def update_user_score(self, telegram_id: int, points: int):
         """
@@ -207,35 +481,59 @@ class DataBase:
             points (int): Qo'shiladigan ballar
         """
         try:
-            current_score = self.get_score_by_id(telegram_id)
-            if current_score is not None:
-                new_score = current_score + points
-                sql = "UPDATE konkurs_user SET score = ? WHERE telegram_id = ?"
-                self.execute(sql, (new_score, telegram_id), commit=True)
-                print(f"Score updated for {telegram_id}: {current_score} -> {new_score}")
-            else:
-                print(f"User not found: {telegram_id}")
+            sql = """
+            UPDATE konkurs_user SET score = score + ? WHERE telegram_id = ?
+            RETURNING id, telegram_id, fullname, score, is_active
+            """
+
+            def on_commit(row):
+                self._score_changed(row, points=points)
+                if row:
+                    new_score = row[3]
+                    print(f"Score updated for {telegram_id}: {new_score - points} -> {new_score}")
+                else:
+                    print(f"User not found: {telegram_id}")
+
+            def statistics(row):
+                return {'total_score': points} if row else {}
+
+            self.writes.submit(sql, (points, telegram_id), (telegram_id,), on_commit, statistics)
         except Exception as e:
             print(f"Error in update_user_score: {e}")
 
-    def mark_referral_counted(self, telegram_id: int):
+    def check_versions(self) -> List[str]:
         """
-        Referral hisoblanganini belgilash
+        Admin panelda o'zgargan ma'lumotlarni keshdan chiqarish
 
-        Args:
-            telegram_id (int): Foydalanuvchi telegram ID si
+        ``PRAGMA data_version`` boshqa ulanish commit qilgandagina o'zgaradi,
+        shuning uchun ko'p hollarda hech qanday jadval o'qilmaydi. O'zgargan
+        bo'lsa faqat kichik ``konkurs_cacheversion`` jadvali o'qiladi.
+
+        Returns:
+            list: Keshdan o'chirilgan kalitlar
         """
-        try:
-            sql = "UPDATE konkurs_user SET is_referral_counted = 1 WHERE telegram_id = ?"
-            self.execute(sql, (telegram_id,), commit=True)
-            print(f"Marked referral as counted for user {telegram_id}")
-        except Exception as e:
-            print(f"Error in mark_referral_counted: {e}")
+        with self._version_lock:
+            if self._version_connection is None:
+                self._version_connection = self._connect()
+                with self._lock:
+                    self._connections.append(self._version_connection)
+            connection = self._version_connection
+
+            data_version, = connection.execute("PRAGMA data_version").fetchone()
+            if data_version == self._data_version:
+                return []
+            versions = dict(connection.execute("SELECT key, version FROM konkurs_cacheversion").fetchall())
+            self._data_version = data_version
+        self._sync_scores_version(versions.get(SCORES_VERSION_KEY))
+        return self.cache.apply_versions(versions)
 
     def get_latest_award(self):
-        """Eng so'nggi mukofotni olish"""
+        """Eng so'nggi mukofotni olish (keshdan)"""
+        return self.cache.get_or_load('awards', self._get_latest_award)
+
+    def _get_latest_award(self):
         sql = """
-        SELECT title, description, image 
+        SELECT id, title, description, image, telegram_file_id
         FROM konkurs_award 
         WHERE is_active = 1 
         ORDER BY created_at DESC 
@@ -243,8 +541,21 @@ class DataBase:
         """
         return self.execute(sql, fetchone=True)
 
+    def set_award_file_id(self, award_id: int, image: str, file_id: Optional[str]):
+        """
+        Mukofot rasmining Telegram file_id sini saqlash
+
+        Rasm shu orada admin panelda almashtirilgan bo'lsa, file_id yozilmaydi.
+        """
+        sql = "UPDATE konkurs_award SET telegram_file_id = ? WHERE id = ? AND image = ?"
+        self.execute(sql, (file_id, award_id, image), commit=True)
+        self.cache.invalidate('awards')
+
     def get_all_active_links(self):
-        """Barcha faol kanallarni olish"""
+        """Barcha faol kanallarni olish (keshdan)"""
+        return self.cache.get_or_load('links', self._get_all_active_links)
+
+    def _get_all_active_links(self):
         sql = """
         SELECT title, url 
         FROM konkurs_link 
@@ -253,9 +564,10 @@ class DataBase:
         return self.execute(sql, fetchall=True)
 
     def get_user_subscriptions(self, telegram_id: int) -> List[tuple]:
-        """Foydalanuvchi obunalarini olish"""
+        """Foydalanuvchi obunalari: (title, url, is_subscribed, updated_at)"""
+        self.writes.wait_for(telegram_id)
         sql = """
-        SELECT l.title, l.url, us.is_subscribed
+        SELECT l.title, l.url, us.is_subscribed, us.updated_at
         FROM konkurs_link l
         JOIN konkurs_usersubscription us ON l.id = us.channel_id
         JOIN konkurs_user u ON us.user_id = u.id
@@ -264,39 +576,86 @@ class DataBase:
         return self.execute(sql, (telegram_id,), fetchall=True)
 
     def update_subscription_status(self, telegram_id: int, channel_url: str, is_subscribed: bool):
-        """Obuna statusini yangilash"""
-        sql = """
+        """
+        Obuna statusini yozish (write-behind navbati orqali)
+
+        Obuna bo'lganda yozuv bo'lmasa yaratiladi. Chiqib ketganda faqat
+        mavjud yozuv yangilanadi. Foydalanuvchi yoki kanal bazada bo'lmasa
+        hech narsa o'zgarmaydi.
+
+        Returns:
+            tuple: Status o'zgargan bo'lsa (id,), aks holda va ``queued`` rejimida None
+        """
+        if is_subscribed:
+            sql = f"""
+            INSERT INTO konkurs_usersubscription (is_subscribed, created_at, updated_at, channel_id, user_id)
+            SELECT 1, datetime('now'), {NOW_SQL}, l.id, u.id
+            FROM konkurs_user u, konkurs_link l
+            WHERE u.telegram_id = ? AND l.url = ?
+            ON CONFLICT (user_id, channel_id) DO UPDATE SET is_subscribed = 1, updated_at = excluded.updated_at
+            WHERE is_subscribed = 0
+            RETURNING id
+            """
+        else:
+            sql = f"""
+            UPDATE konkurs_usersubscription
+            SET is_subscribed = 0, updated_at = {NOW_SQL}
+            WHERE user_id = (SELECT id FROM konkurs_user WHERE telegram_id = ?)
+            AND channel_id = (SELECT id FROM konkurs_link WHERE url = ?)
+            AND is_subscribed = 1
+            RETURNING id
+            """
+
+        def statistics(changed):
+            if not changed:
+                return {}
+            return {'total_subscriptions': 1 if is_subscribed else -1}
+
+        return self.writes.submit(sql, (telegram_id, channel_url), (telegram_id,), statistics=statistics)
+
+    def confirm_subscription(self, telegram_id: int, channel_url: str):
+        """
+        Obuna bo'lgan deb yozilgan holatni hozirgi vaqt bilan tasdiqlash
+
+        Holat o'zgarmaydi, shuning uchun statistika ham o'zgarmaydi.
+
+        Returns:
+            tuple: Yozuv yangilangan bo'lsa (id,), aks holda va ``queued`` rejimida None
+        """
+        sql = f"""
         UPDATE konkurs_usersubscription
-        SET is_subscribed = ?
+        SET updated_at = {NOW_SQL}
         WHERE user_id = (SELECT id FROM konkurs_user WHERE telegram_id = ?)
         AND channel_id = (SELECT id FROM konkurs_link WHERE url = ?)
+        AND is_subscribed = 1
+        RETURNING id
         """
-        self.execute(sql, (is_subscribed, telegram_id, channel_url), commit=True)
-
-    def update_statistics(self):
-        """Kunlik statistikani yangilash"""
-        # Avval bugungi statistika mavjudligini tekshirish
-        check_sql = """
-        SELECT id FROM konkurs_statistics 
-        WHERE date = date('now')
+        return self.writes.submit(sql, (telegram_id, channel_url), (telegram_id,))
+
+    def _count_statistics(self, connection) -> dict:
+        """Statistikaning haqiqiy qiymatlarini jadvallardan hisoblash"""
+        users_sql = """
+        SELECT
+            COUNT(*),
+            COALESCE(SUM(is_active = 1), 0),
+            COALESCE(SUM(score), 0),
+            COALESCE(SUM(is_referral_counted = 1), 0)
+        FROM konkurs_user
         """
-        existing_stats = self.execute(check_sql, fetchone=True)
-
-        if existing_stats:
-            # Mavjud statistikani yangilash
-            sql = """
-            UPDATE konkurs_statistics
-            SET 
-                total_users = (SELECT COUNT(*) FROM konkurs_user),
-                active_users = (SELECT COUNT(*) FROM konkurs_user WHERE is_active = 1),
-                total_subscriptions = (SELECT COUNT(*) FROM konkurs_usersubscription WHERE is_subscribed = 1),
-                total_score = (SELECT COALESCE(SUM(score), 0) FROM konkurs_user),
-                referral_counts = (SELECT COUNT(*) FROM konkurs_user WHERE is_referral_counted = 1)
-            WHERE date = date('now')
+        subscriptions_sql = "SELECT COUNT(*) FROM konkurs_usersubscription WHERE is_subscribed = 1"
+        total_users, active_users, total_score, referral_counts = connection.execute(users_sql).fetchone()
+        total_subscriptions, = connection.execute(subscriptions_sql).fetchone()
+        return {
+            'total_users': total_users,
+            'active_users': active_users,
+            'total_subscriptions': total_subscriptions,
+            'total_score': total_score,
+            'referral_counts': referral_counts,
+        }
+
+    def _insert_statistics(self, connection, values: dict):
+        connection.execute(
             """
-        else:
-            # Yangi statistika yaratish
-            sql = """
             INSERT INTO konkurs_statistics (
                 date,
                 total_users,
@@ -305,16 +664,97 @@ class DataBase:
                 total_score,
                 referral_counts
             )
-            SELECT
-                date('now'),
-                (SELECT COUNT(*) FROM konkurs_user),
-                (SELECT COUNT(*) FROM konkurs_user WHERE is_active = 1),
-                (SELECT COUNT(*) FROM konkurs_usersubscription WHERE is_subscribed = 1),
-                (SELECT COALESCE(SUM(score), 0) FROM konkurs_user),
-                (SELECT COUNT(*) FROM konkurs_user WHERE is_referral_counted = 1)
+            VALUES (date('now'), ?, ?, ?, ?, ?)
+            """,
+            tuple(values[field] for field in STATISTICS_FIELDS)
+        )
+
+    def _add_statistics(self, connection, deltas: Dict[str, int]):
+        """
+        Deltalarni bugungi ``konkurs_statistics`` qatoriga qo'shish
+
+        O'zgarishning o'z tranzaksiyasi ichida chaqiriladi, shuning uchun
+        bir nechta bot jarayoni bir-birining qiymatlarini ustiga yozmaydi.
+        Bugungi qator hali bo'lmasa u jadvallardan sanab yaratiladi (shu
+        tranzaksiyadagi o'zgarishlar ham sanoqqa kiradi).
+        """
+        if not any(deltas.values()):
+            return
+        updated = connection.execute(
             """
+            UPDATE konkurs_statistics
+            SET
+                total_users = total_users + ?,
+                active_users = active_users + ?,
+                total_subscriptions = total_subscriptions + ?,
+                total_score = total_score + ?,
+                referral_counts = referral_counts + ?
+            WHERE date = date('now')
+            """,
+            tuple(deltas.get(field, 0) for field in STATISTICS_FIELDS)
+        ).rowcount
+        if not updated:
+            self._insert_statistics(connection, self._count_statistics(connection))
+
+    def reconcile_statistics(self) -> dict:
+        """
+        Bugungi statistikani haqiqiy qiymatlar bilan solishtirish va tuzatish
+
+        Sanash va tuzatish yozish qulfi ostida bajariladi, shuning uchun
+        boshqa jarayonlarning o'zgarishlari tushib qolmaydi.
+
+        Returns:
+            dict: Farq qilgan qiymatlar {maydon: (yozilgan, haqiqiy)}
+        """
+        with self.transaction(immediate=True) as cursor:
+            actual = self._count_statistics(cursor)
+            row = cursor.execute(
+                """
+                SELECT total_users, active_users, total_subscriptions, total_score, referral_counts
+                FROM konkurs_statistics
+                WHERE date = date('now')
+                """
+            ).fetchone()
+            if row is None:
+                self._insert_statistics(cursor, actual)
+                return {}
+
+            recorded = dict(zip(STATISTICS_FIELDS, row))
+            mismatches = {
+                field: (recorded[field], actual[field])
+                for field in STATISTICS_FIELDS
+                if recorded[field] != actual[field]
+            }
+            if mismatches:
+                cursor.execute(
+                    """
+                    UPDATE konkurs_statistics
+                    SET
+                        total_users = ?,
+                        active_users = ?,
+                        total_subscriptions = ?,
+                        total_score = ?,
+                        referral_counts = ?
+                    WHERE date = date('now')
+                    """,
+                    tuple(actual[field] for field in STATISTICS_FIELDS)
+                )
+        return mismatches
 
-        self.execute(sql, commit=True)
+    def update_statistics(self):
+        """
+        Bugungi statistika qatorini yaratish
+
+        Qiymatlar har bir o'zgarish bilan birga yoziladi. Bu metod yangi
+        kun boshlanganda, hali hech narsa o'zgarmagan bo'lsa ham, qatorni
+        jadvallardan sanab yaratadi.
+        """
+        sql = "SELECT 1 FROM konkurs_statistics WHERE date = date('now')"
+        if self.execute(sql, fetchone=True):
+            return
+        with self.transaction(immediate=True) as cursor:
+            if not cursor.execute(sql).fetchone():
+                self._insert_statistics(cursor, self._count_statistics(cursor))
 
     def get_daily_statistics(self):
         """Kunlik statistikani olish"""
@@ -328,4 +768,225 @@ class DataBase:
         FROM konkurs_statistics
         WHERE date = date('now')
         """
-        return self.execute(sql, fetchone=True)
\ No newline at end of file
+        return self.execute(sql, fetchone=True)
+
+    def get_award(self, award_id: int):
+        """Mukofotni id bo'yicha olish"""
+        sql = """
+        SELECT id, title, description, image, telegram_file_id
+        FROM konkurs_award
+        WHERE id = ?
+        """
+        return self.execute(sql, (award_id,), fetchone=True)
+
+    def deactivate_users(self, telegram_ids: List[int]) -> int:
+        """
+        Botni bloklagan foydalanuvchilarni nofaol qilish
+
+        Returns:
+            int: Nofaol qilinganlar soni
+        """
+        if not telegram_ids:
+            return 0
+        placeholders = ', '.join('?' * len(telegram_ids))
+        sql = f"""
+        UPDATE konkurs_user SET is_active = 0
+        WHERE telegram_id IN ({placeholders}) AND is_active = 1
+        RETURNING id, telegram_id, fullname, score, is_active
+        """
+        with self._state_lock:
+            with self.transaction(immediate=True) as cursor:
+                version = self._scores_version_in(cursor)
+                rows = cursor.execute(sql, tuple(telegram_ids)).fetchall()
+                self._add_statistics(cursor, {'active_users': -len(rows)})
+                own_version = self._scores_version_in(cursor)
+            self._sync_scores_version(version, own_version)
+            for row in rows:
+                self.leaderboard.update(row[0], row[1], row[2], row[3], False)
+                self.score_index.update(row[3], None)
+        return len(rows)
+
+    def get_running_broadcast(self):
+        """Yuborilayotgan xabar (keshdan): (id, text, award_id) yoki None"""
+        return self.cache.get_or_load('broadcasts', self._get_running_broadcast)
+
+    def _get_running_broadcast(self):
+        sql = """
+        SELECT id, text, award_id
+        FROM konkurs_broadcast
+        WHERE status = 'running'
+        ORDER BY id
+        LIMIT 1
+        """
+        return self.execute(sql, fetchone=True)
+
+    def claim_broadcast(self, broadcast_id: int, owner: str, lease_seconds: float):
+        """
+        Xabar yuborishni shu jarayon nomiga olish
+
+        Bir vaqtda faqat bitta bot jarayoni yuboradi. Egasi ``lease_seconds``
+        ichida progressni yangilamasa (masalan jarayon o'chib qolsa), boshqa
+        jarayon yuborishni davom ettira oladi.
+
+        Returns:
+            tuple: (last_user_id, total_users, sent, blocked, failed) yoki None
+        """
+        sql = """
+        UPDATE konkurs_broadcast
+        SET
+            lease_owner = ?,
+            lease_expires_at = datetime('now', ?),
+            started_at = COALESCE(started_at, datetime('now')),
+            total_users = CASE
+                WHEN total_users = 0 THEN (SELECT COUNT(*) FROM konkurs_user WHERE is_active = 1)
+                ELSE total_users
+            END,
+            updated_at = datetime('now')
+        WHERE id = ? AND status = 'running'
+        AND (lease_owner IS NULL OR lease_owner = ? OR lease_expires_at < datetime('now'))
+        RETURNING last_user_id, total_users, sent_count, blocked_count, failed_count
+        """
+        lease = f'+{int(lease_seconds)} seconds'
+        return self.execute(sql, (owner, lease, broadcast_id, owner), fetchone=True, commit=True)
+
+    def get_broadcast_recipients(self, after_user_id: int, limit: int) -> List[tuple]:
+        """
+        Keyingi qabul qiluvchilar (keyset pagination)
+
+        OFFSET ishlatilmaydi: har bir sahifa birlamchi kalit indeksi bo'yicha
+        ``after_user_id`` dan boshlanadi, shuning uchun oxirgi sahifalar ham
+        birinchisi kabi tez o'qiladi.
+
+        Returns:
+            list: [(id, telegram_id), ...]
+        """
+        # "+is_active": SQLite is_active indeksini tanlab, butun ro'yxatni
+        # saralamasligi uchun - sahifa id oralig'idan o'qiladi
+        sql = """
+        SELECT id, telegram_id
+        FROM konkurs_user
+        WHERE id > ? AND +is_active = 1
+        ORDER BY id
+        LIMIT ?
+        """
+        return self.execute(sql, (after_user_id, limit), fetchall=True)
+
+    def save_broadcast_progress(self, broadcast_id: int, owner: str, last_user_id: int,
+                                sent: int, blocked: int, failed: int, rate: float,
+                                lease_seconds: float) -> Optional[str]:
+        """
+        Progressni saqlash va egalik muddatini uzaytirish
+
+        Returns:
+            str: Yuborishning joriy holati (admin to'xtatgan bo'lishi mumkin),
+            egalik boshqa jarayonga o'tgan bo'lsa None
+        """
+        sql = """
+        UPDATE konkurs_broadcast
+        SET
+            last_user_id = ?,
+            sent_count = ?,
+            blocked_count = ?,
+            failed_count = ?,
+            messages_per_second = ?,
+            lease_expires_at = datetime('now', ?),
+            updated_at = datetime('now')
+        WHERE id = ? AND lease_owner = ?
+        RETURNING status
+        """
+        lease = f'+{int(lease_seconds)} seconds'
+        row = self.execute(
+            sql, (last_user_id, sent, blocked, failed, rate, lease, broadcast_id, owner),
+            fetchone=True, commit=True
+        )
+        return row[0] if row else None
+
+    def release_broadcast(self, broadcast_id: int, owner: str, finished: bool):
+        """Egalikni bo'shatish; ``finished`` bo'lsa yuborish tugagan deb belgilanadi"""
+        sql = """
+        UPDATE konkurs_broadcast
+        SET
+            status = CASE WHEN ? AND status = 'running' THEN 'done' ELSE status END,
+            finished_at = CASE WHEN ? THEN datetime('now') ELSE finished_at END,
+            messages_per_second = 0,
+            lease_owner = NULL,
+            lease_expires_at = NULL,
+            updated_at = datetime('now')
+        WHERE id = ? AND lease_owner = ?
+        """
+        self.execute(sql, (finished, finished, broadcast_id, owner), commit=True)
+        self.cache.invalidate('broadcasts')
+
+
+class AsyncDataBase:
+    """
+    DataBase ning asinxron varianti.
+
+    Metodlar DataBase bilan bir xil, lekin ``await`` bilan chaqiriladi va
+    event loop o'rniga alohida oqimlarda bajariladi. O'qishlar va yozishlar
+    alohida oqimlar to'plamida bajariladi, shuning uchun sekin yozish reyting
+    o'qishlarini to'xtatmaydi. Foydalanuvchi yozuvlari yozuvchi oqimlardan
+    DataBase.writes navbatiga tushadi va u yerda guruhlab commit qilinadi.
+    """
+
+    WRITE_METHODS = frozenset({
+        'add_user',
+        'credit_referral',
+        'update_user_score',
+        'update_subscription_status',
+        'update_statistics',
+        'reconcile_statistics',
+        'set_award_file_id',
+        'deactivate_users',
+        'claim_broadcast',
+        'save_broadcast_progress',
+        'release_broadcast',
+    })
+
+    def __init__(self, database: DataBase = None, read_workers: int = 4, write_workers: int = 8,
+                 observe: Callable[[str, float, Optional[BaseException]], None] = None):
+        self.database = database or DataBase()
+        # observe(metod, soniya, xato): har bir chaqiruvning oqimdagi bajarilish vaqti
+        self.observe = observe
+        self._readers = ThreadPoolExecutor(max_workers=read_workers, thread_name_prefix='db-read')
+        self._writer = ThreadPoolExecutor(max_workers=write_workers, thread_name_prefix='db-write')
+
+    def _executor_for(self, name: str, kwargs: dict):
+        if name in self.WRITE_METHODS or (name == 'execute' and kwargs.get('commit')):
+            return self._writer
+        return self._readers
+
+    def __getattr__(self, name):
+        attr = getattr(self.database, name)
+        if name.startswith('_') or not callable(attr):
+            return attr
+
+        @functools.wraps(attr)
+        async def method(*args, **kwargs):
+            loop = asyncio.get_running_loop()
+            executor = self._executor_for(name, kwargs)
+            call = functools.partial(attr, *args, **kwargs)
+            if self.observe is not None:
+                call = functools.partial(self._observed, name, call)
+            return await loop.run_in_executor(executor, call)
+
+        setattr(self, name, method)
+        return method
+
+    def _observed(self, name: str, call: Callable):
+        started = time.perf_counter()
+        error = None
+        try:
+            return call()
+        except BaseException as err:
+            error = err
+            raise
+        finally:
+            self.observe(name, time.perf_counter() - started, error)
+
+    async def close(self):
+        """Navbatdagi so'rovlarni tugatib, oqimlar va ulanishlarni yopish"""
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self._writer.shutdown)
+        await loop.run_in_executor(None, self._readers.shutdown)
+        self.database.close()
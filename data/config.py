@@ -8,3 +8,59 @@ env.read_env()
 BOT_TOKEN = env.str("BOT_TOKEN")  # Bot toekn
 ADMINS = env.list("ADMINS")  # adminlar ro'yxati
 # IP = env.str("ip")  # Xosting ip manzili
+BOT_MODE = env.str("BOT_MODE", "polling")  # polling yoki webhook
+BOT_API_SERVER = env.str("BOT_API_SERVER", "https://api.telegram.org")  # Bot API manzili
+DB_PATH = env.str("DB_PATH", "admin/db.sqlite3")  # Bot ishlatadigan SQLite baza
+DB_READ_WORKERS = env.int("DB_READ_WORKERS", 4)  # O'qish so'rovlari uchun oqimlar soni
+DB_WRITE_WORKERS = env.int("DB_WRITE_WORKERS", 8)  # Yozuvlarni navbatga uzatuvchi oqimlar soni
+DB_WRITE_BATCH_SIZE = env.int("DB_WRITE_BATCH_SIZE", 200)  # Bitta tranzaksiyadagi yozuvlar chegarasi (commit rejimida amalda DB_WRITE_WORKERS dan oshmaydi)
+DB_WRITE_BATCH_DELAY = env.float("DB_WRITE_BATCH_DELAY", 0)  # Guruh yig'ish uchun qo'shimcha kutish (soniya)
+DB_WRITE_DURABILITY = env.str("DB_WRITE_DURABILITY", "commit")  # commit - commitni kutish, queued - kutmaslik
+QUERY_LOG_PATH = env.str("QUERY_LOG_PATH", "")  # Sekin SQL so'rovlar jurnali fayli (bo'sh - o'chirilgan)
+QUERY_LOG_THRESHOLD_MS = env.float("QUERY_LOG_THRESHOLD_MS", 50)  # Shundan uzoq so'rovlar yoziladi (ms)
+QUERY_LOG_SAMPLE_RATE = env.float("QUERY_LOG_SAMPLE_RATE", 0)  # Tez so'rovlardan tasodifiy yoziladigan ulush (0-1)
+QUERY_LOG_MAX_BYTES = env.int("QUERY_LOG_MAX_BYTES", 10000000)  # Jurnal fayli shu hajmga yetganda almashtiriladi
+QUERY_LOG_BACKUP_COUNT = env.int("QUERY_LOG_BACKUP_COUNT", 5)  # Saqlanadigan eski jurnal fayllari
+MEMBERSHIP_CHECK_CONCURRENCY = env.int("MEMBERSHIP_CHECK_CONCURRENCY", 20)  # Bir vaqtdagi get_chat_member so'rovlari
+MEMBERSHIP_CHECK_TIMEOUT = env.float("MEMBERSHIP_CHECK_TIMEOUT", 3.0)  # Bitta tekshiruv uchun timeout (soniya)
+MEMBERSHIP_CACHE_POSITIVE_TTL = env.float("MEMBERSHIP_CACHE_POSITIVE_TTL", 300)  # Obuna bo'lganlar keshi (soniya)
+MEMBERSHIP_CACHE_NEGATIVE_TTL = env.float("MEMBERSHIP_CACHE_NEGATIVE_TTL", 3)  # Obuna bo'lmaganlar keshi (soniya)
+MEMBERSHIP_CACHE_SIZE = env.int("MEMBERSHIP_CACHE_SIZE", 200000)  # Keshdagi yozuvlar chegarasi
+SUBSCRIPTION_TRACKING_INTERVAL = env.float("SUBSCRIPTION_TRACKING_INTERVAL", 600)  # Bot admin bo'lgan kanallarni qayta tekshirish oralig'i (soniya)
+STATISTICS_FLUSH_INTERVAL = env.float("STATISTICS_FLUSH_INTERVAL", 60)  # Bugungi statistika qatorini tekshirish oralig'i (soniya)
+STATISTICS_RECONCILE_INTERVAL = env.float("STATISTICS_RECONCILE_INTERVAL", 3600)  # Haqiqiy qiymatlar bilan solishtirish oralig'i (soniya)
+CACHE_VERSION_CHECK_INTERVAL = env.float("CACHE_VERSION_CHECK_INTERVAL", 0.5)  # Admin o'zgarishlarini tekshirish oralig'i (soniya)
+WEBHOOK_HOST = env.str("WEBHOOK_HOST", "")  # Telegram yuboradigan tashqi manzil, masalan https://example.com
+WEBHOOK_PATH = env.str("WEBHOOK_PATH", "/webhook")
+WEBHOOK_SECRET = env.str("WEBHOOK_SECRET", "")  # X-Telegram-Bot-Api-Secret-Token qiymati
+WEBHOOK_MAX_CONNECTIONS = env.int("WEBHOOK_MAX_CONNECTIONS", 40)  # Telegramning parallel ulanishlari (1-100)
+WEBHOOK_WORKERS = env.int("WEBHOOK_WORKERS", 64)  # Updatelarni parallel qayta ishlovchilar soni
+WEBHOOK_QUEUE_SIZE = env.int("WEBHOOK_QUEUE_SIZE", 10000)  # Qayta ishlanmagan updatelar chegarasi
+WEBHOOK_SHUTDOWN_TIMEOUT = env.float("WEBHOOK_SHUTDOWN_TIMEOUT", 30)  # To'xtashda navbatni tugatish uchun vaqt
+WEBAPP_HOST = env.str("WEBAPP_HOST", "0.0.0.0")
+WEBAPP_PORT = env.int("WEBAPP_PORT", 8080)
+FSM_STORAGE = env.str("FSM_STORAGE", "memory")  # memory, sqlite yoki redis
+FSM_STORAGE_PATH = env.str("FSM_STORAGE_PATH", "fsm.sqlite3")  # sqlite saqlovchi fayli (barcha jarayonlar uchun bitta)
+FSM_STORAGE_TTL = env.int("FSM_STORAGE_TTL", 0)  # Holat va bucketlarning yashash vaqti (soniya, 0 - cheksiz)
+REDIS_HOST = env.str("REDIS_HOST", "localhost")
+REDIS_PORT = env.int("REDIS_PORT", 6379)
+REDIS_DB = env.int("REDIS_DB", 0)
+REDIS_PASSWORD = env.str("REDIS_PASSWORD", "")
+REDIS_PREFIX = env.str("REDIS_PREFIX", "fsm")
+THROTTLING_BURST = env.int("THROTTLING_BURST", 1)  # Ketma-ket ruxsat etiladigan so'rovlar soni
+THROTTLING_MAX_USERS = env.int("THROTTLING_MAX_USERS", 1000000)  # Har bir kalit uchun xotiradagi foydalanuvchilar chegarasi (memory saqlovchida)
+THROTTLING_IDLE_TIMEOUT = env.float("THROTTLING_IDLE_TIMEOUT", 60)  # Shuncha vaqt yozmagan foydalanuvchi unutiladi (soniya, memory saqlovchida)
+SEND_GLOBAL_RATE = env.float("SEND_GLOBAL_RATE", 30)  # Barcha chatlarga jami xabar/soniya
+SEND_GLOBAL_BURST = env.int("SEND_GLOBAL_BURST", 3)  # Umumiy limitdan tashqari ketma-ket yuborish mumkin bo'lgan xabarlar
+SEND_PRIVATE_INTERVAL = env.float("SEND_PRIVATE_INTERVAL", 1.0)  # Bitta shaxsiy chatga xabarlar oralig'i (soniya)
+SEND_GROUP_INTERVAL = env.float("SEND_GROUP_INTERVAL", 3.0)  # Bitta guruh/kanalga xabarlar oralig'i (soniya)
+SEND_CHAT_BURST = env.int("SEND_CHAT_BURST", 3)  # Bitta chatga ketma-ket yuborish mumkin bo'lgan xabarlar
+SEND_MAX_RETRIES = env.int("SEND_MAX_RETRIES", 3)  # RetryAfter dan keyin qayta urinishlar soni
+SEND_SHUTDOWN_TIMEOUT = env.float("SEND_SHUTDOWN_TIMEOUT", 10)  # To'xtashda navbatni yuborib tugatish uchun vaqt
+BROADCAST_CHECK_INTERVAL = env.float("BROADCAST_CHECK_INTERVAL", 2)  # Yangi xabar yuborishni tekshirish oralig'i (soniya)
+BROADCAST_CHUNK_SIZE = env.int("BROADCAST_CHUNK_SIZE", 1000)  # Bazadan bir marta o'qiladigan foydalanuvchilar
+BROADCAST_WINDOW = env.int("BROADCAST_WINDOW", 200)  # Bir vaqtda navbatdagi xabarlar soni
+BROADCAST_SAVE_INTERVAL = env.float("BROADCAST_SAVE_INTERVAL", 2)  # Progressni saqlash oralig'i (soniya)
+BROADCAST_LEASE = env.int("BROADCAST_LEASE", 60)  # Progress yangilanmasa, boshqa jarayon davom ettiradi (soniya)
+METRICS_HOST = env.str("METRICS_HOST", "127.0.0.1")
+METRICS_PORT = env.int("METRICS_PORT", 0)  # Prometheus /metrics porti (0 - o'chirilgan)
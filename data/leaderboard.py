@@ -0,0 +1,201 @@
+import threading
+from typing import Callable, Dict, List, Optional, Tuple
+
+
+class Leaderboard:
+    """
+    Reyting jadvalining xotiradagi nusxasi
+
+    Eng ko'p ball to'plagan ``size`` ta faol foydalanuvchi saqlanadi.
+    Bot orqali ballar faqat oshadi, shuning uchun har bir o'zgarishda faqat
+    o'sha foydalanuvchini joyiga qo'yish yetarli: TOP dan tushib qolgan
+    foydalanuvchi keyin ham TOP dan tashqarida bo'ladi.
+
+    Agar TOP dagi foydalanuvchi bali kamaysa yoki u faolsizlansa, nusxa
+    to'liq emas deb belgilanadi va keyingi o'qishda bazadan qayta yuklanadi.
+    Boshqa jarayonlardagi o'zgarishlar uchun ham ``invalidate`` chaqiriladi.
+    """
+
+    def __init__(self, size: int = 20):
+        self.size = size
+        self.loaded = False
+        self._lock = threading.RLock()
+        # id -> (telegram_id, fullname, score)
+        self._entries = {}
+        self._ranking: List[Tuple[int, int]] = []
+
+    @staticmethod
+    def _key(user_pk: int, score: int) -> Tuple[int, int]:
+        # ORDER BY score DESC, id bilan bir xil tartib
+        return -score, user_pk
+
+    def load(self, fetch_rows: Callable[[int], list]):
+        """
+        Nusxani bazadagi natija bilan almashtirish
+
+        So'rov qulf ostida bajariladi: parallel kelgan yangilanishlar
+        yuklashdan keyin qo'llanadi va eski natija ularni bosib ketmaydi.
+
+        Args:
+            fetch_rows: ``size`` bo'yicha (id, telegram_id, fullname, score)
+                qatorlarini qaytaruvchi funksiya
+        """
+        with self._lock:
+            rows = fetch_rows(self.size)
+            self._entries = {
+                user_pk: (telegram_id, fullname, score)
+                for user_pk, telegram_id, fullname, score in rows
+            }
+            self._rebuild()
+            self.loaded = True
+
+    def _rebuild(self):
+        ranking = sorted(self._key(user_pk, entry[2]) for user_pk, entry in self._entries.items())
+        for _, user_pk in ranking[self.size:]:
+            del self._entries[user_pk]
+        self._ranking = ranking[:self.size]
+
+    def update(self, user_pk: int, telegram_id: int, fullname: str, score: int, is_active: bool = True):
+        """Foydalanuvchining yangi balini qo'llash"""
+        with self._lock:
+            if not self.loaded:
+                return
+            if not is_active:
+                self.discard(user_pk)
+                return
+
+            current = self._entries.get(user_pk)
+            if current is not None:
+                if score < current[2]:
+                    # Pastroqdagi foydalanuvchi uning o'rnini egallashi mumkin
+                    self.loaded = False
+                    return
+            elif len(self._ranking) >= self.size and self._key(user_pk, score) >= self._ranking[-1]:
+                return
+
+            self._entries[user_pk] = (telegram_id, fullname, score)
+            self._rebuild()
+
+    def invalidate(self):
+        """Nusxani yaroqsiz deb belgilash: keyingi o'qishda bazadan yuklanadi"""
+        with self._lock:
+            self.loaded = False
+
+    def discard(self, user_pk: int):
+        """Foydalanuvchini reytingdan chiqarish (masalan, faolsizlanganda)"""
+        with self._lock:
+            if user_pk in self._entries:
+                self.loaded = False
+
+    def top(self, top_n: int) -> Optional[List[Tuple[str, int, int]]]:
+        """
+        TOP foydalanuvchilar ``get_top_users_by_score`` formatida
+
+        Returns:
+            list: (fullname, score, telegram_id) yoki nusxa yaroqsiz bo'lsa None
+        """
+        with self._lock:
+            if not self.loaded or top_n > self.size:
+                return None
+            result = []
+            for _, user_pk in self._ranking[:top_n]:
+                telegram_id, fullname, score = self._entries[user_pk]
+                result.append((fullname, score, telegram_id))
+            return result
+
+
+class ScoreIndex:
+    """
+    Ballar taqsimoti bo'yicha Fenwick daraxti
+
+    Har bir ball qiymati uchun nechta faol foydalanuvchi borligini saqlaydi.
+    Istalgan ball uchun o'rin (undan yuqori ball to'plaganlar soni + 1)
+    jadvalni skanerlamasdan O(log n) da hisoblanadi. Manfiy ballar (odatda
+    bo'lmaydi) daraxtdan tashqarida, alohida lug'atda sanaladi.
+    """
+
+    def __init__(self, capacity: int = 1024):
+        self._lock = threading.Lock()
+        self._tree = [0] * (capacity + 1)
+        # manfiy ball -> foydalanuvchilar soni
+        self._negative: Dict[int, int] = {}
+        self.total = 0
+        self.loaded = False
+
+    @property
+    def capacity(self) -> int:
+        return len(self._tree) - 1
+
+    def _grow(self, score: int):
+        # Sig'im ikki barobar oshganda yangi tugunlar bo'sh oraliqlarni
+        # qamraydi, faqat oxirgi tugun barcha qiymatlar yig'indisini saqlaydi
+        in_tree = self.total - sum(self._negative.values())
+        while score >= self.capacity:
+            capacity = self.capacity
+            self._tree.extend([0] * (capacity - 1))
+            self._tree.append(in_tree)
+
+    def _add(self, score: int, delta: int):
+        if score < 0:
+            count = self._negative.get(score, 0) + delta
+            if count:
+                self._negative[score] = count
+            else:
+                del self._negative[score]
+        else:
+            self._grow(score)
+            i = score + 1
+            while i < len(self._tree):
+                self._tree[i] += delta
+                i += i & -i
+        self.total += delta
+
+    def _count_at_most(self, score: int) -> int:
+        count = sum(number for negative, number in self._negative.items() if negative <= score)
+        if score < 0:
+            return count
+        i = min(score, self.capacity - 1) + 1
+        while i > 0:
+            count += self._tree[i]
+            i -= i & -i
+        return count
+
+    def load(self, rows):
+        """
+        Args:
+            rows: (score, foydalanuvchilar soni) qatorlari
+        """
+        with self._lock:
+            self._tree = [0] * (self.capacity + 1)
+            self._negative = {}
+            self.total = 0
+            for score, count in rows:
+                self._add(score, count)
+            self.loaded = True
+
+    def update(self, old_score: Optional[int], new_score: Optional[int]):
+        """
+        Foydalanuvchi balini ko'chirish
+
+        ``old_score`` None bo'lsa yangi foydalanuvchi qo'shiladi,
+        ``new_score`` None bo'lsa foydalanuvchi indeksdan chiqariladi.
+        """
+        with self._lock:
+            if not self.loaded:
+                return
+            if old_score is not None:
+                self._add(old_score, -1)
+            if new_score is not None:
+                self._add(new_score, 1)
+
+    def invalidate(self):
+        """Indeksni yaroqsiz deb belgilash: keyingi o'qishda bazadan yuklanadi"""
+        with self._lock:
+            self.loaded = False
+
+    def rank(self, score: int) -> Optional[int]:
+        """Berilgan ball egallaydigan o'rin (1 dan boshlab)"""
+        with self._lock:
+            if not self.loaded:
+                return None
+            return self.total - self._count_at_most(score) + 1
@@ -0,0 +1,131 @@
+import datetime
+import json
+import logging
+import random
+import sqlite3
+import threading
+import time
+from logging.handlers import RotatingFileHandler
+from typing import Optional
+
+# Faqat shu so'rovlar uchun EXPLAIN QUERY PLAN olinadi
+EXPLAINABLE = ('SELECT', 'INSERT', 'UPDATE', 'DELETE', 'WITH', 'REPLACE')
+
+
+def parameters_shape(parameters) -> Optional[dict]:
+    """Parametrlar qiymatlarisiz: soni va turlari (shaxsiy ma'lumotlar jurnalga tushmaydi)"""
+    if parameters is None:
+        return None
+    if isinstance(parameters, dict):
+        return {'names': {name: type(value).__name__ for name, value in parameters.items()}}
+    types = {}
+    for value in parameters:
+        name = type(value).__name__
+        types[name] = types.get(name, 0) + 1
+    return {'count': len(parameters), 'types': types}
+
+
+class QueryLog:
+    """
+    Sekin SQL so'rovlar jurnali
+
+    ``threshold`` soniyadan uzoq bajarilgan so'rovlar (va ``sample_rate``
+    ulushdagi tasodifiy so'rovlar) JSON qatorlar ko'rinishida aylanuvchi
+    faylga yoziladi: vaqti, so'rov matni va parametrlar shakli. Har bir sekin
+    so'rov birinchi marta uchraganda uning ``EXPLAIN QUERY PLAN`` i ham
+    yoziladi.
+
+    Vaqt sqlite3 ``execute`` chaqiruvi (birinchi qatorgacha) bo'yicha
+    o'lchanadi. Ulanishlar ``connection_class`` bilan ochilishi kerak.
+    """
+
+    def __init__(self, path: str, threshold: float = 0.05, sample_rate: float = 0.0,
+                 max_bytes: int = 10_000_000, backup_count: int = 5, max_explained: int = 10000):
+        self.threshold = threshold
+        self.sample_rate = sample_rate
+        self.max_explained = max_explained
+        self._explained = set()
+        self._lock = threading.Lock()
+        self._random = random.random
+        handler = RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backup_count, encoding='utf-8')
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        # Umumiy logging sozlamalariga (konsolga) tushmasligi uchun alohida logger
+        self._logger = logging.Logger('konkurs.query_log')
+        self._logger.addHandler(handler)
+        self.connection_class = self._connection_class()
+
+    def record(self, connection: sqlite3.Connection, sql: str, parameters, seconds: float,
+               error: BaseException = None):
+        slow = seconds >= self.threshold
+        if not slow and not (self.sample_rate and self._random() < self.sample_rate):
+            return
+
+        statement = ' '.join(sql.split())
+        entry = {
+            'time': datetime.datetime.now().isoformat(timespec='milliseconds'),
+            'duration_ms': round(seconds * 1000, 3),
+            'slow': slow,
+            'sql': statement,
+            'parameters': parameters_shape(parameters),
+        }
+        if error is not None:
+            entry['error'] = repr(error)
+        if slow and statement.split(' ', 1)[0].upper() in EXPLAINABLE and self._first_seen(statement):
+            entry['plan'] = self._explain(connection, sql, parameters)
+        self._logger.info(json.dumps(entry, ensure_ascii=False))
+
+    def _first_seen(self, statement: str) -> bool:
+        with self._lock:
+            if statement in self._explained:
+                return False
+            if len(self._explained) >= self.max_explained:
+                self._explained.clear()
+            self._explained.add(statement)
+            return True
+
+    @staticmethod
+    def _explain(connection: sqlite3.Connection, sql: str, parameters) -> list:
+        try:
+            # Asosiy Connection.execute: EXPLAIN ning o'zi jurnalga yozilmaydi
+            if parameters is None:
+                parameters = [None] * sql.count('?')
+            rows = sqlite3.Connection.execute(connection, f"EXPLAIN QUERY PLAN {sql}", parameters)
+            return [row[3] for row in rows.fetchall()]
+        except sqlite3.Error as err:
+            return [f"EXPLAIN failed: {err}"]
+
+    def _connection_class(self):
+        query_log = self
+
+        class Cursor(sqlite3.Cursor):
+            def execute(self, sql, parameters=()):
+                started = time.perf_counter()
+                try:
+                    result = super().execute(sql, parameters)
+                except Exception as err:
+                    query_log.record(self.connection, sql, parameters, time.perf_counter() - started, err)
+                    raise
+                query_log.record(self.connection, sql, parameters, time.perf_counter() - started)
+                return result
+
+            def executemany(self, sql, seq_of_parameters):
+                started = time.perf_counter()
+                try:
+                    result = super().executemany(sql, seq_of_parameters)
+                except Exception as err:
+                    query_log.record(self.connection, sql, None, time.perf_counter() - started, err)
+                    raise
+                query_log.record(self.connection, sql, None, time.perf_counter() - started)
+                return result
+
+        class Connection(sqlite3.Connection):
+            def cursor(self, factory=Cursor):
+                return super().cursor(factory)
+
+            def execute(self, sql, parameters=()):
+                return self.cursor().execute(sql, parameters)
+
+            def executemany(self, sql, seq_of_parameters):
+                return self.cursor().executemany(sql, seq_of_parameters)
+
+        return Connection
@@ -0,0 +1,22 @@
+from typing import Dict, Iterable
+
+FIELDS = (
+    'total_users',
+    'active_users',
+    'total_subscriptions',
+    'total_score',
+    'referral_counts',
+)
+
+
+def sum_deltas(deltas: Iterable[Dict[str, int]]) -> Dict[str, int]:
+    """
+    ``konkurs_statistics`` maydonlari bo'yicha deltalarni jamlash
+
+    Masalan: ``sum_deltas([{'total_users': 1}, {'total_users': 1, 'active_users': 1}])``
+    """
+    total = dict.fromkeys(FIELDS, 0)
+    for delta in deltas:
+        for field, value in delta.items():
+            total[field] += value
+    return total
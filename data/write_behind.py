@@ -0,0 +1,227 @@
+import logging
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, Dict, Iterable, List, Optional, Union
+
+from data.statistics import sum_deltas
+
+# Yozuvchi kutish rejimlari
+DURABILITY_COMMIT = 'commit'  # chaqiruvchi o'z yozuvi commit bo'lishini kutadi
+DURABILITY_QUEUED = 'queued'  # chaqiruvchi darhol qaytadi, yozuv keyinroq commit bo'ladi
+DURABILITY_MODES = (DURABILITY_COMMIT, DURABILITY_QUEUED)
+
+
+class Mutation:
+    """Navbatdagi bitta yozuv"""
+
+    __slots__ = ('sql', 'parameters', 'telegram_ids', 'on_commit', 'statistics', 'future')
+
+    def __init__(self, sql: Union[str, Callable], parameters: tuple, telegram_ids: Iterable[int],
+                 on_commit: Optional[Callable] = None,
+                 statistics: Optional[Callable[..., Dict[str, int]]] = None):
+        self.sql = sql
+        self.parameters = parameters
+        self.telegram_ids = tuple(telegram_ids)
+        self.on_commit = on_commit
+        self.statistics = statistics
+        self.future = Future()
+
+    def execute(self, connection):
+        if callable(self.sql):
+            return self.sql(connection, self.parameters)
+        return connection.execute(self.sql, self.parameters).fetchone()
+
+    def __str__(self):
+        if callable(self.sql):
+            return self.sql.__qualname__
+        return self.sql.strip()
+
+
+class WriteBehindQueue:
+    """
+    Yozuvlarni guruhlab commit qiluvchi navbat
+
+    Yozuvlar alohida oqimda to'planadi va ``max_batch`` taga yetganda yoki
+    birinchi yozuvdan ``max_delay`` soniya o'tganda bitta tranzaksiyada
+    commit qilinadi. ``max_delay=0`` da yozuvchi bo'shashi bilan commit
+    qiladi: oldingi commit davomida yig'ilgan yozuvlar bitta guruhga tushadi.
+    Har bir yozuv o'z SAVEPOINT ida bajariladi, shuning uchun bittasining
+    xatosi qolganlarini bekor qilmaydi.
+
+    ``commit`` rejimida har bir yozuvchi o'z yozuvi commit bo'lguncha
+    ``submit`` da to'xtab turadi, shuning uchun bitta guruhdagi yozuvlar
+    soni ``max_batch`` dan emas, yozayotgan oqimlar sonidan (DB_WRITE_WORKERS)
+    oshmaydi. Katta guruhlar faqat ``queued`` rejimida yig'iladi.
+
+    Har bir yozuv o'zi tegishli telegram_id lar bilan belgilanadi.
+    ``wait_for`` shu foydalanuvchilarning navbatdagi yozuvlarini darhol
+    commit qildiradi, shuning uchun o'qishlar doim oxirgi yozuvni ko'radi.
+    """
+
+    def __init__(self, database, max_batch: int = 200, max_delay: float = 0.0,
+                 durability: str = DURABILITY_COMMIT):
+        if durability not in DURABILITY_MODES:
+            raise ValueError(f"Unknown durability mode: {durability}")
+        self.database = database
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.durability = durability
+        self._condition = threading.Condition()
+        self._items: List[Mutation] = []
+        self._first_enqueued = 0.0
+        self._pending = {}
+        self._flush_requested = False
+        self._closed = False
+        self._thread = None
+        self.batches = 0
+        self.committed = 0
+
+    def _ensure_started(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='db-write-behind', daemon=True)
+            self._thread.start()
+
+    def submit(self, sql: Union[str, Callable], parameters: tuple, telegram_ids: Iterable[int],
+               on_commit: Optional[Callable] = None,
+               statistics: Optional[Callable[..., Dict[str, int]]] = None):
+        """
+        Yozuvni navbatga qo'shish
+
+        Bir nechta so'rov kerak bo'lsa ``sql`` o'rniga ``sql(connection, parameters)``
+        funksiyasi berilishi mumkin, u ``row`` ni qaytaradi.
+        ``on_commit(row)`` commit dan keyin yozuvchi oqimda chaqiriladi,
+        ``row`` - so'rovning birinchi qatori (RETURNING natijasi) yoki None.
+        ``statistics(row)`` commit dan oldin chaqiriladi va statistika
+        deltalarini qaytaradi: ular shu tranzaksiyada bugungi
+        ``konkurs_statistics`` qatoriga qo'shiladi.
+
+        Returns:
+            ``commit`` rejimida ``row``, ``queued`` rejimida None
+        """
+        mutation = Mutation(sql, parameters, telegram_ids, on_commit, statistics)
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("Write-behind queue is closed")
+            self._ensure_started()
+            if not self._items:
+                self._first_enqueued = time.monotonic()
+            self._items.append(mutation)
+            for telegram_id in mutation.telegram_ids:
+                self._pending[telegram_id] = self._pending.get(telegram_id, 0) + 1
+            self._condition.notify_all()
+
+        if self.durability == DURABILITY_COMMIT:
+            return mutation.future.result()
+        return None
+
+    def wait_for(self, *telegram_ids: int):
+        """Shu foydalanuvchilarning navbatdagi yozuvlari commit bo'lishini kutish"""
+        with self._condition:
+            if not any(self._pending.get(telegram_id) for telegram_id in telegram_ids):
+                return
+            self._flush_requested = True
+            self._condition.notify_all()
+            self._condition.wait_for(
+                lambda: not any(self._pending.get(telegram_id) for telegram_id in telegram_ids)
+            )
+
+    def close(self):
+        """Navbatni yopish: qolgan yozuvlar commit qilinadi"""
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+            thread = self._thread
+        if thread is not None:
+            thread.join()
+
+    def _next_batch(self) -> List[Mutation]:
+        with self._condition:
+            self._condition.wait_for(lambda: self._items or self._closed)
+            while (self._items and len(self._items) < self.max_batch
+                   and not self._flush_requested and not self._closed):
+                remaining = self._first_enqueued + self.max_delay - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._condition.wait(remaining)
+
+            batch = self._items[:self.max_batch]
+            del self._items[:self.max_batch]
+            if self._items:
+                self._first_enqueued = time.monotonic()
+            else:
+                self._flush_requested = False
+            return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if not batch:
+                # Navbat yopilgan va bo'sh
+                return
+            try:
+                self._commit(batch)
+            except Exception as err:
+                logging.exception(f"Write-behind batch of {len(batch)} failed: {err}")
+                for mutation in batch:
+                    if not mutation.future.done():
+                        mutation.future.set_exception(err)
+            finally:
+                with self._condition:
+                    for mutation in batch:
+                        for telegram_id in mutation.telegram_ids:
+                            count = self._pending[telegram_id] - 1
+                            if count:
+                                self._pending[telegram_id] = count
+                            else:
+                                del self._pending[telegram_id]
+                    self._condition.notify_all()
+
+    def _commit(self, batch: List[Mutation]):
+        database = self.database
+        connection = database.connection
+        results = []
+        # Xotiradagi reyting va statistikalar commit bilan birga yangilanadi
+        with database._state_lock:
+            try:
+                connection.execute("BEGIN IMMEDIATE")
+                version = database._scores_version_in(connection)
+                for mutation in batch:
+                    connection.execute("SAVEPOINT mutation")
+                    try:
+                        row = mutation.execute(connection)
+                    except Exception as err:
+                        connection.execute("ROLLBACK TO mutation")
+                        results.append(err)
+                    else:
+                        results.append(row)
+                    connection.execute("RELEASE mutation")
+                database._add_statistics(connection, sum_deltas(
+                    mutation.statistics(result)
+                    for mutation, result in zip(batch, results)
+                    if mutation.statistics is not None and not isinstance(result, Exception)
+                ))
+                own_version = database._scores_version_in(connection)
+                connection.commit()
+            except Exception:
+                if connection.in_transaction:
+                    connection.rollback()
+                raise
+
+            # Boshqa jarayon yozuvlari bo'lsa nusxa yaroqsiz qilinadi, o'z
+            # yozuvlari esa quyida on_commit orqali qo'llanadi
+            database._sync_scores_version(version, own_version)
+            self.batches += 1
+            self.committed += len(batch)
+            for mutation, result in zip(batch, results):
+                if isinstance(result, Exception):
+                    if self.durability == DURABILITY_QUEUED:
+                        logging.error(f"Write-behind mutation failed: {result!r}\n{mutation}")
+                    mutation.future.set_exception(result)
+                    continue
+                try:
+                    if mutation.on_commit is not None:
+                        mutation.on_commit(result)
+                except Exception as err:
+                    logging.exception(err)
+                mutation.future.set_result(result)
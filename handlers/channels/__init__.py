@@ -0,0 +1 @@
+from . import chat_member
@@ -0,0 +1,48 @@
+from typing import Optional
+
+from aiogram import types
+
+from loader import dp, db
+from utils.misc.subscription import (
+    SUBSCRIBED_STATUSES,
+    channel_key,
+    get_channel_username,
+    membership_cache,
+    set_tracked,
+)
+
+
+async def get_link_url(chat: types.Chat) -> Optional[str]:
+    """Kanalga mos faol havola (username bo'yicha), topilmasa None"""
+    if not chat.username:
+        return None
+    key = channel_key('@' + chat.username)
+    for _, url in await db.get_all_active_links():
+        if channel_key(get_channel_username(url)) == key:
+            return url
+    return None
+
+
+@dp.chat_member_handler()
+async def channel_member_updated(update: types.ChatMemberUpdated):
+    """Kanal a'zoligi o'zgardi: obunalar jadvali va keshni yangilash"""
+    url = await get_link_url(update.chat)
+    if url is None:
+        return
+
+    user_id = update.new_chat_member.user.id
+    is_subscribed = update.new_chat_member.status in SUBSCRIBED_STATUSES
+    membership_cache.set(get_channel_username(url), user_id, is_subscribed)
+    await db.update_subscription_status(user_id, url, is_subscribed)
+
+
+@dp.my_chat_member_handler()
+async def bot_member_updated(update: types.ChatMemberUpdated):
+    """Botning kanaldagi huquqlari o'zgardi: chat_member updatelari faqat admin bo'lsa keladi"""
+    url = await get_link_url(update.chat)
+    if url is None:
+        return
+    set_tracked(
+        get_channel_username(url),
+        update.new_chat_member.status == types.ChatMemberStatus.ADMINISTRATOR
+    )
@@ -6,6 +6,7 @@ from aiogram.utils.exceptions import (Unauthorized, InvalidQueryID, TelegramAPIE
 
 
 from loader import dp
+from utils import metrics
 
 
 @dp.errors_handler()
@@ -17,6 +18,7 @@ async def errors_handler(update, exception):
     :param exception:
     :return: stdout logging
     """
+    metrics.handler_errors.inc(type(exception).__name__)
 
     if isinstance(exception, CantDemoteChatCreator):
         logging.exception("Can't demote chat creator")
@@ -45,12 +47,14 @@ async def errors_handler(update, exception):
         logging.exception(f'InvalidQueryID: {exception} \nUpdate: {update}')
         return True
 
+    if isinstance(exception, RetryAfter):
+        # SendScheduler qayta urinishlari tugagan
+        logging.warning(f'RetryAfter: {exception} \nUpdate: {update}')
+        return True
+
     if isinstance(exception, TelegramAPIError):
         logging.exception(f'TelegramAPIError: {exception} \nUpdate: {update}')
         return True
-    if isinstance(exception, RetryAfter):
-        logging.exception(f'RetryAfter: {exception} \nUpdate: {update}')
-        return True
     if isinstance(exception, CantParseEntities):
         logging.exception(f'CantParseEntities: {exception} \nUpdate: {update}')
         return True
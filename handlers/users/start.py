@@ -1,3 +1,4 @@
+import logging
 import re
 from aiogram import types
 from aiogram.dispatcher.filters.builtin import CommandStart
@@ -9,7 +10,7 @@ from aiogram.types import (
     ReplyKeyboardRemove
 )
 from loader import dp, db, bot
-from urllib.parse import urlparse
+from utils.misc.subscription import get_channel_username, get_not_subscribed, is_member
 
 
 def create_main_keyboard():
@@ -20,14 +21,6 @@ def create_main_keyboard():
     return keyboard
 
 
-def get_channel_username(url: str) -> str:
-    """Kanal usernameni olish"""
-    path = urlparse(url).path.strip('/')
-    if path.startswith('@'):
-        return path
-    return '@' + path
-
-
 @dp.message_handler(CommandStart())
 async def bot_start(message: types.Message):
     if message.chat.type != types.ChatType.PRIVATE:
@@ -42,39 +35,27 @@ async def bot_start(message: types.Message):
     username = message.from_user.username
     referral_args = message.get_args()
 
-    # Foydalanuvchini tekshirish va qo'shish
-    user = db.get_user_by_chat_id(user_id)
-    if not user:
-        user = db.add_user(
-            fullname=user_fullname,
-            user_id=user_id,
-            username=username,
-            referral_code=str(user_id)
-        )
-        # Referral aloqani yaratish
-        if referral_args and referral_args.isdigit():
-            referrer_id = int(referral_args)
-            db.check_and_create_referral(referrer_id, user_id)
+    # Ro'yxatdan o'tkazish: yangisiga taklif qilgan ham yoziladi, faolsizlangani qayta faollashadi
+    referrer_id = int(referral_args) if referral_args and referral_args.isdigit() else None
+    await db.add_user(
+        fullname=user_fullname,
+        user_id=user_id,
+        username=username,
+        referral_code=str(user_id),
+        referrer_id=referrer_id
+    )
 
     # Faol kanallarni olish va tekshirish
-    links = db.get_all_active_links()
-    not_subscribed = []
-
-    for title, url in links:
-        channel_username = get_channel_username(url)
-        try:
-            member = await bot.get_chat_member(chat_id=channel_username, user_id=user_id)
-            if member.status not in ['member', 'administrator', 'creator']:
-                not_subscribed.append((title, url))
-        except Exception as e:
-            print(f"Xatolik: {channel_username} tekshirishda: {e}")
-            not_subscribed.append((title, url))
+    links = await db.get_all_active_links()
+    not_subscribed = await get_not_subscribed(bot, links, user_id, db)
 
     if not not_subscribed:  # Barcha kanallarga obuna bo'lgan
-        # Referral bonus berish
-        if referral_args and referral_args.isdigit():
-            referrer_id = int(referral_args)
-            db.give_referral_bonus(referrer_id, user_id)
+        # Referral bonus berish (taklif qilgan bazadagi referred_by_id dan olinadi)
+        if referrer_id:
+            try:
+                await db.credit_referral(user_id)
+            except Exception:
+                logging.exception(f"Error while giving referral bonus for {user_id}")
 
         # Asosiy menyuni ko'rsatish
         main_keyboard = create_main_keyboard()
@@ -106,22 +87,11 @@ async def bot_start(message: types.Message):
 @dp.callback_query_handler(lambda c: c.data == 'check_subscription')
 async def process_callback_check_subscription(callback_query: types.CallbackQuery):
     user_id = callback_query.from_user.id
-    print(f"Checking subscription for user {user_id}")  # Debug
 
-    # Faol kanallarni olish
-    links = db.get_all_active_links()
-
-    not_subscribed = []
-    for title, url in links:
-        channel_username = get_channel_username(url)
-        try:
-            member = await bot.get_chat_member(chat_id=channel_username, user_id=user_id)
-            is_member = member.status in ['member', 'administrator', 'creator']
-            if not is_member:
-                not_subscribed.append((title, url))
-        except Exception as e:
-            print(f"Xatolik: {channel_username} tekshirishda: {e}")
-            not_subscribed.append((title, url))
+    # Faol kanallarni olish. Foydalanuvchi hozirgina obuna bo'lgan bo'lishi
+    # mumkin: keshdagi salbiy natijalarga ishonilmaydi
+    links = await db.get_all_active_links()
+    not_subscribed = await get_not_subscribed(bot, links, user_id, db, use_negative_cache=False)
 
     if not_subscribed:
         # Obuna bo'linmagan kanallar uchun klaviatura
@@ -141,33 +111,11 @@ async def process_callback_check_subscription(callback_query: types.CallbackQuer
             reply_markup=keyboard
         )
     else:
-        # Statistikani yangilash
-        db.update_statistics()
-
-        # Referral tekshirish va ball berish
-        user = db.get_user_by_chat_id(user_id)
-        print(f"User data: {user}")  # Debug
-
-        if user and not user[6]:  # is_referral_counted tekshirish
-            # Bazadan referrer_id ni olish
-            sql = "SELECT referred_by_id FROM konkurs_user WHERE telegram_id = ?"
-            referrer_data = db.execute(sql, (user_id,), fetchone=True)
-            print(f"Referrer data: {referrer_data}")  # Debug
-
-            if referrer_data and referrer_data[0]:
-                referrer_id = referrer_data[0]
-                try:
-                    # Referrer telegram_id ni olish
-                    sql = "SELECT telegram_id FROM konkurs_user WHERE id = ?"
-                    referrer_telegram_id = db.execute(sql, (referrer_id,), fetchone=True)
-
-                    if referrer_telegram_id:
-                        print(f"Updating score for referrer {referrer_telegram_id[0]}")  # Debug
-                        db.update_user_score(referrer_telegram_id[0], 10)
-                        db.mark_referral_counted(user_id)
-                        print("Referral bonus given successfully")  # Debug
-                except Exception as e:
-                    print(f"Error while giving referral bonus: {e}")  # Debug
+        # Referral ball berish: bitta tranzaksiyada, takroriy bosishlarda bir marta
+        try:
+            await db.credit_referral(user_id)
+        except Exception:
+            logging.exception(f"Error while giving referral bonus for {user_id}")
 
         # Asosiy menyuni ko'rsatish
         main_keyboard = create_main_keyboard()
@@ -194,10 +142,7 @@ async def process_subscribe_callback(callback_query: types.CallbackQuery):
     user_id = callback_query.from_user.id
 
     try:
-        member = await bot.get_chat_member(chat_id=channel_username, user_id=user_id)
-        is_member = member.status in ['member', 'administrator', 'creator']
-
-        if is_member:
+        if await is_member(bot, channel_username, user_id, use_negative_cache=False):
             await bot.answer_callback_query(
                 callback_query.id,
                 text="Siz allaqachon bu kanalga obuna bo'lgansiz."
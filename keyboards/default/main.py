@@ -1,38 +1,43 @@
+import asyncio
 import os
 from email.policy import default
 
 from aiogram import types
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
+from aiogram.utils.exceptions import BadRequest
 
 from loader import dp, db
 
 
 @dp.message_handler(lambda message: message.text == "🎁 Mukofot")
 async def send_latest_award(message: types.Message):
-    latest_award = db.get_latest_award()
+    latest_award = await db.get_latest_award()
 
     if latest_award:
-        if len(latest_award) == 3:
-            title, description, image_path = latest_award
-        elif len(latest_award) == 2:
-            title = "Mukofot"
-            description, image_path = latest_award
-        else:
-            await message.answer("🎁 Mukofot ma'lumotlarini olishda xatolik yuz berdi.")
-            return
+        award_id, title, description, image_path, file_id = latest_award
+        caption = f"🎁 {title}\n\n{description}"
+
+        if file_id:
+            # Rasm avval yuklangan: Telegram serveridagi nusxadan foydalanamiz
+            try:
+                await message.answer_photo(photo=file_id, caption=caption)
+                return
+            except BadRequest:
+                await db.set_award_file_id(award_id, image_path, None)
 
         if image_path:
             correct_image_path = os.path.join('admin', image_path)
             if os.path.exists(correct_image_path):
                 with open(correct_image_path, 'rb') as photo:
-                    await message.answer_photo(
+                    sent = await message.answer_photo(
                         photo=photo,
-                        caption=f"🎁 {title}\n\n{description}"
+                        caption=caption
                     )
+                await db.set_award_file_id(award_id, image_path, sent.photo[-1].file_id)
             else:
-                await message.answer(f"🎁 {title}\n\n{description}")
+                await message.answer(caption)
         else:
-            await message.answer(f"🎁 {title}\n\n{description}")
+            await message.answer(caption)
     else:
         await message.answer("🎁 Hozircha mukofotlar yo'q.")
 
@@ -40,8 +45,10 @@ async def send_latest_award(message: types.Message):
 @dp.message_handler(lambda message: message.text == "🏆 Reyting")
 async def send_top_users_and_score(message: types.Message):
     user_id = message.from_user.id
-    top_users = db.get_top_users_by_score()
-    user_score = db.get_score_by_id(user_id)
+    top_users, user_rank = await asyncio.gather(
+        db.get_top_users_by_score(),
+        db.get_score_and_rank(user_id),
+    )
 
     if top_users:
         top_users_text = []
@@ -59,8 +66,11 @@ async def send_top_users_and_score(message: types.Message):
         response = "🏆 TOP ISHTIROKCHILAR:\n\n"
         response += "\n\n".join(top_users_text)
 
-        if user_score is not None:
+        if user_rank is not None:
+            user_score, rank = user_rank
             response += f"\n\n📊 Sizning ballingiz: {user_score} 🎯"
+            if rank is not None:
+                response += f"\n🏅 Siz {rank}-o'rindasiz"
 
         await message.answer(response)
     else:
@@ -1,10 +1,56 @@
-from aiogram import Bot, Dispatcher, types
-from aiogram.contrib.fsm_storage.memory import MemoryStorage
+from aiogram import Dispatcher, types
+from aiogram.bot.api import TelegramAPIServer
 
 from data import config
-from data.commands import DataBase
+from data.commands import DataBase, AsyncDataBase
+from data.query_log import QueryLog
+from utils import metrics
+from utils.fsm_storage import create_storage
+from utils.send_scheduler import ScheduledBot, SendScheduler
 
-bot = Bot(token=config.BOT_TOKEN, parse_mode=types.ParseMode.HTML)
-storage = MemoryStorage()
+bot = ScheduledBot(
+    token=config.BOT_TOKEN,
+    parse_mode=types.ParseMode.HTML,
+    server=TelegramAPIServer.from_base(config.BOT_API_SERVER),
+    scheduler=SendScheduler(
+        global_rate=config.SEND_GLOBAL_RATE,
+        global_burst=config.SEND_GLOBAL_BURST,
+        private_interval=config.SEND_PRIVATE_INTERVAL,
+        group_interval=config.SEND_GROUP_INTERVAL,
+        chat_burst=config.SEND_CHAT_BURST,
+        max_retries=config.SEND_MAX_RETRIES,
+    ),
+)
+storage = create_storage()
 dp = Dispatcher(bot, storage=storage)
-db = DataBase()
\ No newline at end of file
+query_log = None
+if config.QUERY_LOG_PATH:
+    query_log = QueryLog(
+        config.QUERY_LOG_PATH,
+        threshold=config.QUERY_LOG_THRESHOLD_MS / 1000,
+        sample_rate=config.QUERY_LOG_SAMPLE_RATE,
+        max_bytes=config.QUERY_LOG_MAX_BYTES,
+        backup_count=config.QUERY_LOG_BACKUP_COUNT,
+    )
+db = AsyncDataBase(
+    DataBase(
+        config.DB_PATH,
+        query_log=query_log,
+        write_batch_size=config.DB_WRITE_BATCH_SIZE,
+        write_batch_delay=config.DB_WRITE_BATCH_DELAY,
+        write_durability=config.DB_WRITE_DURABILITY,
+    ),
+    read_workers=config.DB_READ_WORKERS,
+    write_workers=config.DB_WRITE_WORKERS,
+    observe=metrics.observe_db,
+)
+
+metrics.register_stats(
+    'konkurs_send_queue', "SendScheduler navbatidagi xabarlar", bot.scheduler.stats,
+    {'queued_interactive': 'interactive', 'queued_bulk': 'bulk', 'delayed': 'delayed',
+     'in_flight': 'in_flight', 'paused_chats': 'paused_chats'},
+)
+metrics.register_stats(
+    'konkurs_send_total', "SendScheduler yuborgan xabarlar", bot.scheduler.stats,
+    {'sent': 'sent', 'retried': 'retried', 'failed': 'failed'}, type='counter', labelname='result',
+)
@@ -1,8 +1,17 @@
 from aiogram import Dispatcher
 
+from data import config
 from loader import dp
+from .metrics import MetricsMiddleware
 from .throttling import ThrottlingMiddleware
 
 
 if __name__ == "middlewares":
-    dp.middleware.setup(ThrottlingMiddleware())
+    # Birinchi o'rnatiladi: handler vaqtiga throttling ham kiradi
+    dp.middleware.setup(MetricsMiddleware())
+    dp.middleware.setup(ThrottlingMiddleware(
+        burst=config.THROTTLING_BURST,
+        max_users=config.THROTTLING_MAX_USERS,
+        idle_timeout=config.THROTTLING_IDLE_TIMEOUT,
+        storage=dp.storage,
+    ))
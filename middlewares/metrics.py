@@ -0,0 +1,40 @@
+import time
+
+from aiogram import types
+from aiogram.dispatcher.handler import current_handler
+from aiogram.dispatcher.middlewares import BaseMiddleware
+
+from utils.metrics import handler_seconds
+
+
+class MetricsMiddleware(BaseMiddleware):
+    """
+    Handlerlarning ishlash vaqtini ``konkurs_handler_seconds`` ga yozish
+
+    Vaqt handler tanlangandan (keyingi middlewarelar, masalan throttling
+    bilan birga) handler tugaguncha o'lchanadi.
+    """
+
+    KEY = '_metrics_handler'
+
+    def start(self, update_type: str, data: dict):
+        handler = current_handler.get()
+        data[self.KEY] = (getattr(handler, '__name__', 'unknown'), update_type, time.perf_counter())
+
+    def finish(self, data: dict):
+        started = data.pop(self.KEY, None)
+        if started is not None:
+            name, update_type, started_at = started
+            handler_seconds.observe(time.perf_counter() - started_at, name, update_type)
+
+    async def on_process_message(self, message: types.Message, data: dict):
+        self.start('message', data)
+
+    async def on_post_process_message(self, message: types.Message, results, data: dict):
+        self.finish(data)
+
+    async def on_process_callback_query(self, call: types.CallbackQuery, data: dict):
+        self.start('callback_query', data)
+
+    async def on_post_process_callback_query(self, call: types.CallbackQuery, results, data: dict):
+        self.finish(data)
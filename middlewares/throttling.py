@@ -1,37 +1,84 @@
-import asyncio
+from typing import Dict
 
-from aiogram import types, Dispatcher
+from aiogram import types
 from aiogram.dispatcher import DEFAULT_RATE_LIMIT
 from aiogram.dispatcher.handler import CancelHandler, current_handler
 from aiogram.dispatcher.middlewares import BaseMiddleware
+from aiogram.dispatcher.storage import BaseStorage
 from aiogram.utils.exceptions import Throttled
 
+from utils.misc.throttling import TokenBucket
+
 
 class ThrottlingMiddleware(BaseMiddleware):
     """
-    Simple middleware
+    Xabarlar va callback querylar uchun token bucket throttling
+
+    Limit handlerdagi ``@rate_limit`` dan olinadi (bitta token necha
+    soniyada tiklanadi), ko'rsatilmagan bo'lsa ``limit`` ishlatiladi.
+
+    Umumiy saqlovchi (``consume_token`` metodi bor: sqlite, redis) berilsa,
+    bucketlar barcha bot jarayonlari uchun bitta bo'ladi: har bir
+    foydalanuvchi uchun bitta kichik yozuv, bucket to'lgach o'chiriladi.
+    Aks holda (memory - bitta jarayon) holat jarayon xotirasida saqlanadi.
     """
 
-    def __init__(self, limit=DEFAULT_RATE_LIMIT, key_prefix='antiflood_'):
+    def __init__(self, limit=DEFAULT_RATE_LIMIT, key_prefix='antiflood_', burst=1,
+                 max_users=1_000_000, idle_timeout=60, storage: BaseStorage = None):
         self.rate_limit = limit
         self.prefix = key_prefix
+        self.burst = burst
+        self.max_users = max_users
+        self.idle_timeout = idle_timeout
+        self.storage = storage if hasattr(storage, 'consume_token') else None
+        self.buckets: Dict[str, TokenBucket] = {}
         super(ThrottlingMiddleware, self).__init__()
 
-    async def on_process_message(self, message: types.Message, data: dict):
+    def consume_local(self, key: str, limit: float, user_id: int):
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            bucket = self.buckets[key] = TokenBucket(
+                limit, burst=self.burst, max_users=self.max_users, idle_timeout=self.idle_timeout
+            )
+        exceeded = bucket.consume(user_id)
+        return exceeded, bucket.retry_after(user_id) if exceeded else 0.0
+
+    async def throttle(self, user_id: int, kind: str):
         handler = current_handler.get()
-        dispatcher = Dispatcher.get_current()
         if handler:
             limit = getattr(handler, "throttling_rate_limit", self.rate_limit)
             key = getattr(handler, "throttling_key", f"{self.prefix}_{handler.__name__}")
         else:
             limit = self.rate_limit
-            key = f"{self.prefix}_message"
+            key = f"{self.prefix}_{kind}"
+
+        if self.storage is not None:
+            exceeded, retry_after = await self.storage.consume_token(key, user_id, limit, self.burst)
+        else:
+            exceeded, retry_after = self.consume_local(key, limit, user_id)
+        if exceeded:
+            # Avvalgi dispatcher.throttle bilan bir xil: birinchi rad etishda exceeded = 2
+            raise Throttled(key=key, rate_limit=limit, exceeded=exceeded + 1,
+                            delta=retry_after, user=user_id)
+
+    async def on_process_message(self, message: types.Message, data: dict):
         try:
-            await dispatcher.throttle(key, rate=limit)
+            await self.throttle(message.from_user.id, 'message')
         except Throttled as t:
             await self.message_throttled(message, t)
             raise CancelHandler()
 
+    async def on_process_callback_query(self, call: types.CallbackQuery, data: dict):
+        try:
+            await self.throttle(call.from_user.id, 'callback_query')
+        except Throttled as t:
+            await self.callback_query_throttled(call, t)
+            raise CancelHandler()
+
     async def message_throttled(self, message: types.Message, throttled: Throttled):
         if throttled.exceeded_count <= 2:
             await message.reply("Too many requests!")
+
+    async def callback_query_throttled(self, call: types.CallbackQuery, throttled: Throttled):
+        if throttled.exceeded_count <= 2:
+            await call.answer("Too many requests!")
@@ -0,0 +1,297 @@
+import asyncio
+import copy
+import json
+import sqlite3
+import time
+import typing
+from concurrent.futures import ThreadPoolExecutor
+
+from aiogram.contrib.fsm_storage.memory import MemoryStorage
+from aiogram.contrib.fsm_storage.redis import RedisStorage2
+from aiogram.dispatcher.storage import BaseStorage
+
+from data import config
+
+
+class SQLiteStorage(BaseStorage):
+    """
+    Bir nechta bot jarayoni uchun umumiy FSM saqlovchi
+
+    Holat, ma'lumot va throttle bucketlari bitta SQLite faylida (WAL
+    rejimida) saqlanadi, shuning uchun bir jarayon to'xtab qolsa ham
+    qolganlari holatni yo'qotmaydi. Har bir metod bitta tranzaksiyada
+    bajariladigan so'rovlar to'plami: o'qish-o'zgartirish-yozish amallari
+    (masalan ``update_data``) ham bitta murojaat bilan, atomar bajariladi.
+
+    ``ttl`` berilsa, yozuv oxirgi o'zgarishdan ``ttl`` soniya o'tib
+    eskiradi va o'chiriladi.
+
+    ``consume_token`` throttling uchun umumiy token bucketlar: har bir
+    (kalit, foydalanuvchi) uchun bucket yana to'la bo'ladigan vaqt saqlanadi
+    va shu vaqt o'tgach yozuv o'chiriladi.
+    """
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS aiogram_fsm (
+        chat TEXT NOT NULL,
+        user TEXT NOT NULL,
+        state TEXT,
+        data TEXT NOT NULL DEFAULT '{}',
+        bucket TEXT NOT NULL DEFAULT '{}',
+        expires_at REAL,
+        PRIMARY KEY (chat, user)
+    ) WITHOUT ROWID
+    """
+
+    THROTTLE_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS aiogram_throttle (
+        key TEXT NOT NULL,
+        user TEXT NOT NULL,
+        full_at REAL NOT NULL,
+        exceeded INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (key, user)
+    ) WITHOUT ROWID
+    """
+
+    def __init__(self, path: str = 'fsm.sqlite3', ttl: typing.Optional[float] = None,
+                 purge_interval: float = 60, timeout: float = 30):
+        self.path = path
+        self.ttl = ttl or None
+        self.purge_interval = purge_interval
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='fsm-storage')
+        self._connection: typing.Optional[sqlite3.Connection] = None
+        self._next_purge = 0.0
+
+    # --- Ulanish --------------------------------------------------------------
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._connection is None:
+            connection = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+            connection.execute("PRAGMA journal_mode = WAL")
+            connection.execute("PRAGMA synchronous = NORMAL")
+            connection.execute(self.SCHEMA)
+            connection.execute(self.THROTTLE_SCHEMA)
+            self._connection = connection
+        return self._connection
+
+    async def _run(self, func, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, func, *args)
+
+    def _transaction(self, func, *args):
+        connection = self._connect()
+        now = time.time()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            if now >= self._next_purge:
+                if self.ttl:
+                    connection.execute("DELETE FROM aiogram_fsm WHERE expires_at <= ?", (now,))
+                # To'lib bo'lgan bucket yozuvi bo'lmagani bilan bir xil
+                connection.execute("DELETE FROM aiogram_throttle WHERE full_at <= ?", (now,))
+                self._next_purge = now + self.purge_interval
+            result = func(connection, now, *args)
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        return result
+
+    async def close(self):
+        def close():
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+        await self._run(close)
+
+    async def wait_closed(self):
+        self._executor.shutdown(wait=True)
+
+    # --- Past darajadagi amallar ---------------------------------------------
+
+    def _read(self, connection, now, key, column):
+        row = connection.execute(
+            f"SELECT {column} FROM aiogram_fsm "
+            f"WHERE chat = ? AND user = ? AND (expires_at IS NULL OR expires_at > ?)",
+            (*key, now)
+        ).fetchone()
+        return row[0] if row else None
+
+    def _write(self, connection, now, key, column, value):
+        expires_at = now + self.ttl if self.ttl else None
+        if self.ttl:
+            # Eskirgan yozuvning qolgan ustunlari upsert orqali qayta tirilmasligi uchun
+            connection.execute(
+                "DELETE FROM aiogram_fsm WHERE chat = ? AND user = ? AND expires_at <= ?",
+                (*key, now)
+            )
+        connection.execute(
+            f"INSERT INTO aiogram_fsm (chat, user, {column}, expires_at) VALUES (?, ?, ?, ?) "
+            f"ON CONFLICT (chat, user) DO UPDATE SET "
+            f"{column} = excluded.{column}, expires_at = excluded.expires_at",
+            (*key, value, expires_at)
+        )
+        # Bo'sh yozuvlarni saqlab o'tirmaymiz
+        connection.execute(
+            "DELETE FROM aiogram_fsm WHERE chat = ? AND user = ? "
+            "AND state IS NULL AND data = '{}' AND bucket = '{}'",
+            key
+        )
+
+    def _get(self, key, column):
+        return self._transaction(self._read, key, column)
+
+    def _set(self, key, column, value):
+        return self._transaction(self._write, key, column, value)
+
+    def _update_json(self, key, column, patch):
+        def update(connection, now):
+            current = json.loads(self._read(connection, now, key, column) or '{}')
+            current.update(patch)
+            self._write(connection, now, key, column, json.dumps(current))
+
+        return self._transaction(update)
+
+    def _consume(self, connection, now, key, rate, tolerance):
+        row = connection.execute(
+            "SELECT full_at, exceeded FROM aiogram_throttle WHERE key = ? AND user = ?", key
+        ).fetchone()
+        full_at, exceeded = row if row else (now, 0)
+        full_at = max(full_at, now)
+        if full_at - now > tolerance:
+            exceeded += 1
+            connection.execute(
+                "UPDATE aiogram_throttle SET exceeded = ? WHERE key = ? AND user = ?", (exceeded, *key)
+            )
+            return exceeded, full_at - tolerance - now
+
+        connection.execute(
+            "INSERT INTO aiogram_throttle (key, user, full_at) VALUES (?, ?, ?) "
+            "ON CONFLICT (key, user) DO UPDATE SET full_at = excluded.full_at, exceeded = 0",
+            (*key, full_at + rate)
+        )
+        return 0, 0.0
+
+    def _key(self, chat, user) -> typing.Tuple[str, str]:
+        chat, user = self.check_address(chat=chat, user=user)
+        return str(chat), str(user)
+
+    # --- BaseStorage ----------------------------------------------------------
+
+    async def get_state(self, *, chat=None, user=None, default=None):
+        state = await self._run(self._get, self._key(chat, user), 'state')
+        return state if state is not None else self.resolve_state(default)
+
+    async def get_data(self, *, chat=None, user=None, default=None):
+        data = await self._run(self._get, self._key(chat, user), 'data')
+        if data is None:
+            return copy.deepcopy(default) if default else {}
+        return json.loads(data)
+
+    async def set_state(self, *, chat=None, user=None, state=None):
+        await self._run(self._set, self._key(chat, user), 'state', self.resolve_state(state))
+
+    async def set_data(self, *, chat=None, user=None, data=None):
+        await self._run(self._set, self._key(chat, user), 'data', json.dumps(data or {}))
+
+    async def update_data(self, *, chat=None, user=None, data=None, **kwargs):
+        patch = dict(data or {}, **kwargs)
+        await self._run(self._update_json, self._key(chat, user), 'data', patch)
+
+    async def reset_state(self, *, chat=None, user=None, with_data=True):
+        key = self._key(chat, user)
+
+        def reset(connection, now):
+            self._write(connection, now, key, 'state', None)
+            if with_data:
+                self._write(connection, now, key, 'data', '{}')
+
+        await self._run(self._transaction, reset)
+
+    def has_bucket(self):
+        return True
+
+    async def get_bucket(self, *, chat=None, user=None, default=None):
+        bucket = await self._run(self._get, self._key(chat, user), 'bucket')
+        if bucket is None:
+            return copy.deepcopy(default) if default else {}
+        return json.loads(bucket)
+
+    async def set_bucket(self, *, chat=None, user=None, bucket=None):
+        await self._run(self._set, self._key(chat, user), 'bucket', json.dumps(bucket or {}))
+
+    async def update_bucket(self, *, chat=None, user=None, bucket=None, **kwargs):
+        patch = dict(bucket or {}, **kwargs)
+        await self._run(self._update_json, self._key(chat, user), 'bucket', patch)
+
+    async def consume_token(self, key: str, user: int, rate: float, burst: int = 1) -> typing.Tuple[int, float]:
+        """
+        Umumiy token bucketdan bitta token olish (GCRA, ``TokenBucket`` bilan bir xil)
+
+        Returns:
+            tuple: (0 yoki ketma-ket rad etishlar soni, keyingi tokengacha soniya)
+        """
+        return await self._run(self._transaction, self._consume, (key, str(user)), rate, (burst - 1) * rate)
+
+
+class RedisStorage(RedisStorage2):
+    """
+    ``RedisStorage2`` va umumiy token bucketlar
+
+    Bucket Lua skriptida atomar yangilanadi va server vaqti ishlatiladi,
+    shuning uchun jarayonlar soatlari farqi ta'sir qilmaydi. Har bir kalit
+    kichik hash bo'lib, bucket to'lgan paytda muddati tugab o'chadi.
+    """
+
+    CONSUME_SCRIPT = """
+    local time = redis.call('TIME')
+    local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+    local rate = tonumber(ARGV[1])
+    local tolerance = tonumber(ARGV[2])
+    local state = redis.call('HMGET', KEYS[1], 'full_at', 'exceeded')
+    local full_at = math.max(tonumber(state[1]) or now, now)
+    if full_at - now > tolerance then
+        local exceeded = redis.call('HINCRBY', KEYS[1], 'exceeded', 1)
+        return {exceeded, tostring(full_at - tolerance - now)}
+    end
+    full_at = full_at + rate
+    redis.call('HSET', KEYS[1], 'full_at', tostring(full_at), 'exceeded', 0)
+    redis.call('PEXPIRE', KEYS[1], math.ceil((full_at - now) * 1000))
+    return {0, '0'}
+    """
+
+    async def consume_token(self, key: str, user: int, rate: float, burst: int = 1) -> typing.Tuple[int, float]:
+        """``SQLiteStorage.consume_token`` bilan bir xil"""
+        exceeded, retry_after = await self._redis.eval(
+            self.CONSUME_SCRIPT, 1, self.generate_key(key, user, 'throttle'), rate, (burst - 1) * rate
+        )
+        return int(exceeded), float(retry_after)
+
+
+def create_storage(backend: str = None) -> BaseStorage:
+    """
+    FSM_STORAGE sozlamasiga ko'ra saqlovchini yaratish
+
+    ``memory`` - bitta jarayon ichida (testlar uchun ham shu ishlatiladi),
+    ``sqlite`` - jarayonlar o'rtasida umumiy fayl,
+    ``redis`` - Redis bilan mos server (aioredis o'rnatilgan bo'lishi kerak).
+    """
+    backend = backend or config.FSM_STORAGE
+    ttl = config.FSM_STORAGE_TTL or None
+    if backend == 'memory':
+        return MemoryStorage()
+    if backend == 'sqlite':
+        return SQLiteStorage(config.FSM_STORAGE_PATH, ttl=ttl)
+    if backend == 'redis':
+        return RedisStorage(
+            host=config.REDIS_HOST,
+            port=config.REDIS_PORT,
+            db=config.REDIS_DB,
+            password=config.REDIS_PASSWORD or None,
+            prefix=config.REDIS_PREFIX,
+            state_ttl=ttl,
+            data_ttl=ttl,
+            bucket_ttl=ttl,
+        )
+    raise ValueError(f"Unknown FSM storage backend: {backend}")
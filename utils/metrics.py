@@ -0,0 +1,225 @@
+import bisect
+import logging
+import threading
+import time
+from typing import Callable, Dict, Iterable, Optional, Sequence
+
+from aiohttp import web
+
+# Sekundlardagi standart chegaralar (handler va Telegram so'rovlari)
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+# Baza so'rovlari odatda millisekunddan tez
+DB_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', r'\\').replace('\n', r'\n').replace('"', r'\"')
+
+
+def _labels(names: Sequence[str], values: Sequence, extra: str = '') -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _number(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Faqat o'suvchi hisoblagich"""
+
+    type = 'counter'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def samples(self) -> Iterable[str]:
+        with self._lock:
+            values = list(self._values.items())
+        for labels, value in values:
+            yield f'{self.name}{_labels(self.labelnames, labels)} {_number(value)}'
+
+
+class Histogram:
+    """
+    Kuzatilgan qiymatlar taqsimoti (masalan kechikish)
+
+    Har bir kuzatuv faqat bitta bucket hisoblagichini oshiradi; kumulyativ
+    qiymatlar ``/metrics`` so'ralgandagina hisoblanadi.
+    """
+
+    type = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # labels -> [bucketlar (+Inf bilan), yig'indi]
+        self._values: Dict[tuple, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(labels)
+            if entry is None:
+                entry = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            entry[0][index] += 1
+            entry[1] += value
+
+    def samples(self) -> Iterable[str]:
+        with self._lock:
+            values = [(labels, list(entry[0]), entry[1]) for labels, entry in self._values.items()]
+        for labels, counts, total in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                le = f'le="{_number(bound)}"'
+                yield f'{self.name}_bucket{_labels(self.labelnames, labels, le)} {cumulative}'
+            yield f'{self.name}_sum{_labels(self.labelnames, labels)} {_number(total)}'
+            yield f'{self.name}_count{_labels(self.labelnames, labels)} {cumulative}'
+
+
+class CallbackGauge:
+    """
+    Qiymati ``/metrics`` so'ralganda ``callback()`` dan olinadigan o'lchov
+
+    ``callback`` son yoki {label qiymatlari: son} lug'atini qaytaradi.
+    """
+
+    def __init__(self, name: str, documentation: str, callback: Callable, labelnames: Sequence[str] = (),
+                 type: str = 'gauge'):
+        self.name = name
+        self.documentation = documentation
+        self.callback = callback
+        self.labelnames = tuple(labelnames)
+        self.type = type
+
+    def samples(self) -> Iterable[str]:
+        values = self.callback()
+        if not isinstance(values, dict):
+            values = {(): values}
+        for labels, value in values.items():
+            if not isinstance(labels, tuple):
+                labels = (labels,)
+            yield f'{self.name}{_labels(self.labelnames, labels)} {_number(value)}'
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+
+    def register(self, metric):
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        """Prometheus text formatidagi barcha o'lchovlar"""
+        lines = []
+        for metric in self._metrics.values():
+            try:
+                samples = list(metric.samples())
+            except Exception as err:
+                logging.warning(f"Metric {metric.name} failed: {err!r}")
+                continue
+            lines.append(f'# HELP {metric.name} {metric.documentation}')
+            lines.append(f'# TYPE {metric.name} {metric.type}')
+            lines.extend(samples)
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+handler_seconds = REGISTRY.register(Histogram(
+    'konkurs_handler_seconds', "Handlerning ishlash vaqti", ('handler', 'update_type')
+))
+handler_errors = REGISTRY.register(Counter(
+    'konkurs_handler_errors_total', "Handlerlardagi xatolar", ('error',)
+))
+db_seconds = REGISTRY.register(Histogram(
+    'konkurs_db_seconds', "DataBase metodining bajarilish vaqti", ('method',), buckets=DB_BUCKETS
+))
+db_errors = REGISTRY.register(Counter(
+    'konkurs_db_errors_total', "DataBase metodlaridagi xatolar", ('method',)
+))
+telegram_seconds = REGISTRY.register(Histogram(
+    'konkurs_telegram_api_seconds', "Telegram Bot API so'rovlari vaqti", ('method',)
+))
+telegram_errors = REGISTRY.register(Counter(
+    'konkurs_telegram_api_errors_total', "Telegram Bot API xatolari", ('method', 'error')
+))
+
+
+def observe_db(method: str, seconds: float, error: Optional[BaseException]):
+    """``AsyncDataBase(observe=...)`` uchun"""
+    db_seconds.observe(seconds, method)
+    if error is not None:
+        db_errors.inc(method)
+
+
+class timed:
+    """Blok bajarilish vaqtini histogrammaga yozish; xato bo'lsa ``errors`` ga ham"""
+
+    __slots__ = ('histogram', 'errors', 'labels', 'started')
+
+    def __init__(self, histogram: Histogram, *labels, errors: Counter = None):
+        self.histogram = histogram
+        self.errors = errors
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.histogram.observe(time.perf_counter() - self.started, *self.labels)
+        if exc_type is not None and self.errors is not None:
+            self.errors.inc(*self.labels, exc_type.__name__)
+        return False
+
+
+def register_stats(name: str, documentation: str, stats: Callable[[], dict], keys: Dict[str, str],
+                   type: str = 'gauge', labelname: str = 'state', registry: Registry = REGISTRY):
+    """
+    ``stats()`` lug'atidagi qiymatlarni bitta labelli o'lchov qilib chiqarish
+
+    Args:
+        keys: {stats kaliti: label qiymati}
+    """
+    def collect():
+        values = stats()
+        return {(label,): values[key] for key, label in keys.items()}
+
+    registry.register(CallbackGauge(name, documentation, collect, (labelname,), type=type))
+
+
+async def start_metrics_server(host: str, port: int, registry: Registry = REGISTRY) -> web.AppRunner:
+    """``http://host:port/metrics`` da o'lchovlarni beruvchi server"""
+    async def handle(request: web.Request) -> web.Response:
+        return web.Response(body=registry.render().encode(), headers={'Content-Type': CONTENT_TYPE})
+
+    app = web.Application()
+    app.router.add_get('/metrics', handle)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    logging.info(f"Metrics: http://{host}:{port}/metrics")
+    return runner
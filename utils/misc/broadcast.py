@@ -0,0 +1,180 @@
+import asyncio
+import logging
+import os
+import socket
+import time
+from collections import deque
+
+from aiogram import Bot
+from aiogram.utils.exceptions import BotBlocked, CantInitiateConversation, ChatNotFound, UserDeactivated
+
+from data import config
+from utils.send_scheduler import PRIORITY_BULK, priority
+
+# Foydalanuvchi botdan foydalana olmaydigan xatolar: u nofaol qilinadi
+BLOCKED_ERRORS = (BotBlocked, UserDeactivated, ChatNotFound, CantInitiateConversation)
+
+
+class BroadcastSender:
+    """
+    Bitta xabarni yuboruvchi
+
+    Mukofot rasmi biriktirilgan bo'lsa, u faqat bir marta yuklanadi: keyingi
+    foydalanuvchilarga Telegramdagi file_id yuboriladi.
+    """
+
+    def __init__(self, db, bot: Bot, text: str, award=None):
+        self.db = db
+        self.bot = bot
+        self.text = text
+        self.award_id = self.image = self.file_id = None
+        if award:
+            self.award_id, _, _, self.image, self.file_id = award
+            if not self.file_id and not (self.image and os.path.exists(os.path.join('admin', self.image))):
+                self.image = None
+        self._upload_lock = asyncio.Lock()
+
+    async def __call__(self, chat_id: int):
+        if not self.file_id and not self.image:
+            return await self.bot.send_message(chat_id, self.text)
+
+        if not self.file_id:
+            async with self._upload_lock:
+                if not self.file_id:
+                    with open(os.path.join('admin', self.image), 'rb') as photo:
+                        sent = await self.bot.send_photo(chat_id, photo, caption=self.text)
+                    self.file_id = sent.photo[-1].file_id
+                    await self.db.set_award_file_id(self.award_id, self.image, self.file_id)
+                    return sent
+
+        return await self.bot.send_photo(chat_id, self.file_id, caption=self.text)
+
+
+async def run_broadcast(db, bot: Bot, broadcast, owner: str):
+    """
+    Xabarni barcha faol foydalanuvchilarga yuborish
+
+    Foydalanuvchilar ``id`` bo'yicha sahifalab o'qiladi va bir vaqtda
+    BROADCAST_WINDOW tagacha xabar SendScheduler navbatida turadi, shuning
+    uchun yuborish tezligini faqat Telegram limitlari belgilaydi. Har
+    BROADCAST_SAVE_INTERVAL soniyada oxirgi uzluksiz yuborilgan foydalanuvchi
+    id si saqlanadi: jarayon o'chib qolsa, yuborish shu joydan davom etadi.
+    """
+    broadcast_id, text, award_id = broadcast
+    progress = await db.claim_broadcast(broadcast_id, owner, config.BROADCAST_LEASE)
+    if not progress:
+        # Boshqa jarayon yubormoqda
+        return
+    last_user_id, total, sent, blocked, failed = progress
+    award = await db.get_award(award_id) if award_id else None
+    send = BroadcastSender(db, bot, text, award)
+    logging.info(f"Broadcast #{broadcast_id}: {total} ta foydalanuvchi, id > {last_user_id} dan boshlanadi")
+
+    processed_before = sent + blocked + failed
+    rate = None
+    pending = deque()  # (user_pk, telegram_id, task) - navbat tartibida
+    in_flight = set()
+    blocked_ids = []
+    status = 'running'
+    saved_at = time.monotonic()
+
+    def collect():
+        """Boshidan ketma-ket tugagan yuborishlarni hisobga olish"""
+        nonlocal last_user_id, sent, failed
+        while pending and pending[0][2].done() and not pending[0][2].cancelled():
+            user_pk, telegram_id, task = pending.popleft()
+            error = task.exception()
+            if error is None:
+                sent += 1
+            elif isinstance(error, BLOCKED_ERRORS):
+                blocked_ids.append(telegram_id)
+            else:
+                failed += 1
+                logging.warning(f"Broadcast #{broadcast_id}: {telegram_id} ga yuborilmadi: {error!r}")
+            last_user_id = user_pk
+
+    async def save():
+        nonlocal blocked, saved_at, processed_before, rate
+        collect()
+        if blocked_ids:
+            await db.deactivate_users(blocked_ids)
+            blocked += len(blocked_ids)
+            blocked_ids.clear()
+        # Tezlik oxirgi oraliqlar bo'yicha silliqlanadi (EMA)
+        processed = sent + blocked + failed
+        now = time.monotonic()
+        if now > saved_at:
+            current_rate = (processed - processed_before) / (now - saved_at)
+            rate = current_rate if rate is None else 0.3 * current_rate + 0.7 * rate
+        processed_before, saved_at = processed, now
+        current = await db.save_broadcast_progress(
+            broadcast_id, owner, last_user_id, sent, blocked, failed, round(rate or 0, 2), config.BROADCAST_LEASE
+        )
+        eta = max(total - processed, 0) / rate if rate else 0
+        logging.info(
+            f"Broadcast #{broadcast_id}: {processed}/{total}, {rate or 0:.1f} xabar/s, "
+            f"qoldi ~{eta:.0f} s, bloklagan {blocked}, xato {failed}"
+        )
+        return current
+
+    try:
+        with priority(PRIORITY_BULK):
+            cursor = last_user_id
+            while status == 'running':
+                users = await db.get_broadcast_recipients(cursor, config.BROADCAST_CHUNK_SIZE)
+                if not users:
+                    break
+                for user_pk, telegram_id in users:
+                    while len(in_flight) >= config.BROADCAST_WINDOW or len(pending) >= 10 * config.BROADCAST_WINDOW:
+                        done, _ = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+                        in_flight.difference_update(done)
+                        collect()
+                    task = asyncio.create_task(send(telegram_id))
+                    in_flight.add(task)
+                    pending.append((user_pk, telegram_id, task))
+                    cursor = user_pk
+
+                    if time.monotonic() - saved_at >= config.BROADCAST_SAVE_INTERVAL:
+                        status = await save()
+                        if status != 'running':
+                            break
+
+            if in_flight:
+                await asyncio.wait(in_flight)
+            status = await save()
+    except asyncio.CancelledError:
+        # Bot to'xtatilmoqda: yangi xabarlar navbatga qo'shilmaydi, navbatdagilari
+        # SEND_SHUTDOWN_TIMEOUT gacha kutiladi. So'rovi ketib bo'lgan xabarni
+        # bekor qilib bo'lmaydi: u yetib boradi, lekin hisobga olinmasa keyingi
+        # ishga tushishda yana yuboriladi. Tugaganlarini saqlab, egalikni
+        # bo'shatamiz. Yuborilmay qolganlar keyingi ishga tushishda yuboriladi.
+        if in_flight:
+            await asyncio.shield(asyncio.wait(in_flight, timeout=config.SEND_SHUTDOWN_TIMEOUT))
+        for task in in_flight:
+            task.cancel()
+        await asyncio.shield(save())
+        await asyncio.shield(db.release_broadcast(broadcast_id, owner, False))
+        raise
+
+    if status is None:
+        logging.warning(f"Broadcast #{broadcast_id}: boshqa jarayon davom ettirmoqda")
+        return
+    finished = status == 'running'
+    await db.release_broadcast(broadcast_id, owner, finished)
+    logging.info(f"Broadcast #{broadcast_id}: {'tugadi' if finished else status} "
+                 f"(yuborildi {sent}, bloklagan {blocked}, xato {failed})")
+
+
+async def broadcast_worker(db, bot: Bot):
+    """Admin panelda boshlangan xabar yuborishlarni kuzatish va bajarish"""
+    owner = f"{socket.gethostname()}:{os.getpid()}"
+    while True:
+        try:
+            broadcast = await db.get_running_broadcast()
+            if broadcast:
+                await run_broadcast(db, bot, broadcast, owner)
+        except asyncio.CancelledError:
+            raise
+        except Exception as err:
+            logging.exception(err)
+        await asyncio.sleep(config.BROADCAST_CHECK_INTERVAL)
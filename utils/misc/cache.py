@@ -0,0 +1,21 @@
+import asyncio
+import logging
+
+from data import config
+
+
+async def cache_version_watcher(db):
+    """
+    Admin panelda kanal yoki mukofot o'zgarganini kuzatish
+
+    Har CACHE_VERSION_CHECK_INTERVAL soniyada ``db.check_versions()``
+    chaqiriladi, shuning uchun o'zgarishlar bir soniya ichida botga yetadi.
+    """
+    while True:
+        try:
+            changed = await db.check_versions()
+            if changed:
+                logging.info(f"Kesh yangilandi: {', '.join(changed)}")
+        except Exception as err:
+            logging.exception(err)
+        await asyncio.sleep(config.CACHE_VERSION_CHECK_INTERVAL)
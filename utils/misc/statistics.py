@@ -0,0 +1,33 @@
+import asyncio
+import logging
+import time
+
+from data import config
+
+
+async def statistics_worker(db):
+    """
+    Kunlik statistika qatorini yuritish
+
+    Qiymatlar har bir o'zgarish bilan birga yoziladi. Har
+    STATISTICS_FLUSH_INTERVAL soniyada bugungi qator borligi tekshiriladi
+    (yangi kun uchun u yaratiladi), har STATISTICS_RECONCILE_INTERVAL
+    soniyada esa qator jadvallardagi haqiqiy qiymatlar bilan solishtiriladi.
+    """
+    last_reconcile = time.monotonic()
+    while True:
+        await asyncio.sleep(config.STATISTICS_FLUSH_INTERVAL)
+        try:
+            if time.monotonic() - last_reconcile >= config.STATISTICS_RECONCILE_INTERVAL:
+                await reconcile_statistics(db)
+                last_reconcile = time.monotonic()
+            await db.update_statistics()
+        except Exception as err:
+            logging.exception(err)
+
+
+async def reconcile_statistics(db):
+    mismatches = await db.reconcile_statistics()
+    for field, (counted, actual) in mismatches.items():
+        logging.warning(f"Statistika farqi: {field} yozilgan={counted}, haqiqiy={actual}")
+    return mismatches
@@ -0,0 +1,296 @@
+import asyncio
+import logging
+import sys
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Sequence, Tuple
+from urllib.parse import urlparse
+
+from aiogram import Bot, types
+
+from data import config
+from utils import metrics
+
+SUBSCRIBED_STATUSES = ('member', 'administrator', 'creator')
+
+
+class MembershipCache:
+    """
+    (kanal, telegram_id) bo'yicha obuna natijalari keshi
+
+    Obuna bo'lganlar va bo'lmaganlar uchun alohida TTL ishlatiladi: ijobiy
+    natija uzoqroq saqlanadi, salbiy natija esa tez eskiradi, chunki
+    foydalanuvchi hozirgina obuna bo'lib tugmani bosgan bo'lishi mumkin.
+    Hajm ``max_size`` yozuvdan oshsa eng uzoq ishlatilmagan yozuv o'chiriladi.
+    """
+
+    def __init__(self, positive_ttl: float, negative_ttl: float, max_size: int):
+        self.positive_ttl = positive_ttl
+        self.negative_ttl = negative_ttl
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, channel_username: str, user_id: int, positive_only: bool = False) -> Optional[bool]:
+        """
+        Keshdagi natija, topilmasa yoki eskirgan bo'lsa None
+
+        ``positive_only=True`` da salbiy natija ham topilmagan hisoblanadi.
+        """
+        key = (channel_username, user_id)
+        entry = self._entries.get(key)
+        if entry is not None:
+            is_subscribed, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+            elif is_subscribed or not positive_only:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return is_subscribed
+        self.misses += 1
+        return None
+
+    def set(self, channel_username: str, user_id: int, is_subscribed: bool):
+        ttl = self.positive_ttl if is_subscribed else self.negative_ttl
+        if ttl <= 0:
+            return
+        key = (sys.intern(channel_username), user_id)
+        self._entries[key] = (is_subscribed, time.monotonic() + ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, channel_username: str, user_id: int):
+        self._entries.pop((channel_username, user_id), None)
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        """Kesh hisoblagichlari: har bir hit bitta tejalgan API so'rovi"""
+        total = self.hits + self.misses
+        return {
+            'size': len(self._entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_ratio': self.hits / total if total else 0.0,
+        }
+
+
+membership_cache = MembershipCache(
+    positive_ttl=config.MEMBERSHIP_CACHE_POSITIVE_TTL,
+    negative_ttl=config.MEMBERSHIP_CACHE_NEGATIVE_TTL,
+    max_size=config.MEMBERSHIP_CACHE_SIZE,
+)
+metrics.REGISTRY.register(metrics.CallbackGauge(
+    'konkurs_membership_cache_size', "Obuna keshidagi yozuvlar", lambda: membership_cache.stats()['size'],
+))
+metrics.register_stats(
+    'konkurs_membership_cache_total', "Obuna keshiga murojaatlar", membership_cache.stats,
+    {'hits': 'hit', 'misses': 'miss', 'evictions': 'eviction'}, type='counter', labelname='result',
+)
+
+subscription_checks = metrics.REGISTRY.register(metrics.Counter(
+    'konkurs_subscription_checks_total', "Kanal obunasi tekshiruvlari: jadvaldan yoki API orqali", ('source',)
+))
+
+# Bot admin bo'lgan kanallar: channel_key -> kuzatish boshlangan vaqt (UTC).
+# Ularda obuna chat_member updatelari orqali konkurs_usersubscription
+# jadvalida kuzatiladi. Bundan oldin yozilgan holatlarga ishonilmaydi:
+# bot admin bo'lmagan paytdagi chiqib ketishlar jadvalga tushmagan
+tracked_channels: Dict[str, str] = {}
+
+# Barcha foydalanuvchilar uchun umumiy cheklov: bir vaqtda
+# MEMBERSHIP_CHECK_CONCURRENCY tadan ortiq get_chat_member yuborilmaydi
+_semaphore = None
+
+
+def get_channel_username(url: str) -> str:
+    """Kanal usernameni olish"""
+    path = urlparse(url).path.strip('/')
+    if path.startswith('@'):
+        return path
+    return '@' + path
+
+
+def channel_key(channel_username: str) -> str:
+    """Telegram usernamelari katta-kichik harfni farqlamaydi"""
+    return channel_username.lower()
+
+
+def is_tracked(channel_username: str) -> bool:
+    return channel_key(channel_username) in tracked_channels
+
+
+def tracked_since(channel_username: str) -> Optional[str]:
+    """Kanal kuzatila boshlangan vaqt (``updated_at`` bilan solishtiriladi), kuzatilmasa None"""
+    return tracked_channels.get(channel_key(channel_username))
+
+
+def _now() -> str:
+    # SQLite va Django yozadigan formatda, satr sifatida solishtiriladi
+    return datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S.%f')
+
+
+def set_tracked(channel_username: str, tracked: bool):
+    """Kanalni chat_member updatelari orqali kuzatiladiganlarga qo'shish yoki chiqarish"""
+    key = channel_key(channel_username)
+    if not tracked:
+        tracked_channels.pop(key, None)
+    elif key not in tracked_channels:
+        tracked_channels[key] = _now()
+
+
+def _get_semaphore() -> asyncio.Semaphore:
+    global _semaphore
+    if _semaphore is None:
+        _semaphore = asyncio.Semaphore(config.MEMBERSHIP_CHECK_CONCURRENCY)
+    return _semaphore
+
+
+async def is_member(bot: Bot, channel_username: str, user_id: int, use_negative_cache: bool = True) -> bool:
+    """
+    Foydalanuvchi kanalga obuna bo'lganini tekshirish
+
+    Avval ``membership_cache`` tekshiriladi, faqat u yerda bo'lmasa
+    get_chat_member chaqiriladi. Xatoliklar keshlanmaydi.
+
+    ``use_negative_cache=False`` - foydalanuvchi o'zi "obuna bo'ldim" deb
+    tekshirtirganda: u hozirgina obuna bo'lgan bo'lishi mumkin, shuning
+    uchun faqat ijobiy natija keshdan olinadi.
+
+    Raises:
+        asyncio.TimeoutError: Telegram MEMBERSHIP_CHECK_TIMEOUT ichida javob bermasa
+    """
+    cached = membership_cache.get(channel_username, user_id, positive_only=not use_negative_cache)
+    if cached is not None:
+        return cached
+
+    async with _get_semaphore():
+        member = await asyncio.wait_for(
+            bot.get_chat_member(chat_id=channel_username, user_id=user_id),
+            timeout=config.MEMBERSHIP_CHECK_TIMEOUT
+        )
+    is_subscribed = member.status in SUBSCRIBED_STATUSES
+    membership_cache.set(channel_username, user_id, is_subscribed)
+    return is_subscribed
+
+
+async def get_not_subscribed(bot: Bot, links: Sequence[Tuple[str, str]], user_id: int,
+                             db=None, use_negative_cache: bool = True) -> List[Tuple[str, str]]:
+    """
+    Obuna bo'linmagan kanallarni aniqlash
+
+    Bot admin bo'lgan kanallar uchun avval ``db`` dagi obunalar jadvali
+    o'qiladi: u yerda kanal kuzatila boshlagandan keyin obuna bo'lgan deb
+    yozilgan bo'lsa API ga murojaat qilinmaydi. Yozuv bo'lmasa, obuna
+    bo'lmagan deb yoki kuzatishdan oldin yozilgan bo'lsa (bot admin
+    bo'lmagan paytda o'zgargan bo'lishi mumkin) ``is_member`` bilan
+    tekshiriladi va natija jadvalga yoziladi. Qolgan kanallar faqat
+    ``is_member`` bilan tekshiriladi.
+
+    Barcha kanallar parallel tekshiriladi. Xatolik yoki timeout bo'lsa
+    kanal obuna bo'linmagan deb hisoblanadi.
+
+    Args:
+        links: (title, url) juftliklari
+        user_id (int): Foydalanuvchi telegram ID si
+        db: AsyncDataBase (berilmasa jadvaldan foydalanilmaydi)
+        use_negative_cache (bool): ``is_member`` ga uzatiladi
+
+    Returns:
+        list: Obuna bo'linmagan (title, url) juftliklari
+    """
+    # url -> obuna bo'lgan deb yozilgan vaqt
+    subscribed_at = {}
+    if db is not None and any(is_tracked(get_channel_username(url)) for _, url in links):
+        try:
+            subscribed_at = {url: updated_at for _, url, is_subscribed, updated_at
+                             in await db.get_user_subscriptions(user_id) if is_subscribed}
+        except Exception as e:
+            logging.warning(f"Xatolik: {user_id} obunalarini o'qishda: {e!r}")
+
+    async def check(url: str) -> bool:
+        channel_username = get_channel_username(url)
+        since = tracked_since(channel_username) if db is not None else None
+        tracked = since is not None
+        if tracked and url in subscribed_at and subscribed_at[url] >= since:
+            subscription_checks.inc('table')
+            return True
+
+        subscription_checks.inc('api')
+        try:
+            is_subscribed = await is_member(bot, channel_username, user_id, use_negative_cache)
+        except Exception as e:
+            logging.warning(f"Xatolik: {channel_username} tekshirishda: {e!r}")
+            return False
+        if tracked and is_subscribed:
+            try:
+                if url in subscribed_at:
+                    # Eski yozuv: holat o'zgarmaydi, faqat vaqti yangilanadi
+                    await db.confirm_subscription(user_id, url)
+                else:
+                    await db.update_subscription_status(user_id, url, True)
+            except Exception as e:
+                logging.warning(f"Xatolik: {channel_username} obunasini yozishda: {e!r}")
+        return is_subscribed
+
+    results = await asyncio.gather(*(check(url) for _, url in links))
+    return [link for link, subscribed in zip(links, results) if not subscribed]
+
+
+async def refresh_tracked_channels(bot: Bot, links: Sequence[Tuple[str, str]]) -> set:
+    """
+    Bot admin bo'lgan kanallarni aniqlash
+
+    Telegram chat_member updatelarini faqat bot admin bo'lgan kanallardan
+    yuboradi, shuning uchun faqat shu kanallar kuzatiladi.
+
+    Returns:
+        set: Kuzatiladigan kanallar (channel_key lar)
+    """
+    me = await bot.me
+
+    async def check(url: str) -> bool:
+        channel_username = get_channel_username(url)
+        try:
+            async with _get_semaphore():
+                member = await asyncio.wait_for(
+                    bot.get_chat_member(chat_id=channel_username, user_id=me.id),
+                    timeout=config.MEMBERSHIP_CHECK_TIMEOUT
+                )
+        except Exception as e:
+            logging.warning(f"Xatolik: {channel_username} da bot huquqlarini tekshirishda: {e!r}")
+            return False
+        return member.status == types.ChatMemberStatus.ADMINISTRATOR
+
+    results = await asyncio.gather(*(check(url) for _, url in links))
+    tracked = {channel_key(get_channel_username(url)) for (_, url), admin in zip(links, results) if admin}
+    # Avvaldan kuzatilayotgan kanallarning boshlanish vaqti saqlanadi
+    now = _now()
+    tracked_channels.update({key: tracked_channels.get(key, now) for key in tracked})
+    for key in set(tracked_channels) - tracked:
+        del tracked_channels[key]
+    return tracked
+
+
+async def tracked_channels_worker(db, bot: Bot):
+    """
+    Kuzatiladigan kanallar ro'yxatini yangilab turish
+
+    Bot huquqlari o'zgarsa ``my_chat_member`` updatei darhol keladi; bu
+    davriy tekshiruv admin panelda qo'shilgan kanallar va o'tkazib
+    yuborilgan updatelar uchun.
+    """
+    while True:
+        try:
+            tracked = await refresh_tracked_channels(bot, await db.get_all_active_links())
+            logging.info(f"chat_member orqali kuzatiladigan kanallar: {len(tracked)}")
+        except Exception as err:
+            logging.exception(err)
+        await asyncio.sleep(config.SUBSCRIPTION_TRACKING_INTERVAL)
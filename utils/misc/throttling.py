@@ -1,3 +1,7 @@
+import time
+from typing import Callable, Dict
+
+
 def rate_limit(limit: int, key=None):
     """
     Decorator for configuring rate limit and key in different functions.
@@ -14,3 +18,87 @@ def rate_limit(limit: int, key=None):
         return func
 
     return decorator
+
+
+class TokenBucket:
+    """
+    Kalitlar (foydalanuvchi yoki chat) bo'yicha token bucketlar
+
+    Har bir kalit uchun faqat bitta son saqlanadi - bucket yana to'la
+    bo'ladigan nazariy vaqt (GCRA). ``rate`` soniyada bitta token qo'shiladi,
+    bucket sig'imi ``burst`` token.
+
+    Yozuvlar ikki avlodda saqlanadi. Har ``idle_timeout`` soniyada eski
+    avlod tashlab yuboriladi, shuning uchun uzoq vaqt ishlatilmagan kalitlar
+    xotiradan o'chadi. ``idle_timeout`` bucket to'lish vaqtidan kam emas,
+    shuning uchun o'chirilgan yozuvlar baribir to'la edi.
+
+    Joriy avlod ``max_users`` taga yetganda esa faqat to'lib bo'lgan
+    yozuvlar o'chiriladi, hali to'layotganlari eski avlodga o'tkaziladi.
+    Xotira ``2 * max_users`` yozuvdan oshmaydi: bir vaqtda ``max_users``
+    dan ko'p kalit to'layotgan bo'lsa, eski avlodning yozuvlari tashlanadi.
+    """
+
+    def __init__(self, rate: float, burst: int = 1, max_users: int = 1_000_000,
+                 idle_timeout: float = 60, clock: Callable[[], float] = time.monotonic):
+        self.rate = rate
+        self.tolerance = (burst - 1) * rate
+        self.max_users = max_users
+        self.idle_timeout = max(idle_timeout, burst * rate)
+        self.clock = clock
+        self._current: Dict[int, float] = {}
+        self._previous: Dict[int, float] = {}
+        self._exceeded: Dict[int, int] = {}
+        self._rotate_at = clock() + self.idle_timeout
+
+    def __len__(self):
+        return len(self._current) + len(self._previous)
+
+    def _rotate(self, now: float, previous: Dict[int, float]):
+        self._previous = previous
+        self._current = {}
+        self._exceeded = {key: count for key, count in self._exceeded.items() if key in previous}
+        self._rotate_at = now + self.idle_timeout
+
+    def _compact(self, now: float):
+        """Joriy avlod to'lganda: to'la bucketlarni o'chirib, qolganlarini eski avlodga o'tkazish"""
+        live = {key: full_at for key, full_at in self._previous.items() if full_at > now}
+        live.update((key, full_at) for key, full_at in self._current.items() if full_at > now)
+        if len(live) > self.max_users:
+            live = {key: full_at for key, full_at in self._current.items() if full_at > now}
+        self._rotate(now, live)
+
+    def consume(self, key: int) -> int:
+        """
+        Bitta token olish
+
+        Returns:
+            0 - so'rov ruxsat etildi, aks holda ketma-ket rad etishlar soni
+        """
+        now = self.clock()
+        if now >= self._rotate_at:
+            self._rotate(now, self._current)
+        elif len(self._current) >= self.max_users:
+            self._compact(now)
+
+        full_at = self._current.get(key)
+        if full_at is None:
+            full_at = self._previous.pop(key, now)
+        if full_at < now:
+            full_at = now
+
+        if full_at - now > self.tolerance:
+            self._current[key] = full_at
+            exceeded = self._exceeded.get(key, 0) + 1
+            self._exceeded[key] = exceeded
+            return exceeded
+
+        self._current[key] = full_at + self.rate
+        if self._exceeded:
+            self._exceeded.pop(key, None)
+        return 0
+
+    def retry_after(self, key: int) -> float:
+        """Keyingi token paydo bo'lishigacha qolgan vaqt (soniya)"""
+        full_at = self._current.get(key) or self._previous.get(key) or 0
+        return max(0.0, full_at - self.tolerance - self.clock())
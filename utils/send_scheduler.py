@@ -0,0 +1,246 @@
+import asyncio
+import contextlib
+import contextvars
+import functools
+import heapq
+import itertools
+import logging
+import time
+from typing import Awaitable, Callable, Dict, List, Optional, Set, Tuple, Union
+
+from aiogram import Bot
+from aiogram.utils.exceptions import RetryAfter
+
+from utils import metrics
+from utils.misc.throttling import TokenBucket
+
+# Navbat ustuvorliklari: kichik son oldin yuboriladi
+PRIORITY_INTERACTIVE = 0  # foydalanuvchi harakatiga javoblar
+PRIORITY_BULK = 10  # ommaviy xabarlar (broadcast)
+
+# Joriy kontekstdagi yuborishlar ustuvorligi
+send_priority = contextvars.ContextVar('send_priority', default=PRIORITY_INTERACTIVE)
+
+# Chatga yangi xabar paydo qiladigan Bot API metodlari
+SCHEDULED_METHODS = frozenset((
+    'sendMessage', 'sendPhoto', 'sendDocument', 'sendVideo', 'sendAudio', 'sendAnimation',
+    'sendVoice', 'sendVideoNote', 'sendMediaGroup', 'sendLocation', 'sendVenue', 'sendContact',
+    'sendPoll', 'sendDice', 'sendSticker', 'sendInvoice', 'sendGame', 'copyMessage', 'forwardMessage',
+))
+
+GLOBAL_KEY = 0
+
+
+@contextlib.contextmanager
+def priority(value: int):
+    """Blok ichidagi (va undan yaratilgan tasklardagi) yuborishlar ustuvorligi"""
+    token = send_priority.set(value)
+    try:
+        yield
+    finally:
+        send_priority.reset(token)
+
+
+class _Job:
+    __slots__ = ('chat_id', 'call', 'retryable', 'future', 'attempts')
+
+    def __init__(self, chat_id, call: Callable[[], Awaitable], retryable: bool, future: asyncio.Future):
+        self.chat_id = chat_id
+        self.call = call
+        self.retryable = retryable
+        self.future = future
+        self.attempts = 0
+
+
+class SendScheduler:
+    """
+    Telegramga chiquvchi xabarlar navbati
+
+    Barcha yuborishlar bitta navbatdan o'tadi va ikki xil limit bilan
+    chiqariladi: umumiy (``global_rate`` xabar/soniya, ``global_burst`` tagacha
+    ketma-ket) va har bir chat uchun
+    (shaxsiy chatlarga ``private_interval``, guruh va kanallarga
+    ``group_interval`` soniyada bitta, ``chat_burst`` tagacha ketma-ket).
+    Navbatdan avval kichik ustuvorlikdagi xabarlar olinadi, shuning uchun
+    foydalanuvchilarga javoblar broadcastdan oldin ketadi. Limiti to'lgan
+    chatning xabari kutib turadi, boshqa chatlarni to'sib qo'ymaydi.
+
+    RetryAfter kelsa chat ko'rsatilgan vaqtga to'xtatiladi va xabar
+    ``max_retries`` martagacha qayta yuboriladi.
+    """
+
+    def __init__(self, global_rate: float = 30, private_interval: float = 1.0,
+                 group_interval: float = 3.0, chat_burst: int = 3, max_retries: int = 3,
+                 global_burst: int = 3):
+        self.max_retries = max_retries
+        self._global = TokenBucket(1 / global_rate, burst=max(1, global_burst))
+        self._private = TokenBucket(private_interval, burst=chat_burst)
+        self._group = TokenBucket(group_interval, burst=chat_burst)
+        self._paused: Dict[Union[int, str], float] = {}
+        self._ready: List[Tuple[int, int, _Job]] = []
+        self._delayed: List[Tuple[float, int, int, _Job]] = []
+        self._in_flight: Set[asyncio.Task] = set()
+        self._seq = itertools.count()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._worker: Optional[asyncio.Task] = None
+        self.sent = 0
+        self.retried = 0
+        self.failed = 0
+        self.max_depth = 0
+
+    @property
+    def depth(self) -> int:
+        return len(self._ready) + len(self._delayed)
+
+    async def submit(self, chat_id, call: Callable[[], Awaitable], priority: Optional[int] = None,
+                     retryable: bool = True):
+        """``call()`` ni navbat orqali bajarib, natijasini qaytarish"""
+        if self._worker is None or self._worker.done():
+            self._wakeup = asyncio.Event()
+            self._worker = asyncio.create_task(self._run())
+
+        job = _Job(chat_id, call, retryable, asyncio.get_running_loop().create_future())
+        if priority is None:
+            priority = send_priority.get()
+        heapq.heappush(self._ready, (priority, next(self._seq), job))
+        self.max_depth = max(self.max_depth, self.depth)
+        self._wakeup.set()
+        return await job.future
+
+    def _promote(self, now: float):
+        """Kutish vaqti tugagan xabarlarni asosiy navbatga qaytarish"""
+        while self._delayed and self._delayed[0][0] <= now:
+            _, job_priority, seq, job = heapq.heappop(self._delayed)
+            heapq.heappush(self._ready, (job_priority, seq, job))
+
+    def _chat_ready_at(self, chat_id, now: float) -> float:
+        paused_until = self._paused.get(chat_id)
+        if paused_until is not None:
+            if paused_until > now:
+                return paused_until
+            del self._paused[chat_id]
+
+        try:
+            is_private = int(chat_id) > 0
+        except (TypeError, ValueError):
+            # @username ko'rinishidagi kanal
+            is_private = False
+        bucket = self._private if is_private else self._group
+        if bucket.consume(chat_id):
+            return now + bucket.retry_after(chat_id)
+        return now
+
+    async def _run(self):
+        while True:
+            now = time.monotonic()
+            self._promote(now)
+            if not self._ready:
+                timeout = self._delayed[0][0] - now if self._delayed else None
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            wait = self._global.retry_after(GLOBAL_KEY)
+            if wait > 0:
+                await asyncio.sleep(wait)
+                continue
+
+            job_priority, seq, job = heapq.heappop(self._ready)
+            if job.future.done():
+                # Chaqiruvchi kutishni bekor qilgan
+                continue
+            ready_at = self._chat_ready_at(job.chat_id, now)
+            if ready_at > now:
+                heapq.heappush(self._delayed, (ready_at, job_priority, seq, job))
+                continue
+
+            self._global.consume(GLOBAL_KEY)
+            task = asyncio.create_task(self._send(job, job_priority, seq))
+            self._in_flight.add(task)
+            task.add_done_callback(self._in_flight.discard)
+
+    async def _send(self, job: _Job, job_priority: int, seq: int):
+        try:
+            result = await job.call()
+        except RetryAfter as err:
+            self.retried += 1
+            paused_until = time.monotonic() + err.timeout
+            self._paused[job.chat_id] = max(paused_until, self._paused.get(job.chat_id, 0))
+            logging.warning(f"RetryAfter {err.timeout}s for chat {job.chat_id}")
+            if job.retryable and job.attempts < self.max_retries and not job.future.done():
+                job.attempts += 1
+                heapq.heappush(self._delayed, (paused_until, job_priority, seq, job))
+                self._wakeup.set()
+                return
+            self.failed += 1
+            if not job.future.done():
+                job.future.set_exception(err)
+        except Exception as err:
+            self.failed += 1
+            if not job.future.done():
+                job.future.set_exception(err)
+        else:
+            self.sent += 1
+            if not job.future.done():
+                job.future.set_result(result)
+
+    def stats(self) -> dict:
+        """Navbat holati: kutayotgan, yuborilayotgan va yuborilgan xabarlar"""
+        interactive = sum(1 for item in self._ready if item[0] <= PRIORITY_INTERACTIVE)
+        interactive += sum(1 for item in self._delayed if item[1] <= PRIORITY_INTERACTIVE)
+        return {
+            'queued': self.depth,
+            'queued_interactive': interactive,
+            'queued_bulk': self.depth - interactive,
+            'delayed': len(self._delayed),
+            'in_flight': len(self._in_flight),
+            'paused_chats': len(self._paused),
+            'max_depth': self.max_depth,
+            'sent': self.sent,
+            'retried': self.retried,
+            'failed': self.failed,
+        }
+
+    async def close(self, timeout: float = 10):
+        """Navbatdagi xabarlarni ``timeout`` soniyagacha yuborib, to'xtatish"""
+        async def drain():
+            while self.depth or self._in_flight:
+                await asyncio.sleep(0.05)
+
+        try:
+            await asyncio.wait_for(drain(), timeout)
+        except asyncio.TimeoutError:
+            logging.warning(f"Send scheduler closed with {self.depth} queued messages")
+        if self._worker is not None:
+            self._worker.cancel()
+        for task in list(self._in_flight):
+            task.cancel()
+
+
+class ScheduledBot(Bot):
+    """
+    Xabar yuboruvchi so'rovlari ``SendScheduler`` orqali o'tadigan Bot
+
+    Barcha so'rovlarning vaqti va xatolari ``utils.metrics`` ga yoziladi.
+    """
+
+    def __init__(self, *args, scheduler: SendScheduler = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.scheduler = scheduler or SendScheduler()
+
+    async def request(self, method, data=None, files=None, **kwargs):
+        chat_id = (data or {}).get('chat_id')
+        if method not in SCHEDULED_METHODS or chat_id is None:
+            return await self._timed_request(method, data, files, **kwargs)
+
+        call = functools.partial(self._timed_request, method, data, files, **kwargs)
+        # Yuklanayotgan fayl oqimi birinchi urinishda o'qib bo'linadi
+        return await self.scheduler.submit(chat_id, call, retryable=not files)
+
+    async def _timed_request(self, method, data=None, files=None, **kwargs):
+        """Telegramga HTTP so'rov (navbatda kutish vaqtisiz)"""
+        with metrics.timed(metrics.telegram_seconds, method, errors=metrics.telegram_errors):
+            return await super().request(method, data, files, **kwargs)
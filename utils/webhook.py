@@ -0,0 +1,103 @@
+import asyncio
+import logging
+from typing import Awaitable, Callable, List, Optional
+
+from aiohttp import web
+from aiogram import Bot, Dispatcher, types
+
+from data import config
+
+SECRET_TOKEN_HEADER = 'X-Telegram-Bot-Api-Secret-Token'
+
+
+class WebhookServer:
+    """
+    Telegram webhook so'rovlarini qabul qiluvchi aiohttp server
+
+    So'rov kelganda update navbatga qo'yiladi va Telegramga darhol 200
+    qaytariladi. Updatelar ``workers`` ta fon vazifada qayta ishlanadi.
+    Navbat to'lib qolsa, yangi so'rovlar joy bo'shaguncha kutadi va Telegram
+    yuborish tezligini o'zi pasaytiradi.
+    """
+
+    def __init__(self, dispatcher: Dispatcher, workers: int = 64, queue_size: int = 10000,
+                 secret_token: Optional[str] = None):
+        self.dispatcher = dispatcher
+        self.workers = workers
+        self.queue_size = queue_size
+        self.secret_token = secret_token
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks = []
+
+    async def handle(self, request: web.Request) -> web.Response:
+        if self.secret_token and request.headers.get(SECRET_TOKEN_HEADER) != self.secret_token:
+            raise web.HTTPUnauthorized()
+        update = types.Update(**(await request.json()))
+        await self._queue.put(update)
+        return web.Response()
+
+    async def _worker(self):
+        while True:
+            update = await self._queue.get()
+            try:
+                await self.dispatcher.process_update(update)
+            except Exception as err:
+                logging.exception(err)
+            finally:
+                self._queue.task_done()
+
+    async def start(self):
+        Dispatcher.set_current(self.dispatcher)
+        Bot.set_current(self.dispatcher.bot)
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self, timeout: float):
+        """Navbatdagi updatelarni ``timeout`` soniya ichida tugatib, ishchilarni to'xtatish"""
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout=timeout)
+        except asyncio.TimeoutError:
+            logging.warning(f"Webhook: {self._queue.qsize()} updates left unprocessed")
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+
+def start_webhook(dispatcher: Dispatcher,
+                  on_startup: Optional[Callable[[Dispatcher], Awaitable]] = None,
+                  on_shutdown: Optional[Callable[[Dispatcher], Awaitable]] = None,
+                  allowed_updates: Optional[List[str]] = None):
+    """``executor.start_polling`` o'rniga botni webhook rejimida ishga tushirish"""
+    server = WebhookServer(
+        dispatcher,
+        workers=config.WEBHOOK_WORKERS,
+        queue_size=config.WEBHOOK_QUEUE_SIZE,
+        secret_token=config.WEBHOOK_SECRET or None,
+    )
+    app = web.Application()
+    app.router.add_post(config.WEBHOOK_PATH, server.handle)
+
+    async def startup(_):
+        await server.start()
+        await dispatcher.bot.set_webhook(
+            config.WEBHOOK_HOST + config.WEBHOOK_PATH,
+            max_connections=config.WEBHOOK_MAX_CONNECTIONS,
+            secret_token=config.WEBHOOK_SECRET or None,
+            allowed_updates=allowed_updates,
+        )
+        if on_startup is not None:
+            await on_startup(dispatcher)
+
+    async def shutdown(_):
+        await server.stop(config.WEBHOOK_SHUTDOWN_TIMEOUT)
+        if on_shutdown is not None:
+            await on_shutdown(dispatcher)
+        await dispatcher.storage.close()
+        await dispatcher.storage.wait_closed()
+        session = await dispatcher.bot.get_session()
+        await session.close()
+
+    app.on_startup.append(startup)
+    app.on_shutdown.append(shutdown)
+    web.run_app(app, host=config.WEBAPP_HOST, port=config.WEBAPP_PORT)